@@ -1,21 +1,46 @@
-from flask import Flask, send_from_directory, request
+from flask import Flask, request
 from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 from backend.config import Config
 from backend.models import db
-from backend.routes.api import api_bp
+from backend.routes.api import api_bp, start_state_checkpoints, start_payload_pruning
+from backend.utils.schema import add_missing_columns, copy_legacy_rows, delete_legacy_rows
+from backend.services.event_search import create_event_index
+from backend.services.event_journal import journals
+from backend.utils.versioning import register_versioning
+from backend.utils.sharding import register_sharding, shards
+from backend.utils.encoding import NegotiatingJSONProvider, compress_response, msgpack
+from backend.utils.static_assets import StaticAssetManifest
 import os
 
-# Initialize Flask app
-app = Flask(__name__, 
-            static_folder='../frontend',
-            static_url_path='')
+# Initialize Flask app (frontend files are served from the asset manifest below)
+app = Flask(__name__, static_folder=None)
 app.config.from_object(Config)
+app.json = NegotiatingJSONProvider(app)
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend')
+static_assets = StaticAssetManifest(FRONTEND_DIR, Config.STATIC_MIN_COMPRESS_SIZE)
 
 # Initialize extensions
 CORS(app)
 db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+register_versioning()
+register_sharding(app, db)
+journals.init_app(app)
+
+# Binary packets need a msgpack-capable client parser (socket.io-msgpack-parser)
+serializer = Config.SOCKETIO_SERIALIZER
+if serializer == 'msgpack' and msgpack is None:
+    print("msgpack is not installed; Socket.IO falls back to the JSON serializer")
+    serializer = 'default'
+socketio = SocketIO(app, cors_allowed_origins="*", serializer=serializer)
+
+
+@app.after_request
+def compress(response):
+    """Compress API responses above the configured size"""
+    return compress_response(response, Config.RESPONSE_COMPRESS_MIN_SIZE, Config.RESPONSE_COMPRESS_LEVEL)
+
 
 # Register blueprints
 app.register_blueprint(api_bp)
@@ -23,8 +48,21 @@ app.register_blueprint(api_bp)
 # Create database tables
 with app.app_context():
     db.create_all()
+    add_missing_columns(db)
+    if shards.enabled:
+        # Messages and events recorded before sharding move with their simulation;
+        # the catalog copies of already-sharded simulations are dropped here
+        shards.on_create(lambda simulation_id, connection: copy_legacy_rows(db, simulation_id, connection))
+        delete_legacy_rows(db, shards.simulation_ids())
+    create_event_index(db)
     print("Database initialized!")
 
+# Dirty live process states are written out periodically, not only on the next request
+start_state_checkpoints(app, socketio)
+
+# Payloads of deleted simulations are pruned in the background, off the delete request
+start_payload_pruning(app, socketio)
+
 
 # ============= WebSocket Events =============
 
@@ -92,16 +130,17 @@ def handle_bottleneck_alert(data):
 @app.route('/')
 def index():
     """Serve landing page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return static_assets.response(static_assets.get('index.html'), request)
 
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve static files"""
-    if os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    # For client-side routing, return index.html
-    return send_from_directory(app.static_folder, 'index.html')
+    """Serve static files from the in-memory manifest"""
+    asset = static_assets.get(path)
+    if asset is None:
+        # For client-side routing, return index.html
+        asset = static_assets.get('index.html')
+    return static_assets.response(asset, request)
 
 
 # ============= Helper Functions =============
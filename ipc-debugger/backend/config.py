@@ -14,6 +14,21 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(DB_DIR, "ipc_debugger.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Per-simulation storage: messages and events go to SHARD_DIR/simulation_<id>.db,
+    # users, simulations and topology stay in the catalog database above
+    SHARDING_ENABLED = os.environ.get('SHARDING_ENABLED', '1') != '0'
+    SHARD_DIR = os.path.join(DB_DIR, "shards")
+    SHARD_MAX_OPEN = 64  # shard engines kept open (least recently used are closed)
+    
+    # Append-only binary journal for message_sent/process_state_changed events
+    # (JOURNAL_DIR/simulation_<id>.journal); other events stay in SQL
+    EVENT_JOURNAL_ENABLED = os.environ.get('EVENT_JOURNAL_ENABLED', '1') != '0'
+    JOURNAL_DIR = os.path.join(DB_DIR, "journals")
+    JOURNAL_MAX_OPEN = 64  # journal files kept open (least recently used are closed)
+    JOURNAL_INDEX_STRIDE = 1024  # records per sparse time index entry
+    JOURNAL_FLUSH_INTERVAL = 0.2  # seconds appends may stay buffered in memory
+    JOURNAL_BUFFER_BYTES = 64 * 1024
+    
     # Secret key for sessions
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
@@ -22,6 +37,49 @@ class Config:
     
     # SocketIO settings
     SOCKETIO_CORS_ALLOWED_ORIGINS = "*"
+    SOCKETIO_SERIALIZER = os.environ.get('SOCKETIO_SERIALIZER', 'default')  # 'msgpack' for binary packets
+    
+    # API responses: msgpack on "Accept: application/x-msgpack" (needs msgpack),
+    # gzip/deflate above this size
+    RESPONSE_COMPRESS_MIN_SIZE = 1024  # bytes
+    RESPONSE_COMPRESS_LEVEL = 6
+    
+    # Static assets: frontend files are hashed and precompressed at startup
+    STATIC_MIN_COMPRESS_SIZE = 512  # bytes
+    
+    # Admission control for write endpoints: per-simulation and global token
+    # buckets (requests/sec, burst) and a bound on concurrent writes
+    ADMISSION_ENABLED = True
+    ADMISSION_SIM_RATE = 200
+    ADMISSION_SIM_BURST = 400
+    ADMISSION_GLOBAL_RATE = 1000
+    ADMISSION_GLOBAL_BURST = 2000
+    ADMISSION_MAX_INFLIGHT = 8
+    ADMISSION_QUEUE_TIMEOUT = 0.5  # seconds a write may wait for a slot
+    
+    # Background jobs (bottleneck analysis, deadlock detection, log export with
+    # ?async=1): bounded worker count, results cached per simulation data version
+    JOB_WORKERS = 2
+    JOB_HISTORY = 256  # finished jobs kept for status/result lookups
+    JOB_SPILL_DIR = os.path.join(DB_DIR, "jobs")
+    JOB_SPILL_BYTES = 1024 * 1024  # larger job results (log exports) are kept on disk
+    
+    # Live process states are kept in memory; dirty states are checkpointed to
+    # the processes table at most this often by requests, within about twice
+    # this by a background task, and when a simulation stops
+    PROCESS_CHECKPOINT_INTERVAL = 1.0  # seconds
+    
+    # Time travel: compact topology/state snapshots taken while a simulation is
+    # active; a past state is rebuilt from the nearest snapshot plus the events after it
+    SNAPSHOT_INTERVAL = 5.0  # seconds between snapshots of an active simulation
+    SNAPSHOT_MAX_EVENTS = 5000  # state-changing events that force a snapshot sooner
+    SNAPSHOT_CACHE_SIZE = 32  # decoded snapshots kept in memory for scrubbing
+    
+    # Cross-simulation comparison: aggregates computed with grouped queries
+    # over the catalog and cached per simulation data version
+    COMPARE_MAX_SIMULATIONS = 200
+    COMPARE_CACHE_SIZE = 1024  # simulations
+    LATENCY_PERCENTILES = (50, 90, 95, 99)
     
     # Simulation settings
     MAX_PROCESSES = 10
@@ -30,7 +88,63 @@ class Config:
     DEFAULT_QUEUE_DELAY = (200, 500)  # ms
     DEFAULT_SHMEM_DELAY = (50, 150)  # ms
     DEADLOCK_CHECK_INTERVAL = 500  # ms
+    DEADLOCK_DETECTION = 'cycle'  # 'cycle' or 'reduction' (multi-instance), per-simulation "deadlock_detection"
     BOTTLENECK_THRESHOLD = 500  # ms
+    CAPACITY_UTILIZATION_THRESHOLD = 0.8  # modeled utilization that marks a process as a bottleneck
+    
+    # Streaming latency shift detection (EWMA baseline + CUSUM) per channel and process
+    LATENCY_EWMA_ALPHA = 0.01  # baseline smoothing
+    LATENCY_CUSUM_K = 0.75  # slack, in baseline standard deviations
+    LATENCY_CUSUM_H = 8.0  # decision threshold
+    LATENCY_WARMUP = 20  # samples before detection starts
+    
+    # Shared-memory ring buffer transport (shmem benchmarks)
+    SHMEM_RING_CAPACITY = 4 * 1024 * 1024  # bytes
+    SHMEM_RING_MAX_CAPACITY = 256 * 1024 * 1024  # largest ring_capacity a channel may request
+    SHMEM_BENCHMARK_MAX_MESSAGES = 100000
+    SHMEM_BENCHMARK_MAX_PRODUCERS = 8
+    
+    # CPU scheduler simulation (virtual ms)
+    SCHEDULER_POLICY = 'rr'  # fcfs, rr, priority, mlfq
+    SCHEDULER_QUANTUM = 10
+    SCHEDULER_BURST_RANGE = (5, 50)
+    SCHEDULER_MLFQ_LEVELS = 3
+    SCHEDULER_MLFQ_BOOST = 200  # 0 disables priority boost
+    
+    # Parameter sweeps ("what-if" runs on a process pool)
+    SWEEP_MAX_VARIANTS = 256
+    SWEEP_MAX_MESSAGES_PER_CHANNEL = 10000
+    SWEEP_MAX_MESSAGE_SIZE = 1024 * 1024  # bytes
+    SWEEP_CACHE_SIZE = 4096  # cached variant results
+    
+    # Level-of-detail graph API: layouts are cached per topology version
+    GRAPH_LAYOUT_HISTORY = 8  # versions kept for ?since= diffs
+    GRAPH_ZOOM_LEVELS = (0.25, 1.0)  # components below the first zoom, communities below the second
+    
+    # Message payload recording: 'full' (inline text), 'dedup' (content-addressed
+    # payload store) or 'metadata' (size and delay only). Simulations can
+    # override this with "message_recording" in their config.
+    MESSAGE_RECORDING = 'dedup'
+    PAYLOAD_COMPRESS_THRESHOLD = 1024  # bytes
+    PAYLOAD_DIGEST_CACHE_SIZE = 4096
+    PAYLOAD_PRUNE_INTERVAL = 30.0  # seconds between background prunes of deleted simulations' payloads
+    PAYLOAD_PRUNE_BATCH = 500  # payloads checked and deleted per step
+    
+    # Raw row sampling for message_sent records: 'all', 'nth', 'reservoir',
+    # 'outliers' or 'adaptive'. Simulations can override this with
+    # "recording_policy" in their config. Aggregates stay exact in every mode.
+    RECORDING_POLICY = 'all'
+    RECORDER_SAMPLE_N = 10
+    RECORDER_RESERVOIR_SIZE = 1000
+    RECORDER_TARGET_ROWS_PER_SEC = 200  # adaptive mode write budget
+    RECORDER_MAX_COMMIT_MS = 20  # adaptive mode backs off above this
+    RECORDER_FLUSH_INTERVAL = 1.0  # seconds between aggregate flushes
+    
+    # Trace import/replay: traces are read from (and uploaded to) TRACE_DIR
+    TRACE_DIR = os.path.join(BASE_DIR, "traces")
+    TRACE_BATCH_SIZE = 5000  # rows per bulk insert
+    TRACE_YIELD_EVERY = 500  # rows between yields to other requests while replaying
+    TRACE_IMPORT_HISTORY = 256  # finished imports kept for progress lookups
     
     # Admin credentials (simple auth for demo)
     ADMIN_USERNAME = 'admin'
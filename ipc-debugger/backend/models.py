@@ -1,8 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert
+from backend.utils.sharding import ShardedSession
 from datetime import datetime
 import json
 
-db = SQLAlchemy()
+# Messages and events live in per-simulation shards (see backend/utils/sharding.py)
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+
+# Table options of the per-simulation tables; ids are allocated per shard
+SHARDED_TABLE_ARGS = {'sqlite_autoincrement': True, 'info': {'sharded': True}}
 
 class User(db.Model):
     """User model for authentication"""
@@ -39,11 +45,16 @@ class Simulation(db.Model):
     started_at = db.Column(db.DateTime, nullable=True)
     ended_at = db.Column(db.DateTime, nullable=True)
     config = db.Column(db.Text, default='{}')  # JSON config
+    parent_id = db.Column(db.Integer, db.ForeignKey('simulations.id'), nullable=True)  # set on clones
+    forked_at = db.Column(db.DateTime, nullable=True)  # parent history is shared up to this point
+    version = db.Column(db.Integer, default=1)  # bumped on every change to the simulation or its topology
+    state_checkpoint = db.Column(db.Integer, default=0)  # last event reflected in stored process states (NULL: stored states are current)
+    deadlock_count = db.Column(db.Integer, default=0)  # deadlock_detected events logged (NULL: not counted yet)
     
     # Relationships
     processes = db.relationship('Process', backref='simulation', lazy=True, cascade='all, delete-orphan')
     ipc_channels = db.relationship('IPCChannel', backref='simulation', lazy=True, cascade='all, delete-orphan')
-    events = db.relationship('Event', backref='simulation', lazy=True, cascade='all, delete-orphan')
+    tombstones = db.relationship('Tombstone', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -54,8 +65,13 @@ class Simulation(db.Model):
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'ended_at': self.ended_at.isoformat() if self.ended_at else None,
             'config': json.loads(self.config) if self.config else {},
-            'process_count': len(self.processes),
-            'channel_count': len(self.ipc_channels)
+            'parent_id': self.parent_id,
+            'forked_at': self.forked_at.isoformat() if self.forked_at else None,
+            'version': self.version or 0,
+            'process_count': db.session.query(db.func.count(Process.id)).filter(
+                Process.simulation_id == self.id).scalar(),
+            'channel_count': db.session.query(db.func.count(IPCChannel.id)).filter(
+                IPCChannel.simulation_id == self.id).scalar()
         }
 
 
@@ -69,11 +85,14 @@ class Process(db.Model):
     state = db.Column(db.String(20), default='ready')  # ready, running, waiting, blocked, terminated
     priority = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    origin_id = db.Column(db.Integer, nullable=True, index=True)  # process this was cloned from
+    version = db.Column(db.Integer, default=0)  # simulation version of the last change
     
     # Relationships
     sent_channels = db.relationship('IPCChannel', foreign_keys='IPCChannel.sender_id', backref='sender', lazy=True)
     received_channels = db.relationship('IPCChannel', foreign_keys='IPCChannel.receiver_id', backref='receiver', lazy=True)
-    events = db.relationship('Event', backref='process', lazy=True)
+    # Events are detached from a deleted process with a bulk update (delete_process)
+    events = db.relationship('Event', backref='process', lazy=True, passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -97,9 +116,14 @@ class IPCChannel(db.Model):
     receiver_id = db.Column(db.Integer, db.ForeignKey('processes.id'), nullable=False)
     config = db.Column(db.Text, default='{}')  # JSON config (buffer size, etc.)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    origin_id = db.Column(db.Integer, nullable=True, index=True)  # channel this was cloned from
+    version = db.Column(db.Integer, default=0)  # simulation version of the last change
     
     # Relationships
-    messages = db.relationship('Message', backref='channel', lazy=True, cascade='all, delete-orphan')
+    # Messages are bulk-deleted with their channel (or their simulation's shard)
+    messages = db.relationship('Message', backref='channel', lazy=True, passive_deletes=True)
+    stats = db.relationship('ChannelStats', uselist=False, lazy=True, cascade='all, delete-orphan')
+    latency_buckets = db.relationship('LatencyBucket', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -111,37 +135,159 @@ class IPCChannel(db.Model):
             'sender_name': self.sender.process_name if self.sender else None,
             'receiver_name': self.receiver.process_name if self.receiver else None,
             'config': json.loads(self.config) if self.config else {},
-            'message_count': len(self.messages)
+            'message_count': self.stats.message_count if self.stats else len(self.messages)
         }
 
 
+class ChannelStats(db.Model):
+    """Exact per-channel message aggregates, kept even when raw rows are sampled"""
+    __tablename__ = 'channel_stats'
+    
+    channel_id = db.Column(db.Integer, db.ForeignKey('ipc_channels.id'), primary_key=True)
+    message_count = db.Column(db.Integer, default=0)
+    delay_sum_ms = db.Column(db.Integer, default=0)
+    delay_max_ms = db.Column(db.Integer, default=0)
+    bytes_total = db.Column(db.Integer, default=0)
+    version = db.Column(db.Integer, default=0)  # simulation version of the last change
+    
+    @classmethod
+    def seed(cls, session, channel_id):
+        """Create the stats row from messages recorded before aggregates existed"""
+        count, delay_sum, delay_max, size_bytes = session.query(
+            db.func.count(Message.id),
+            db.func.coalesce(db.func.sum(Message.delay_ms), 0),
+            db.func.coalesce(db.func.max(Message.delay_ms), 0),
+            db.func.coalesce(db.func.sum(Message.size_bytes), 0)
+        ).filter(Message.channel_id == channel_id).one()
+        
+        stats = cls(
+            channel_id=channel_id,
+            message_count=count,
+            delay_sum_ms=delay_sum,
+            delay_max_ms=delay_max,
+            bytes_total=size_bytes
+        )
+        session.add(stats)
+        
+        # The delay histogram starts from the same rows
+        LatencyBucket.seed(session, channel_id)
+        return stats
+
+
+def latency_bucket(delay_ms):
+    """Histogram bucket of a delay: exact below 128 ms, then 64 buckets per doubling (under 1.6% wide)"""
+    delay_ms = max(0, int(delay_ms))
+    if delay_ms < 128:
+        return delay_ms
+    shift = delay_ms.bit_length() - 7
+    return (delay_ms >> shift) << shift
+
+
+class LatencyBucket(db.Model):
+    """Per-channel message delay histogram, exact for every message even when raw rows are sampled"""
+    __tablename__ = 'latency_buckets'
+    
+    channel_id = db.Column(db.Integer, db.ForeignKey('ipc_channels.id'), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)  # lower bound of the bucket in ms (see latency_bucket)
+    count = db.Column(db.Integer, default=0)
+    
+    @staticmethod
+    def histogram(delay_counts):
+        """{bucket: count} from (delay_ms, count) pairs"""
+        buckets = {}
+        for delay_ms, count in delay_counts:
+            bucket = latency_bucket(delay_ms or 0)
+            buckets[bucket] = buckets.get(bucket, 0) + count
+        return buckets
+    
+    @classmethod
+    def seed(cls, session, channel_id):
+        """
+        Create a channel's histogram from its recorded messages (in the
+        channel's shard scope)
+        Returns: number of buckets written
+        """
+        buckets = cls.histogram(session.query(
+            Message.delay_ms, db.func.count(Message.id)
+        ).filter(Message.channel_id == channel_id).group_by(Message.delay_ms))
+        if buckets:
+            session.execute(insert(cls), [
+                {'channel_id': channel_id, 'bucket': bucket, 'count': count}
+                for bucket, count in buckets.items()
+            ])
+        return len(buckets)
+
+
+class Payload(db.Model):
+    """Content-addressed message payload, shared by every message with the same body"""
+    __tablename__ = 'payloads'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the raw body
+    data = db.Column(db.LargeBinary, nullable=False)
+    compressed = db.Column(db.Boolean, default=False)
+    size_bytes = db.Column(db.Integer, default=0)
+
+
 class Message(db.Model):
     """Message model"""
     __tablename__ = 'messages'
+    __table_args__ = SHARDED_TABLE_ARGS
     
     id = db.Column(db.Integer, primary_key=True)
     channel_id = db.Column(db.Integer, db.ForeignKey('ipc_channels.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=False, default='')  # inline body ('full' recording only)
+    payload_id = db.Column(db.Integer, db.ForeignKey('payloads.id'), nullable=True, index=True)
     size_bytes = db.Column(db.Integer, default=0)
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     received_at = db.Column(db.DateTime, nullable=True)
     delay_ms = db.Column(db.Integer, default=0)
     
-    def to_dict(self):
-        return {
+    # Relationships
+    payload = db.relationship('Payload', lazy=True)
+    
+    def shard_id(self, session):
+        """Simulation whose shard holds this message"""
+        channel = self.channel or session.get(IPCChannel, self.channel_id)
+        return channel.simulation_id if channel else None
+    
+    def get_content(self):
+        """Message body, or None when only metadata was recorded"""
+        if self.payload_id is not None:
+            from backend.services.payload_store import PayloadStore
+            return PayloadStore.decode(self.payload)
+        return self.content or None
+    
+    def to_dict(self, include_content=True):
+        result = {
             'id': self.id,
             'channel_id': self.channel_id,
-            'content': self.content,
+            'payload_id': self.payload_id,
             'size_bytes': self.size_bytes,
             'sent_at': self.sent_at.isoformat(),
             'received_at': self.received_at.isoformat() if self.received_at else None,
             'delay_ms': self.delay_ms
         }
+        if include_content:
+            result['content'] = self.get_content()
+        return result
+
+
+class Tombstone(db.Model):
+    """Processes and channels deleted from a simulation, for ?since= deltas"""
+    __tablename__ = 'tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    simulation_id = db.Column(db.Integer, db.ForeignKey('simulations.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # process, channel
+    row_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
 
 
 class Event(db.Model):
     """Event/Log model"""
     __tablename__ = 'events'
+    __table_args__ = SHARDED_TABLE_ARGS
     
     id = db.Column(db.Integer, primary_key=True)
     simulation_id = db.Column(db.Integer, db.ForeignKey('simulations.id'), nullable=False)
@@ -152,6 +298,10 @@ class Event(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     event_metadata = db.Column(db.Text, default='{}')  # JSON metadata
     
+    def shard_id(self, session):
+        """Simulation whose shard holds this event"""
+        return self.simulation_id
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -163,3 +313,30 @@ class Event(db.Model):
             'timestamp': self.timestamp.isoformat(),
             'metadata': json.loads(self.event_metadata) if self.event_metadata else {}
         }
+
+
+class StateSnapshot(db.Model):
+    """Compact copy of a simulation's processes, channels and live states at one moment"""
+    __tablename__ = 'state_snapshots'
+    __table_args__ = SHARDED_TABLE_ARGS
+    
+    id = db.Column(db.Integer, primary_key=True)
+    simulation_id = db.Column(db.Integer, db.ForeignKey('simulations.id'), nullable=False)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    event_id = db.Column(db.Integer, default=0)  # newest events row included
+    journal_position = db.Column(db.Integer, default=0)  # journal records included
+    process_count = db.Column(db.Integer, default=0)
+    channel_count = db.Column(db.Integer, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON (see services/time_travel.py)
+    
+    def shard_id(self, session):
+        """Simulation whose shard holds this snapshot"""
+        return self.simulation_id
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'taken_at': self.taken_at.isoformat(),
+            'process_count': self.process_count,
+            'channel_count': self.channel_count
+        }
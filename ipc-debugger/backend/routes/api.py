@@ -1,11 +1,37 @@
-from flask import Blueprint, request, jsonify, current_app
-from backend.models import db, Simulation, Process, IPCChannel, Message, Event, User
+from flask import Blueprint, request, jsonify, current_app, g, send_file
+from backend.models import db, Simulation, Process, IPCChannel, ChannelStats, Message, Event, StateSnapshot, User
 from backend.services.ipc_simulator import IPCSimulator
-from backend.services.deadlock_detector import DeadlockDetector
+from backend.services.deadlock_detector import DeadlockDetector, DETECTION_METHODS
+from backend.services.deadlock_avoidance import BankersAvoidance, channel_instances
 from backend.services.bottleneck_analyzer import BottleneckAnalyzer
+from backend.services.capacity_planner import CapacityPlanner
+from backend.services.comparison import SimulationComparator, record_deadlock
+from backend.services.time_travel import TimeTravel
+from backend.services.latency_monitor import shift_event
+from backend.services.payload_store import PayloadStore, get_recording_mode
+from backend.services.message_recorder import MessageRecorder, get_sampling_policy, policy_error
+from backend.services.graph_lod import GraphService, level_for_zoom, LEVEL_PROCESSES
+from backend.services.cpu_scheduler import CPUScheduler, build_workload, validate_specs, is_int, SCHEDULING_POLICIES
+from backend.services.simulation_clone import clone_simulation, history_events, last_event_id
+from backend.services.topology_io import parse_spec, dump_spec, validate_spec, import_topology, export_topology
+from backend.services.parameter_sweep import run_sweep, snapshot_topology, RANK_METRICS
+from backend.services.event_search import search_events
+from backend.services.admission import AdmissionController
+from backend.services.job_runner import JobRunner
+from backend.services.event_journal import journals
+from backend.services.process_state import ProcessStateStore, STATE_CODES
+from backend.services.trace_replay import TraceReplayer, TraceProgress, TRACE_FORMATS, detect_format, parse_timestamp
+from backend.utils.versioning import simulation_etag, changes_since
+from backend.utils.encoding import etag_matches
+from backend.utils.sharding import shards
 from backend.config import Config
 from datetime import datetime
 import json
+import math
+import os
+import threading
+import time
+import uuid
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -17,8 +43,24 @@ def get_socketio():
 
 # Global instances (in production, use app context)
 simulators = {}
-deadlock_detectors = {}
+deadlock_avoiders = {}
 bottleneck_analyzers = {}
+message_recorders = {}
+trace_imports = {}
+process_states = ProcessStateStore(Config.PROCESS_CHECKPOINT_INTERVAL)
+graph_service = GraphService(Config.GRAPH_LAYOUT_HISTORY, process_states.states)
+admission = AdmissionController(
+    Config.ADMISSION_SIM_RATE, Config.ADMISSION_SIM_BURST,
+    Config.ADMISSION_GLOBAL_RATE, Config.ADMISSION_GLOBAL_BURST,
+    Config.ADMISSION_MAX_INFLIGHT, Config.ADMISSION_QUEUE_TIMEOUT
+)
+channel_simulations = {}  # channel_id -> simulation_id (never changes)
+job_runner = JobRunner(Config.JOB_WORKERS, Config.JOB_HISTORY, Config.JOB_SPILL_DIR, Config.JOB_SPILL_BYTES)
+payload_store = PayloadStore(Config.PAYLOAD_COMPRESS_THRESHOLD, Config.PAYLOAD_DIGEST_CACHE_SIZE)
+time_travel = TimeTravel(
+    process_states, Config.SNAPSHOT_INTERVAL, Config.SNAPSHOT_MAX_EVENTS, Config.SNAPSHOT_CACHE_SIZE
+)
+comparator = SimulationComparator(Config.BOTTLENECK_THRESHOLD, Config.LATENCY_PERCENTILES, Config.COMPARE_CACHE_SIZE)
 
 def get_simulator(simulation_id):
     """Get or create simulator for a simulation"""
@@ -26,18 +68,249 @@ def get_simulator(simulation_id):
         simulators[simulation_id] = IPCSimulator(Config())
     return simulators[simulation_id]
 
-def get_deadlock_detector(simulation_id):
-    """Get or create deadlock detector"""
-    if simulation_id not in deadlock_detectors:
-        deadlock_detectors[simulation_id] = DeadlockDetector()
-    return deadlock_detectors[simulation_id]
+def get_deadlock_avoider(simulation_id):
+    """Get or create Banker's-algorithm avoidance state"""
+    if simulation_id not in deadlock_avoiders:
+        deadlock_avoiders[simulation_id] = BankersAvoidance()
+    return deadlock_avoiders[simulation_id]
 
 def get_bottleneck_analyzer(simulation_id, threshold=500):
     """Get or create bottleneck analyzer"""
     if simulation_id not in bottleneck_analyzers:
-        bottleneck_analyzers[simulation_id] = BottleneckAnalyzer(threshold)
+        bottleneck_analyzers[simulation_id] = BottleneckAnalyzer(threshold, {
+            'alpha': Config.LATENCY_EWMA_ALPHA,
+            'k': Config.LATENCY_CUSUM_K,
+            'h': Config.LATENCY_CUSUM_H,
+            'warmup': Config.LATENCY_WARMUP
+        })
     return bottleneck_analyzers[simulation_id]
 
+def emit_latency_shift(socketio, simulation_id, transition, name):
+    """Broadcast the start or end of a latency shift"""
+    if socketio:
+        socketio.emit('bottleneck_detected', {
+            'simulation_id': simulation_id,
+            'name': name,
+            **transition
+        }, room=f'simulation_{simulation_id}')
+
+def get_message_recorder(simulation):
+    """Get or create the message recorder for a simulation"""
+    if simulation.id not in message_recorders:
+        policy = get_sampling_policy(simulation, Config.RECORDING_POLICY)
+        message_recorders[simulation.id] = MessageRecorder(policy, Config())
+    return message_recorders[simulation.id]
+
+def flush_message_recorder(sim_id):
+    """
+    Add a simulation's pending per-channel counts to its channel stats (the caller commits)
+    Returns: True if there was anything to flush
+    """
+    recorder = message_recorders.get(sim_id)
+    if recorder is None or not recorder.pending:
+        return False
+    recorder.flush(db.session)
+    return True
+
+
+# ============= Admission Control =============
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+def request_simulation_id():
+    """Simulation a request targets, from the URL or JSON body"""
+    if 'simulation_id' not in g:
+        g.simulation_id = resolve_simulation_id()
+    return g.simulation_id
+
+
+def as_id(value):
+    """A JSON id as an int, or None when it is not one"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def resolve_simulation_id():
+    args = request.view_args or {}
+    if 'sim_id' in args:
+        return args['sim_id']
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        data = {}
+    simulation_id = as_id(data.get('simulation_id'))
+    if simulation_id is not None:
+        return simulation_id
+    
+    channel_id = args.get('channel_id') or as_id(data.get('channel_id'))
+    if channel_id is not None:
+        if channel_id not in channel_simulations:
+            simulation_id = db.session.query(IPCChannel.simulation_id).filter(IPCChannel.id == channel_id).scalar()
+            if simulation_id is None:
+                return None
+            channel_simulations[channel_id] = simulation_id
+        return channel_simulations[channel_id]
+    
+    if 'proc_id' in args:
+        return db.session.query(Process.simulation_id).filter(Process.id == args['proc_id']).scalar()
+    return None
+
+
+@api_bp.before_request
+def admit_write():
+    """Throttle writes per simulation and globally; bound concurrent writes"""
+    if not Config.ADMISSION_ENABLED or request.method not in WRITE_METHODS:
+        return None
+    
+    # Per-simulation buckets only for simulations that exist (the endpoint
+    # reuses the loaded row); other writes draw on the global bucket alone
+    sim_id = request_simulation_id()
+    if sim_id is not None and db.session.get(Simulation, sim_id) is None:
+        sim_id = None
+    socketio = get_socketio()
+    admitted, retry_after, reason = admission.acquire(sim_id, sleep=socketio.sleep if socketio else None)
+    if not admitted:
+        response = jsonify({
+            'success': False,
+            'error': 'Too many requests',
+            'reason': reason,
+            'retry_after': round(retry_after, 3)
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+    
+    g.admission_slot = True
+    return None
+
+
+@api_bp.teardown_request
+def release_write(exc):
+    if g.pop('admission_slot', None):
+        admission.release()
+
+
+@api_bp.route('/admission/metrics', methods=['GET'])
+def get_admission_metrics():
+    """Token bucket levels, in-flight writes and queue depth"""
+    return jsonify({
+        'success': True,
+        'enabled': Config.ADMISSION_ENABLED,
+        **admission.metrics()
+    })
+
+
+# ============= Storage Shards =============
+
+@api_bp.before_request
+def enter_shard():
+    """Route message/event queries of this request to its simulation's shard"""
+    if shards.enabled:
+        g.shard_token = shards.enter(request_simulation_id())
+
+
+@api_bp.teardown_request
+def leave_shard(exc):
+    token = g.pop('shard_token', None)
+    if token is not None:
+        shards.leave(token)
+
+
+# ============= Process State Checkpoints =============
+
+def checkpoint_process_states(app, sleep, interval):
+    """
+    Background task: checkpoint live process states that changed more than
+    interval seconds ago. Requests only checkpoint as a side effect of the
+    next state change, so without this the last changes of a simulation that
+    goes quiet stay in memory until it is stopped.
+    """
+    while True:
+        sleep(interval)
+        with app.app_context():
+            for sim_id in process_states.due():
+                try:
+                    with shards.scope(sim_id):
+                        process_states.checkpoint(sim_id, force=False)
+                        db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Process state checkpoint of simulation {sim_id} failed: {e}")
+            db.session.remove()
+
+
+def start_state_checkpoints(app, socketio):
+    """Start the checkpoint task once the app and Socket.IO server exist"""
+    socketio.start_background_task(
+        checkpoint_process_states, app, socketio.sleep, Config.PROCESS_CHECKPOINT_INTERVAL
+    )
+
+
+# ============= Payload Pruning =============
+
+def prune_payloads(app, sleep, interval, batch_size):
+    """
+    Background task: delete payloads left unreferenced by deleted
+    simulations. Each batch checks its candidates and deletes them without
+    yielding, so no send can pick up a payload in between.
+    """
+    while True:
+        sleep(interval)
+        if not payload_store.candidates:
+            continue
+        with app.app_context():
+            while payload_store.candidates:
+                try:
+                    payload_store.prune(db.session, batch_size)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Payload pruning failed: {e}")
+                    break
+                sleep(0)
+            db.session.remove()
+
+
+def start_payload_pruning(app, socketio):
+    """Start the pruning task once the app and Socket.IO server exist"""
+    socketio.start_background_task(
+        prune_payloads, app, socketio.sleep, Config.PAYLOAD_PRUNE_INTERVAL, Config.PAYLOAD_PRUNE_BATCH
+    )
+
+
+# ============= Read-only Snapshots =============
+
+# Writes still allowed on a snapshot: deleting or forking it, and what-if
+# analyses that leave its topology, states and messages untouched
+SNAPSHOT_WRITE_ENDPOINTS = {
+    'api.delete_simulation',
+    'api.clone_simulation_endpoint',
+    'api.sweep_simulation',
+    'api.run_scheduler',
+    'api.benchmark_ipc_channel'
+}
+
+@api_bp.before_request
+def reject_snapshot_writes():
+    """Frozen snapshot clones cannot be started, edited or fed messages"""
+    if request.method not in WRITE_METHODS or request.endpoint in SNAPSHOT_WRITE_ENDPOINTS:
+        return None
+    
+    sim_id = request_simulation_id()
+    if sim_id is None:
+        return None
+    status = db.session.query(Simulation.status).filter(Simulation.id == sim_id).scalar()
+    if status == 'snapshot':
+        return jsonify({
+            'success': False,
+            'error': f'Simulation {sim_id} is a read-only snapshot; clone it to make changes'
+        }), 409
+    return None
+
 
 # ============= Simulation Endpoints =============
 
@@ -49,6 +322,19 @@ def create_simulation():
     config = data.get('config', {})
     user_id = data.get('user_id')  # Optional for now
     
+    if not isinstance(config, dict):
+        return jsonify({
+            'success': False,
+            'error': 'config must be an object'
+        }), 400
+    if 'recording_policy' in config:
+        error = policy_error(config['recording_policy'])
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+    
     simulation = Simulation(
         name=name,
         user_id=user_id,
@@ -77,15 +363,60 @@ def create_simulation():
 
 @api_bp.route('/simulation/<int:sim_id>', methods=['GET'])
 def get_simulation(sim_id):
-    """Get simulation details"""
-    simulation = Simulation.query.get_or_404(sim_id)
+    """
+    Get simulation details.
+    Responses carry an ETag of the simulation version (If-None-Match -> 304);
+    ?since=<version> returns only processes and channels changed after it.
+    """
+    # Pending message counts bump the version once they reach the channel stats
+    if flush_message_recorder(sim_id):
+        db.session.commit()
     
-    return jsonify({
-        'success': True,
-        'simulation': simulation.to_dict(),
-        'processes': [p.to_dict() for p in simulation.processes],
-        'channels': [c.to_dict() for c in simulation.ipc_channels]
-    })
+    # Only the version column is read until we know the client's copy is stale
+    row = db.session.query(Simulation.version).filter(Simulation.id == sim_id).first_or_404()
+    version = row.version or 0
+    
+    # State changes not yet checkpointed have not bumped the version
+    states = process_states.table(sim_id)
+    pending = states.etag_suffix()
+    etag = simulation_etag(sim_id, version) + (f'-{pending}' if pending else '')
+    if etag_matches(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    simulation = db.session.get(Simulation, sim_id)
+    since = request.args.get('since', type=int)
+    
+    if since is not None and 0 < since <= version:
+        changes = changes_since(sim_id, since)
+        processes = changes['processes']
+        if pending:
+            changed = {p.id for p in processes}
+            dirty = [process_id for process_id in states.dirty_ids() if process_id not in changed]
+            if dirty:
+                processes += Process.query.filter(Process.id.in_(dirty)).all()
+        response = jsonify({
+            'success': True,
+            'simulation': simulation.to_dict(),
+            'since': since,
+            'processes': states.overlay([p.to_dict() for p in processes]),
+            'channels': [c.to_dict() for c in changes['channels']],
+            'removed_processes': changes['removed_processes'],
+            'removed_channels': changes['removed_channels']
+        })
+    else:
+        response = jsonify({
+            'success': True,
+            'simulation': simulation.to_dict(),
+            'processes': states.overlay([p.to_dict() for p in simulation.processes]),
+            'channels': [c.to_dict() for c in simulation.ipc_channels]
+        })
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @api_bp.route('/simulation/<int:sim_id>', methods=['DELETE'])
@@ -93,16 +424,48 @@ def delete_simulation(sim_id):
     """Delete a simulation"""
     simulation = Simulation.query.get_or_404(sim_id)
     
+    # Clones read their pre-fork history from this simulation's shard and
+    # journal, which go with it
+    clone_ids = [clone_id for clone_id, in db.session.query(Simulation.id).filter(Simulation.parent_id == sim_id)]
+    if clone_ids:
+        return jsonify({
+            'success': False,
+            'error': 'Simulation has clones that share its history; delete them first',
+            'clone_ids': clone_ids
+        }), 409
+    
     # Clean up global instances
     if sim_id in simulators:
         del simulators[sim_id]
-    if sim_id in deadlock_detectors:
-        del deadlock_detectors[sim_id]
+    if sim_id in deadlock_avoiders:
+        del deadlock_avoiders[sim_id]
     if sim_id in bottleneck_analyzers:
         del bottleneck_analyzers[sim_id]
+    if sim_id in message_recorders:
+        del message_recorders[sim_id]
+    graph_service.forget(sim_id)
+    admission.forget(sim_id)
+    job_runner.forget(sim_id)
+    process_states.forget(sim_id)
+    comparator.forget(sim_id)
+    time_travel.forget(sim_id)
+    for channel_id in [c for c, s in channel_simulations.items() if s == sim_id]:
+        del channel_simulations[channel_id]
+    
+    # Payloads only this simulation used are pruned in the background
+    payload_store.forget_simulation(db.session, sim_id)
+    
+    # Messages and events go with the shard file; without sharding they are bulk-deleted
+    if not shards.enabled:
+        channel_ids = db.session.query(IPCChannel.id).filter(IPCChannel.simulation_id == sim_id)
+        Message.query.filter(Message.channel_id.in_(channel_ids)).delete(synchronize_session=False)
+        Event.query.filter_by(simulation_id=sim_id).delete(synchronize_session=False)
+        StateSnapshot.query.filter_by(simulation_id=sim_id).delete(synchronize_session=False)
     
     db.session.delete(simulation)
     db.session.commit()
+    shards.drop(sim_id)
+    journals.drop(sim_id)
     
     return jsonify({'success': True})
 
@@ -111,11 +474,12 @@ def delete_simulation(sim_id):
 def start_simulation():
     """Start a simulation"""
     data = request.json
-    sim_id = data.get('simulation_id')
+    sim_id = as_id(data.get('simulation_id'))
     
     simulation = Simulation.query.get_or_404(sim_id)
     simulation.status = 'running'
     simulation.started_at = datetime.utcnow()
+    simulation.ended_at = None  # the previous run's end
     
     db.session.commit()
     
@@ -127,6 +491,7 @@ def start_simulation():
         message='Simulation started'
     )
     db.session.add(event)
+    time_travel.take(sim_id)
     db.session.commit()
     
     return jsonify({'success': True, 'status': 'running'})
@@ -136,12 +501,19 @@ def start_simulation():
 def stop_simulation():
     """Stop a simulation"""
     data = request.json
-    sim_id = data.get('simulation_id')
+    sim_id = as_id(data.get('simulation_id'))
     
     simulation = Simulation.query.get_or_404(sim_id)
     simulation.status = 'stopped'
     simulation.ended_at = datetime.utcnow()
     
+    if sim_id in message_recorders:
+        message_recorders[sim_id].flush(db.session)
+    journal = journals.get(sim_id, create=False)
+    if journal is not None:
+        journal.flush()
+    process_states.checkpoint(sim_id)
+    
     db.session.commit()
     
     # Log event
@@ -152,20 +524,55 @@ def stop_simulation():
         message='Simulation stopped'
     )
     db.session.add(event)
+    time_travel.take(sim_id)
     db.session.commit()
     
     return jsonify({'success': True, 'status': 'stopped'})
 
 
+@api_bp.route('/simulation/<int:sim_id>/clone', methods=['POST'])
+def clone_simulation_endpoint(sim_id):
+    """Fork a simulation's topology; history is shared with the parent, not copied"""
+    source = Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    include_state = data.get('include_state', False)
+    
+    # The clone copies process states from the processes table and
+    # channel stats from the stats table
+    process_states.checkpoint(sim_id)
+    flush_message_recorder(sim_id)
+    clone, process_map, channel_map = clone_simulation(
+        source,
+        name=data.get('name'),
+        include_state=include_state,
+        snapshot=data.get('snapshot', False)
+    )
+    db.session.commit()
+    time_travel.take(clone.id)
+    db.session.commit()
+    
+    # Optionally carry the in-memory analyzer state over to the new ids
+    if include_state and sim_id in bottleneck_analyzers:
+        bottleneck_analyzers[clone.id] = bottleneck_analyzers[sim_id].clone(process_map, channel_map)
+    
+    return jsonify({
+        'success': True,
+        'simulation': clone.to_dict(),
+        'process_map': process_map,
+        'channel_map': channel_map
+    }), 201
+
+
 # ============= Process Endpoints =============
 
 @api_bp.route('/process/create', methods=['POST'])
 def create_process():
     """Create a new process"""
     data = request.json
-    sim_id = data.get('simulation_id')
+    sim_id = as_id(data.get('simulation_id'))
     name = data.get('name', f'Process_{datetime.now().strftime("%H%M%S")}')
     priority = data.get('priority', 0)
+    Simulation.query.get_or_404(sim_id)
     
     process = Process(
         simulation_id=sim_id,
@@ -177,13 +584,20 @@ def create_process():
     db.session.add(process)
     db.session.commit()
     
+    states = process_states.loaded(sim_id)
+    if states is not None:
+        states.add(process.id, process.state)
+    
     # Log event
     event = Event(
         simulation_id=sim_id,
         process_id=process.id,
         event_type='process_created',
         severity='info',
-        message=f'Process "{name}" created'
+        message=f'Process "{name}" created',
+        event_metadata=json.dumps({
+            'process_id': process.id, 'name': name, 'priority': process.priority, 'state': process.state
+        })
     )
     db.session.add(event)
     db.session.commit()
@@ -196,25 +610,36 @@ def create_process():
 
 @api_bp.route('/process/<int:proc_id>/state', methods=['PUT'])
 def update_process_state(proc_id):
-    """Update process state"""
+    """Update process state (in the live state table; checkpointed to the database)"""
     data = request.json
     new_state = data.get('state')
     
     process = Process.query.get_or_404(proc_id)
-    old_state = process.state
-    process.state = new_state
+    if new_state not in STATE_CODES:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown process state: {new_state}'
+        }), 400
     
-    db.session.commit()
-    
-    # Log event
-    event = Event(
-        simulation_id=process.simulation_id,
-        process_id=proc_id,
-        event_type='process_state_changed',
-        severity='info',
-        message=f'Process "{process.process_name}" state: {old_state} → {new_state}'
-    )
-    db.session.add(event)
+    states = process_states.table(process.simulation_id)
+    states.add(proc_id, process.state)
+    old_state = states.set(proc_id, new_state)
+    
+    # Log event (recovery replays it if the change is not checkpointed yet)
+    journal = journals.get(process.simulation_id)
+    if journal is not None:
+        journal.state_changed(proc_id, old_state, new_state)
+    else:
+        db.session.add(Event(
+            simulation_id=process.simulation_id,
+            process_id=proc_id,
+            event_type='process_state_changed',
+            severity='info',
+            message=f'Process "{process.process_name}" state: {old_state} → {new_state}',
+            event_metadata=json.dumps({'process_id': proc_id, 'from': old_state, 'state': new_state})
+        ))
+    process_states.checkpoint(process.simulation_id, force=False)
+    time_travel.observe(process.simulation_id)
     db.session.commit()
     
     # Emit WebSocket event for real-time visualization
@@ -246,15 +671,26 @@ def delete_process(proc_id):
     ).all()
     
     channel_count = len(channels_to_delete)
+    channel_ids = [c.id for c in channels_to_delete]
     
-    # Delete all associated channels
+    # Delete all associated channels and their messages
+    Message.query.filter(Message.channel_id.in_(channel_ids)).delete(synchronize_session=False)
+    Event.query.filter_by(process_id=proc_id).update({'process_id': None}, synchronize_session=False)
+    recorder = message_recorders.get(sim_id)
     for channel in channels_to_delete:
+        if recorder:
+            recorder.forget_channel(channel.id)
+        channel_simulations.pop(channel.id, None)
         db.session.delete(channel)
     
     # Delete the process
     db.session.delete(process)
     db.session.commit()
     
+    states = process_states.loaded(sim_id)
+    if states is not None:
+        states.remove(proc_id)
+    
     # Log event
     message = f'Process "{process_name}" deleted'
     if channel_count > 0:
@@ -264,7 +700,8 @@ def delete_process(proc_id):
         simulation_id=sim_id,
         event_type='process_deleted',
         severity='info',
-        message=message
+        message=message,
+        event_metadata=json.dumps({'process_id': proc_id, 'channel_ids': channel_ids})
     )
     db.session.add(event)
     db.session.commit()
@@ -281,18 +718,30 @@ def delete_process(proc_id):
 def create_ipc_channel():
     """Create an IPC channel"""
     data = request.json
-    sim_id = data.get('simulation_id')
+    sim_id = as_id(data.get('simulation_id'))
     ipc_type = data.get('type')  # pipe, queue, shmem
-    sender_id = data.get('sender_id')
-    receiver_id = data.get('receiver_id')
+    sender_id = as_id(data.get('sender_id'))
+    receiver_id = as_id(data.get('receiver_id'))
     config = data.get('config', {})
+    Simulation.query.get_or_404(sim_id)
+    
+    endpoints = db.session.query(db.func.count(Process.id)).filter(
+        Process.simulation_id == sim_id,
+        Process.id.in_({sender_id, receiver_id} - {None})
+    ).scalar()
+    if sender_id is None or receiver_id is None or endpoints != len({sender_id, receiver_id}):
+        return jsonify({
+            'success': False,
+            'error': 'sender_id and receiver_id must be processes of the simulation'
+        }), 400
     
     channel = IPCChannel(
         simulation_id=sim_id,
         ipc_type=ipc_type,
         sender_id=sender_id,
         receiver_id=receiver_id,
-        config=json.dumps(config)
+        config=json.dumps(config),
+        stats=ChannelStats(message_count=0, delay_sum_ms=0, delay_max_ms=0, bytes_total=0)
     )
     
     db.session.add(channel)
@@ -305,7 +754,11 @@ def create_ipc_channel():
         simulation_id=sim_id,
         event_type='channel_created',
         severity='info',
-        message=f'{ipc_type.upper()} channel: {sender.process_name} → {receiver.process_name}'
+        message=f'{ipc_type.upper()} channel: {sender.process_name} → {receiver.process_name}',
+        event_metadata=json.dumps({
+            'channel_id': channel.id, 'ipc_type': ipc_type,
+            'sender_id': sender_id, 'receiver_id': receiver_id, 'config': config
+        })
     )
     db.session.add(event)
     db.session.commit()
@@ -322,6 +775,11 @@ def delete_ipc_channel(channel_id):
     channel = IPCChannel.query.get_or_404(channel_id)
     sim_id = channel.simulation_id
     
+    if sim_id in message_recorders:
+        message_recorders[sim_id].forget_channel(channel_id)
+    channel_simulations.pop(channel_id, None)
+    
+    Message.query.filter_by(channel_id=channel_id).delete(synchronize_session=False)
     db.session.delete(channel)
     db.session.commit()
     
@@ -330,7 +788,8 @@ def delete_ipc_channel(channel_id):
         simulation_id=sim_id,
         event_type='channel_deleted',
         severity='info',
-        message=f'IPC channel deleted'
+        message=f'IPC channel deleted',
+        event_metadata=json.dumps({'channel_id': channel_id})
     )
     db.session.add(event)
     db.session.commit()
@@ -343,11 +802,12 @@ def delete_ipc_channel(channel_id):
 def send_message():
     """Send a message through IPC channel"""
     data = request.json
-    channel_id = data.get('channel_id')
+    channel_id = as_id(data.get('channel_id'))
     content = data.get('content', '')
     
     channel = IPCChannel.query.get_or_404(channel_id)
     channel_config = json.loads(channel.config) if channel.config else {}
+    states = process_states.table(channel.simulation_id)
     
     # Get simulator
     simulator = get_simulator(channel.simulation_id)
@@ -365,40 +825,83 @@ def send_message():
             'error': info
         }), 400
     
-    # Create message record
-    message = Message(
-        channel_id=channel_id,
-        content=content,
-        size_bytes=len(content.encode('utf-8')),
-        delay_ms=delay_ms
-    )
-    
-    db.session.add(message)
-    db.session.commit()
-    
-    # Update process states
     sender = channel.sender
     receiver = channel.receiver
-    sender.state = 'running'
-    receiver.state = 'waiting'
-    db.session.commit()
+    size_bytes = len(content.encode('utf-8'))
     
-    # Record for bottleneck analysis
+    # Record for bottleneck analysis and exact aggregates (every message)
     analyzer = get_bottleneck_analyzer(channel.simulation_id)
-    analyzer.record_delay(sender.id, channel_id, delay_ms)
-    analyzer.record_delay(receiver.id, channel_id, delay_ms)
-    
-    # Log event
-    event = Event(
-        simulation_id=channel.simulation_id,
-        process_id=sender.id,
-        event_type='message_sent',
-        severity='info',
-        message=f'{sender.process_name} → {receiver.process_name} ({delay_ms}ms)',
-        event_metadata=json.dumps({'channel_id': channel_id, 'delay': delay_ms})
-    )
-    db.session.add(event)
+    shifts = analyzer.record_message(sender.id, receiver.id, channel_id, delay_ms)
+    names = {
+        ('process', sender.id): sender.process_name,
+        ('process', receiver.id): receiver.process_name,
+        ('channel', channel_id): f'{sender.process_name} → {receiver.process_name}'
+    }
+    for shift in shifts:
+        db.session.add(shift_event(channel.simulation_id, shift, names[(shift['scope'], shift['id'])]))
+    
+    recorder = get_message_recorder(channel.simulation)
+    if channel_id not in recorder.seen and channel.stats is None:
+        ChannelStats.seed(db.session, channel_id)
+    recorder.observe(channel_id, size_bytes, delay_ms)
+    record, slot = recorder.sample(channel_id, delay_ms)
+    
+    # Update live process states (checkpointed on an interval)
+    states.add(sender.id, sender.state)
+    states.add(receiver.id, receiver.state)
+    states.set(sender.id, 'running')
+    states.set(receiver.id, 'waiting')
+    
+    # Every send is journaled; without a journal only recorded ones get an event row
+    journal = journals.get(channel.simulation_id)
+    if journal is not None:
+        journal.message_sent(sender.id, receiver.id, channel_id, delay_ms)
+    
+    message = None
+    if record:
+        # Create message record
+        message = Message(
+            channel_id=channel_id,
+            size_bytes=size_bytes,
+            delay_ms=delay_ms
+        )
+        recording = get_recording_mode(channel.simulation, Config.MESSAGE_RECORDING)
+        if recording == 'full':
+            message.content = content
+        elif recording == 'dedup':
+            message.payload_id = payload_store.get_or_create(db.session, content)
+        
+        event = None
+        if journal is None:
+            # Log event
+            event = Event(
+                simulation_id=channel.simulation_id,
+                process_id=sender.id,
+                event_type='message_sent',
+                severity='info',
+                message=f'{sender.process_name} → {receiver.process_name} ({delay_ms}ms)',
+                event_metadata=json.dumps({'channel_id': channel_id, 'delay': delay_ms})
+            )
+            db.session.add(event)
+        db.session.add(message)
+        db.session.flush()
+        
+        # Reservoir sampling replaces an older sample
+        evicted = recorder.admit(channel_id, slot, (message.id, event.id if event else None))
+        if evicted:
+            Message.query.filter_by(id=evicted[0]).delete()
+            if evicted[1] is not None:
+                Event.query.filter_by(id=evicted[1]).delete()
+    
+    if recorder.due():
+        recorder.flush(db.session)
+    process_states.checkpoint(channel.simulation_id, force=False)
+    time_travel.observe(channel.simulation_id)
+    
+    started = time.perf_counter()
     db.session.commit()
+    if record:
+        recorder.record_commit((time.perf_counter() - started) * 1000)
     
     # Emit WebSocket event for real-time visualization
     socketio = get_socketio()
@@ -411,17 +914,498 @@ def send_message():
             'receiver': receiver.process_name,
             'channel_id': channel_id,
             'delay_ms': delay_ms,
-            'ipc_type': channel.ipc_type
+            'ipc_type': channel.ipc_type,
+            'emitted_at': time.time()  # lets clients measure fan-out latency
         }, room=f'simulation_{channel.simulation_id}')
+    for shift in shifts:
+        emit_latency_shift(socketio, channel.simulation_id, shift, names[(shift['scope'], shift['id'])])
     
     return jsonify({
         'success': True,
-        'message_id': message.id,
+        'message_id': message.id if message else None,
+        'recorded': record,
         'delay_ms': delay_ms,
         'info': info
     })
 
 
+def shmem_benchmark_job(channel_id, message_size, count, producers, report):
+    """Run a shared-memory ring benchmark for a channel and log its result"""
+    channel = db.session.get(IPCChannel, channel_id)
+    channel_config = json.loads(channel.config) if channel.config else {}
+    success, results, info = get_simulator(channel.simulation_id).benchmark_shared_memory(
+        channel_config,
+        message_size=message_size,
+        count=count,
+        producers=producers,
+        progress=lambda fraction: report(fraction, 'transferring')
+    )
+    if not success:
+        raise RuntimeError(info)
+    
+    # Log event
+    event = Event(
+        simulation_id=channel.simulation_id,
+        process_id=channel.sender_id,
+        event_type='shmem_benchmark',
+        severity='info',
+        message=f'{info}: {results["bytes_per_sec"] / 1e9:.2f} GB/s, '
+                f'{results["latency_us"]["p50"]}us p50 latency',
+        event_metadata=json.dumps({'channel_id': channel_id, **results})
+    )
+    db.session.add(event)
+    db.session.commit()
+    
+    return {
+        'channel_id': channel_id,
+        'results': results,
+        'info': info
+    }
+
+
+@api_bp.route('/ipc/<int:channel_id>/benchmark', methods=['POST'])
+def benchmark_ipc_channel(channel_id):
+    """
+    Benchmark a shmem channel through a real shared-memory ring buffer. It
+    runs as a job (?async=1 returns it right away); measurements are never
+    served from the job cache.
+    """
+    data = request.json or {}
+    for field, default in (('message_size', 4096), ('count', 10000), ('producers', 1)):
+        if not is_int(data.get(field, default)):
+            return jsonify({
+                'success': False,
+                'error': f'{field} must be a positive integer'
+            }), 400
+    message_size = data.get('message_size', 4096)
+    count = min(data.get('count', 10000), Config.SHMEM_BENCHMARK_MAX_MESSAGES)
+    producers = min(data.get('producers', 1), Config.SHMEM_BENCHMARK_MAX_PRODUCERS)
+    
+    channel = IPCChannel.query.get_or_404(channel_id)
+    if channel.ipc_type != 'shmem':
+        return jsonify({
+            'success': False,
+            'error': f'Benchmark is only available for shmem channels, not {channel.ipc_type}'
+        }), 400
+    
+    channel_config = json.loads(channel.config) if channel.config else {}
+    error = get_simulator(channel.simulation_id).benchmark_error(channel_config, message_size, producers)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    
+    return run_job(
+        'shmem_benchmark', channel.simulation_id, (channel_id, message_size, count, producers),
+        f'run-{uuid.uuid4().hex[:8]}',
+        lambda report: shmem_benchmark_job(channel_id, message_size, count, producers, report)
+    )
+
+
+# ============= Topology Import/Export =============
+
+@api_bp.route('/simulation/<int:sim_id>/topology', methods=['POST'])
+def import_simulation_topology(sim_id):
+    """Bulk-import processes and channels from a JSON/YAML spec in one transaction"""
+    Simulation.query.get_or_404(sim_id)
+    
+    try:
+        spec = parse_spec(request.get_data(as_text=True), request.content_type)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    existing = dict(db.session.query(Process.process_name, Process.id).filter(
+        Process.simulation_id == sim_id
+    ).all())
+    
+    errors = validate_spec(spec, existing)
+    if errors:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid topology',
+            'details': errors[:100]
+        }), 400
+    
+    process_count, channel_count = import_topology(sim_id, spec, existing)
+    db.session.commit()
+    time_travel.take(sim_id)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'processes_created': process_count,
+        'channels_created': channel_count
+    }), 201
+
+
+@api_bp.route('/simulation/<int:sim_id>/topology', methods=['GET'])
+def export_simulation_topology(sim_id):
+    """Export the topology in the same spec format (?format=json|yaml)"""
+    Simulation.query.get_or_404(sim_id)
+    format_type = request.args.get('format', 'json')
+    spec = export_topology(sim_id, process_states.states(sim_id))
+    
+    if format_type == 'yaml':
+        try:
+            body = dump_spec(spec, 'yaml')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        return body, 200, {'Content-Type': 'application/yaml'}
+    
+    return jsonify(spec)
+
+
+# ============= Parameter Sweeps =============
+
+@api_bp.route('/simulation/<int:sim_id>/sweep', methods=['POST'])
+def sweep_simulation(sim_id):
+    """Run a grid of channel config/delay-range variants in parallel and rank them"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    rank_by = data.get('rank_by', 'avg_latency_ms')
+    
+    if rank_by not in RANK_METRICS:
+        return jsonify({
+            'success': False,
+            'error': f'Cannot rank by {rank_by}'
+        }), 400
+    for field, default in (('messages_per_channel', 100), ('message_size', 64)):
+        if not is_int(data.get(field, default)):
+            return jsonify({
+                'success': False,
+                'error': f'{field} must be a positive integer'
+            }), 400
+    if not is_int(data.get('seed', 0), minimum=float('-inf')):
+        return jsonify({
+            'success': False,
+            'error': 'seed must be an integer'
+        }), 400
+    
+    try:
+        result = run_sweep(
+            snapshot_topology(simulation),
+            data.get('grid', {}),
+            Config(),
+            messages_per_channel=min(data.get('messages_per_channel', 100), Config.SWEEP_MAX_MESSAGES_PER_CHANNEL),
+            message_size=min(data.get('message_size', 64), Config.SWEEP_MAX_MESSAGE_SIZE),
+            seed=data.get('seed', 0),
+            rank_by=rank_by
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'rank_by': rank_by,
+        **result
+    })
+
+
+# ============= Trace Import/Replay =============
+
+def run_trace_replay(app, sim_id, path, fmt, speedup, progress, remove=False):
+    """Background task: stream a trace file through the simulator (remove: delete it afterwards)"""
+    with app.app_context():
+        socketio = app.extensions.get('socketio')
+        room = f'simulation_{sim_id}'
+        
+        def on_batch(p):
+            if socketio:
+                socketio.emit('trace_progress', p.to_dict(), room=room)
+        
+        def on_shift(shift, name):
+            emit_latency_shift(socketio, sim_id, shift, name)
+        
+        # Topology created by the replay is not logged as events, so a batch
+        # that adds processes or channels is followed by a snapshot
+        seen = {'topology': 0, 'rows': 0}
+        
+        def after_batch(p):
+            topology = p.processes_created + p.channels_created
+            if topology != seen['topology']:
+                time_travel.take(sim_id)
+            else:
+                time_travel.observe(sim_id, count=p.replayed - seen['rows'])
+            seen.update(topology=topology, rows=p.replayed)
+            db.session.commit()
+            on_batch(p)
+        
+        shard_token = shards.enter(sim_id)
+        try:
+            simulation = db.session.get(Simulation, sim_id)
+            replayer = TraceReplayer(
+                simulation,
+                get_simulator(sim_id),
+                get_bottleneck_analyzer(sim_id),
+                get_message_recorder(simulation),
+                batch_size=Config.TRACE_BATCH_SIZE,
+                yield_every=Config.TRACE_YIELD_EVERY
+            )
+            replayer.run(
+                path, fmt, progress,
+                speedup=speedup,
+                sleep=socketio.sleep if socketio else time.sleep,
+                on_batch=after_batch,
+                on_shift=on_shift
+            )
+            time_travel.take(sim_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            progress.status = 'failed'
+            progress.error = str(e)
+            progress.finished = time.monotonic()
+        finally:
+            db.session.remove()
+            shards.leave(shard_token)
+            if remove:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        
+        on_batch(progress)
+
+
+@api_bp.route('/simulation/<int:sim_id>/trace/import', methods=['POST'])
+def import_trace(sim_id):
+    """Import a CSV/NDJSON trace (uploaded or already in TRACE_DIR) and replay it"""
+    Simulation.query.get_or_404(sim_id)
+    
+    upload = request.files.get('file')
+    if upload:
+        options = request.form
+        filename = f'{uuid.uuid4().hex}_{os.path.basename(upload.filename or "trace")}'
+        path = os.path.join(Config.TRACE_DIR, filename)
+    else:
+        options = request.json or {}
+        path = os.path.realpath(os.path.join(Config.TRACE_DIR, str(options.get('path', ''))))
+        if not path.startswith(os.path.realpath(Config.TRACE_DIR) + os.sep) or not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': 'Trace file not found in trace directory'
+            }), 400
+    
+    fmt = options.get('format') or detect_format(path)
+    if fmt not in TRACE_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown trace format: {fmt}'
+        }), 400
+    
+    # speedup: omitted or 0 replays as fast as possible
+    try:
+        speedup = float(options.get('speedup') or 0)
+    except (TypeError, ValueError):
+        speedup = -1
+    if not math.isfinite(speedup) or speedup < 0:
+        return jsonify({
+            'success': False,
+            'error': 'speedup must be a non-negative number'
+        }), 400
+    
+    if upload:
+        os.makedirs(Config.TRACE_DIR, exist_ok=True)
+        upload.save(path)
+    
+    import_id = uuid.uuid4().hex
+    progress = TraceProgress(import_id, sim_id, os.path.basename(path))
+    track_trace_import(progress)
+    
+    # Uploaded files are only needed for the replay
+    app = current_app._get_current_object()
+    socketio = get_socketio()
+    args = (app, sim_id, path, fmt, speedup or None, progress, bool(upload))
+    if socketio:
+        socketio.start_background_task(run_trace_replay, *args)
+    else:
+        threading.Thread(target=run_trace_replay, args=args, daemon=True).start()
+    
+    return jsonify({
+        'success': True,
+        'import': progress.to_dict()
+    }), 202
+
+
+def track_trace_import(progress):
+    """Register an import, evicting the oldest finished ones beyond TRACE_IMPORT_HISTORY"""
+    trace_imports[progress.import_id] = progress
+    excess = len(trace_imports) - Config.TRACE_IMPORT_HISTORY
+    if excess > 0:
+        finished = [import_id for import_id, p in list(trace_imports.items())
+                    if p.status in ('completed', 'failed')]
+        for import_id in finished[:excess]:
+            del trace_imports[import_id]
+
+
+@api_bp.route('/trace/<import_id>', methods=['GET'])
+def get_trace_import(import_id):
+    """Get trace import progress and ingest rate"""
+    progress = trace_imports.get(import_id)
+    if progress is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown trace import'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'import': progress.to_dict()
+    })
+
+
+# ============= Background Jobs =============
+
+def wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+
+def emit_job_progress(socketio, job):
+    """Broadcast job status/progress to the simulation room"""
+    if socketio:
+        socketio.emit('job_progress', job.to_dict(), room=f'simulation_{job.simulation_id}')
+
+
+def get_offload(socketio):
+    """
+    Function running a callable on a native thread when the server uses
+    green threads (eventlet), so CPU-bound jobs do not stall the event loop
+    Returns: offload(fn, *args) or None
+    """
+    if socketio is not None and socketio.async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute
+    return None
+
+
+def run_job(kind, sim_id, params, data_version, task):
+    """
+    Run task(report) as a job keyed by the simulation's data version. With
+    ?async=1 it is queued on the job executor and the job is returned right
+    away (202); otherwise it runs inline. Both share the result cache.
+    Returns: Flask response
+    """
+    key = (kind, sim_id, params, data_version)
+    app = current_app._get_current_object()
+    socketio = get_socketio()
+    offload = get_offload(socketio)
+
+    def in_app_context(report):
+        # Worker and native threads do not inherit the request's contexts
+        with app.app_context(), shards.scope(sim_id):
+            try:
+                return task(report)
+            finally:
+                db.session.remove()
+
+    if not wants_async():
+        job = job_runner.run(
+            kind, sim_id, key, in_app_context if offload else task,
+            offload=offload, sleep=socketio.sleep if socketio else None
+        )
+        return render_job_result(job)
+
+    job, created = job_runner.submit(
+        kind, sim_id, key, in_app_context,
+        on_progress=lambda j: emit_job_progress(socketio, j),
+        spawn=socketio.start_background_task if socketio else None,
+        offload=offload,
+        sleep=socketio.sleep if socketio else None
+    )
+    finished = job.status == 'completed'
+    return jsonify({
+        'success': True,
+        'cached': finished and not created,
+        'job': job.to_dict()
+    }), 200 if finished else 202
+
+
+def render_job_result(job):
+    """Response for a finished job, shaped like the synchronous endpoint's"""
+    if job.status == 'failed':
+        return jsonify({
+            'success': False,
+            'error': job.error,
+            'job': job.to_dict()
+        }), 500
+
+    result = job.result
+    if job.kind == 'log_export':
+        if 'path' in result:
+            # Spilled to disk (large export)
+            return send_file(
+                result['path'],
+                mimetype='text/csv' if result['format'] == 'csv' else 'application/json',
+                as_attachment=result['format'] == 'csv',
+                download_name=result['filename']
+            )
+        if result['format'] == 'csv':
+            return result['content'], 200, {
+                'Content-Type': 'text/csv',
+                'Content-Disposition': f'attachment; filename={result["filename"]}'
+            }
+        return jsonify(result['content'])
+
+    return jsonify({
+        'success': True,
+        **result
+    })
+
+
+@api_bp.route('/jobs', methods=['GET'])
+def get_job_stats():
+    """Job executor workers, queue length and job counts by status"""
+    return jsonify({
+        'success': True,
+        'jobs': job_runner.stats()
+    })
+
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job status and progress"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown job'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
+
+@api_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get a finished job's result (202 with the job while it is still running)"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown job'
+        }), 404
+    
+    if not job.done.is_set():
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        }), 202
+    
+    return render_job_result(job)
+
+
 # ============= Event/Log Endpoints =============
 
 @api_bp.route('/events/<int:sim_id>', methods=['GET'])
@@ -431,14 +1415,9 @@ def get_events(sim_id):
     event_type = request.args.get('type')
     limit = request.args.get('limit', 100, type=int)
     
-    query = Event.query.filter_by(simulation_id=sim_id)
-    
-    if severity:
-        query = query.filter_by(severity=severity)
-    if event_type:
-        query = query.filter_by(event_type=event_type)
-    
-    events = query.order_by(Event.timestamp.desc()).limit(limit).all()
+    simulation = db.session.get(Simulation, sim_id)
+    events = history_events(sim_id, simulation, newest_first=True, limit=limit,
+                            event_type=event_type, severity=severity)
     
     return jsonify({
         'success': True,
@@ -446,6 +1425,36 @@ def get_events(sim_id):
     })
 
 
+@api_bp.route('/events/<int:sim_id>/search', methods=['GET'])
+def search_simulation_events(sim_id):
+    """Full-text search over event messages and metadata, ranked and paginated"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Search query (q) is required'
+        }), 400
+    
+    try:
+        result = search_events(
+            simulation,
+            query,
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int),
+            severity=request.args.get('severity'),
+            event_type=request.args.get('type')
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, 'query': query, **result})
+
+
 # ============= Statistics Endpoints =============
 
 @api_bp.route('/statistics/<int:sim_id>', methods=['GET'])
@@ -453,15 +1462,23 @@ def get_statistics(sim_id):
     """Get simulation statistics"""
     simulation = Simulation.query.get_or_404(sim_id)
     
-    # Count messages
-    total_messages = db.session.query(Message).join(IPCChannel).filter(
-        IPCChannel.simulation_id == sim_id
-    ).count()
+    # Exact aggregates: flush pending counts, seed channels recorded before stats existed
+    recorder = message_recorders.get(sim_id)
+    if recorder:
+        recorder.flush(db.session)
+    for channel in simulation.ipc_channels:
+        if channel.stats is None:
+            ChannelStats.seed(db.session, channel.id)
+    db.session.commit()
     
-    # Calculate average latency
-    avg_latency = db.session.query(db.func.avg(Message.delay_ms)).join(IPCChannel).filter(
+    # Count messages and calculate average latency
+    total_messages, delay_sum = db.session.query(
+        db.func.coalesce(db.func.sum(ChannelStats.message_count), 0),
+        db.func.coalesce(db.func.sum(ChannelStats.delay_sum_ms), 0)
+    ).join(IPCChannel).filter(
         IPCChannel.simulation_id == sim_id
-    ).scalar() or 0
+    ).one()
+    avg_latency = delay_sum / total_messages if total_messages else 0
     
     # Count deadlocks
     deadlock_count = Event.query.filter_by(
@@ -483,21 +1500,68 @@ def get_statistics(sim_id):
             'total_messages': total_messages,
             'avg_latency_ms': round(avg_latency, 2),
             'deadlock_count': deadlock_count,
-            'ipc_distribution': ipc_distribution
+            'ipc_distribution': ipc_distribution,
+            'sampling': recorder.summary() if recorder else None
         }
     })
 
 
+@api_bp.route('/statistics/compare', methods=['GET'])
+def compare_statistics():
+    """Compare statistics of several simulations (?ids=1,2,3)"""
+    try:
+        sim_ids = [int(part) for part in request.args.get('ids', '').split(',') if part.strip()]
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'ids must be a comma-separated list of simulation ids'
+        }), 400
+    sim_ids = list(dict.fromkeys(sim_ids))
+    if not sim_ids:
+        return jsonify({
+            'success': False,
+            'error': 'ids is required'
+        }), 400
+    if len(sim_ids) > Config.COMPARE_MAX_SIMULATIONS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {Config.COMPARE_MAX_SIMULATIONS} simulations can be compared'
+        }), 400
+    
+    # Same exact aggregates as /statistics: flush pending counts, seed channels
+    # recorded before stats existed
+    for sim_id in sim_ids:
+        recorder = message_recorders.get(sim_id)
+        if recorder:
+            recorder.flush(db.session)
+    unseeded = db.session.query(IPCChannel.id, IPCChannel.simulation_id).outerjoin(
+        ChannelStats, ChannelStats.channel_id == IPCChannel.id
+    ).filter(
+        IPCChannel.simulation_id.in_(sim_ids),
+        ChannelStats.channel_id.is_(None)
+    ).all()
+    for channel_id, sim_id in unseeded:
+        with shards.scope(sim_id):
+            ChannelStats.seed(db.session, channel_id)
+            db.session.flush()
+    db.session.commit()
+    
+    results, missing, cached = comparator.compare(sim_ids)
+    return jsonify({
+        'success': True,
+        'simulations': results,
+        'missing': missing,
+        'cached': cached
+    })
+
+
 # ============= Deadlock Detection =============
 
-@api_bp.route('/deadlock/detect/<int:sim_id>', methods=['GET'])
-def detect_deadlock(sim_id):
-    """Detect deadlocks in simulation based on channel structure"""
-    simulation = Simulation.query.get_or_404(sim_id)
-    detector = get_deadlock_detector(sim_id)
-    
-    # Reset detector state
-    detector.reset()
+def deadlock_detection_job(sim_id, method, report):
+    """Build the wait-for graph from channel structure and look for deadlocks"""
+    simulation = db.session.get(Simulation, sim_id)
+    # Fresh detector per run: jobs for one simulation may run concurrently
+    detector = DeadlockDetector()
     
     # Build dependency graph from channels
     # Each channel represents: sender waits for receiver to consume
@@ -506,11 +1570,16 @@ def detect_deadlock(sim_id):
         # and the channel is held by the receiver process
         detector.add_wait(channel.sender_id, channel.id)
         detector.add_hold(channel.receiver_id, channel.id)
+        if method == 'reduction':
+            channel_config = json.loads(channel.config) if channel.config else {}
+            detector.set_instances(channel.id, channel_instances(channel_config, channel.ipc_type))
+    report(0.3, 'graph')
     
     # Analyze for deadlock
-    result = detector.analyze_deadlock(simulation.processes)
+    result = detector.analyze_deadlock(simulation.processes, method)
+    report(0.9, 'analysis')
     
-    # Log if deadlock found
+    # Log if deadlock found (once per data version, since results are cached)
     if result['deadlock_found']:
         event = Event(
             simulation_id=sim_id,
@@ -520,85 +1589,518 @@ def detect_deadlock(sim_id):
             event_metadata=json.dumps(result)
         )
         db.session.add(event)
+        record_deadlock(sim_id)
         db.session.commit()
     
+    return result
+
+
+@api_bp.route('/deadlock/detect/<int:sim_id>', methods=['GET'])
+def detect_deadlock(sim_id):
+    """Detect deadlocks in simulation based on channel structure (?async=1 runs it as a job)"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    
+    # Detection method: ?method= overrides the simulation config
+    sim_config = json.loads(simulation.config) if simulation.config else {}
+    method = request.args.get('method') or sim_config.get('deadlock_detection', Config.DEADLOCK_DETECTION)
+    if method not in DETECTION_METHODS:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown detection method: {method} (expected one of {", ".join(DETECTION_METHODS)})'
+        }), 400
+    
+    return run_job(
+        'deadlock_detection', sim_id, (method,), f'v{simulation.version}',
+        lambda report: deadlock_detection_job(sim_id, method, report)
+    )
+
+
+# ============= Deadlock Avoidance =============
+
+@api_bp.route('/avoidance/<int:sim_id>', methods=['GET'])
+def get_avoidance_state(sim_id):
+    """Get Banker's-algorithm matrices and current safety"""
+    Simulation.query.get_or_404(sim_id)
+    avoider = get_deadlock_avoider(sim_id)
+    
     return jsonify({
         'success': True,
-        **result
+        **avoider.state()
     })
 
 
-# ============= Bottleneck Analysis =============
-
-@api_bp.route('/bottleneck/analyze/<int:sim_id>', methods=['GET'])
-def analyze_bottleneck(sim_id):
-    """Analyze bottlenecks in simulation"""
+@api_bp.route('/avoidance/<int:sim_id>/resources', methods=['POST'])
+def declare_avoidance_resources(sim_id):
+    """Declare multi-instance resources; channels can be included as resources"""
     simulation = Simulation.query.get_or_404(sim_id)
-    analyzer = get_bottleneck_analyzer(sim_id)
+    data = request.json or {}
+    avoider = get_deadlock_avoider(sim_id)
     
-    process_analysis = analyzer.analyze_processes(simulation.processes)
-    channel_analysis = analyzer.analyze_channels(simulation.ipc_channels)
+    resources = data.get('resources', {})
+    if not isinstance(resources, dict):
+        return jsonify({
+            'success': False,
+            'error': 'resources must map resource names to instance counts'
+        }), 400
+    resources = dict(resources)
+    
+    if data.get('include_channels'):
+        for channel in simulation.ipc_channels:
+            channel_config = json.loads(channel.config) if channel.config else {}
+            try:
+                resources[f'channel_{channel.id}'] = channel_instances(channel_config, channel.ipc_type)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': f'Channel {channel.id} has an invalid instance count in its config'
+                }), 400
+    
+    # Check every count first so a bad one leaves the state unchanged
+    errors = [error for error in (
+        avoider.resource_error(resource, instances) for resource, instances in resources.items()
+    ) if error]
+    if errors:
+        return jsonify({
+            'success': False,
+            'error': errors[0],
+            'details': errors
+        }), 400
     
-    bottlenecks = [p for p in process_analysis if p['is_bottleneck']]
-    suggestions = analyzer.get_suggestions(bottlenecks)
+    for resource, instances in resources.items():
+        avoider.add_resource(resource, instances)
+    
+    return jsonify({
+        'success': True,
+        **avoider.state()
+    })
+
+
+@api_bp.route('/avoidance/<int:sim_id>/claim', methods=['POST'])
+def declare_avoidance_claim(sim_id):
+    """Declare a process's maximum claim"""
+    Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    avoider = get_deadlock_avoider(sim_id)
+    
+    success, info = avoider.declare_claim(data.get('process_id'), data.get('maximum', {}))
+    
+    return jsonify({
+        'success': success,
+        'info': info
+    }), 200 if success else 400
+
+
+@api_bp.route('/avoidance/<int:sim_id>/request', methods=['POST'])
+def request_avoidance_resources(sim_id):
+    """Request resources; denied with 409 if granting would be unsafe"""
+    Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    process_id = data.get('process_id')
+    amounts = data.get('request', {})
+    avoider = get_deadlock_avoider(sim_id)
+    
+    error = avoider.amounts_error(process_id, amounts)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
     
-    # Log bottlenecks
-    for bottleneck in bottlenecks:
+    granted, info = avoider.request(process_id, amounts)
+    
+    if not granted:
         event = Event(
             simulation_id=sim_id,
-            process_id=bottleneck['process_id'],
-            event_type='bottleneck_detected',
+            process_id=process_id,
+            event_type='resource_request_denied',
             severity='warning',
-            message=f'Bottleneck: {bottleneck["process_name"]} ({bottleneck["avg_delay"]}ms avg)'
+            message=info,
+            event_metadata=json.dumps({'request': amounts})
         )
         db.session.add(event)
+        db.session.commit()
+        
+        return jsonify({
+            'success': False,
+            'granted': False,
+            'error': info,
+            'available': avoider.available.tolist()
+        }), 409
     
-    db.session.commit()
+    return jsonify({
+        'success': True,
+        'granted': True,
+        'info': info,
+        'available': avoider.available.tolist()
+    })
+
+
+@api_bp.route('/avoidance/<int:sim_id>/release', methods=['POST'])
+def release_avoidance_resources(sim_id):
+    """Release resources held by a process (all of them if none listed)"""
+    Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    process_id = data.get('process_id')
+    amounts = data.get('release')
+    avoider = get_deadlock_avoider(sim_id)
+    
+    error = avoider.amounts_error(process_id, {} if amounts is None else amounts, 'release')
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    success, info = avoider.release(process_id, amounts)
+    if not success:
+        return jsonify({
+            'success': False,
+            'error': info
+        }), 400
     
     return jsonify({
         'success': True,
+        'available': avoider.available.tolist()
+    })
+
+
+# ============= CPU Scheduling =============
+
+@api_bp.route('/scheduler/<int:sim_id>/run', methods=['POST'])
+def run_scheduler(sim_id):
+    """Schedule the simulation's processes (FCFS, RR, priority or MLFQ) interleaved with IPC blocking"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    data = request.json or {}
+    policy = data.get('policy', Config.SCHEDULER_POLICY)
+    
+    if policy not in SCHEDULING_POLICIES:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown scheduling policy: {policy}'
+        }), 400
+    
+    try:
+        scheduler = CPUScheduler(
+            policy,
+            quantum=data.get('quantum', Config.SCHEDULER_QUANTUM),
+            mlfq_levels=data.get('mlfq_levels', Config.SCHEDULER_MLFQ_LEVELS),
+            mlfq_boost=data.get('mlfq_boost', Config.SCHEDULER_MLFQ_BOOST)
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    # Explicit specs bypass the stored topology (useful for large synthetic runs)
+    specs = data.get('specs')
+    if specs is None:
+        burst_range = data.get('burst_range', Config.SCHEDULER_BURST_RANGE)
+        arrival_window = data.get('arrival_window', 0)
+        if not (isinstance(burst_range, (list, tuple)) and len(burst_range) == 2
+                and all(is_int(value) for value in burst_range) and burst_range[0] <= burst_range[1]):
+            return jsonify({
+                'success': False,
+                'error': 'burst_range must be [low, high] positive integers with low <= high'
+            }), 400
+        if not is_int(arrival_window, minimum=0):
+            return jsonify({
+                'success': False,
+                'error': 'arrival_window must be a non-negative integer'
+            }), 400
+        overrides = data.get('workload')
+        if overrides is not None and not (isinstance(overrides, dict)
+                                          and all(isinstance(value, dict) for value in overrides.values())):
+            return jsonify({
+                'success': False,
+                'error': 'workload must map process ids to override objects'
+            }), 400
+        specs = build_workload(
+            simulation.processes,
+            simulation.ipc_channels,
+            get_simulator(sim_id),
+            overrides=overrides,
+            seed=data.get('seed'),
+            burst_range=tuple(burst_range),
+            arrival_window=arrival_window
+        )
+    
+    errors = validate_specs(specs)
+    if errors:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid workload',
+            'details': errors[:100]
+        }), 400
+    
+    result = scheduler.run(specs)
+    summary = result['summary']
+    
+    # Log event
+    event = Event(
+        simulation_id=sim_id,
+        event_type='scheduler_run',
+        severity='info',
+        message=f'{policy.upper()} schedule: {summary["process_count"]} processes, '
+                f'{summary["cpu_utilization"]}% CPU, {summary["avg_waiting"]}ms avg wait',
+        event_metadata=json.dumps(summary)
+    )
+    db.session.add(event)
+    db.session.commit()
+    
+    response = {'success': True, 'summary': summary}
+    if data.get('include_processes', True):
+        response['processes'] = result['processes']
+    return jsonify(response)
+
+
+# ============= Graph (Level of Detail) =============
+
+@api_bp.route('/graph/<int:sim_id>', methods=['GET'])
+def get_graph(sim_id):
+    """
+    Viewport of the simulation graph at a detail level.
+    Query: level (0 components, 1 communities, 2 processes) or zoom,
+    x0/y0/x1/y1 viewport bounds, since=<version> for an incremental diff
+    """
+    Simulation.query.get_or_404(sim_id)
+    
+    if 'level' in request.args:
+        level = min(max(request.args.get('level', type=int, default=LEVEL_PROCESSES), 0), LEVEL_PROCESSES)
+    elif 'zoom' in request.args:
+        level = level_for_zoom(request.args.get('zoom', type=float, default=1.0), Config.GRAPH_ZOOM_LEVELS)
+    else:
+        level = LEVEL_PROCESSES
+    
+    bounds = None
+    if all(k in request.args for k in ('x0', 'y0', 'x1', 'y1')):
+        try:
+            bounds = tuple(float(request.args[k]) for k in ('x0', 'y0', 'x1', 'y1'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Viewport bounds must be numbers'}), 400
+    
+    layout = graph_service.layout(sim_id)
+    view = layout.view(level, bounds)
+    response = {
+        'success': True,
+        'version': layout.version,
+        'level': level,
+        'bounds': layout.bounds()
+    }
+    
+    since = request.args.get('since', type=int)
+    previous = graph_service.find(sim_id, since) if since is not None else None
+    if previous is not None:
+        # Same level and viewport against the client's version
+        response['since'] = since
+        response['diff'] = GraphService.diff(previous.view(level, bounds), view)
+    else:
+        response['nodes'] = list(view['nodes'].values())
+        response['edges'] = list(view['edges'].values())
+    
+    return jsonify(response)
+
+
+# ============= Bottleneck Analysis =============
+
+def bottleneck_analysis_job(sim_id, report):
+    """Per-process and per-channel latency analysis with capacity-model suggestions"""
+    simulation = db.session.get(Simulation, sim_id)
+    analyzer = get_bottleneck_analyzer(sim_id)
+    
+    process_analysis = analyzer.analyze_processes(simulation.processes)
+    report(0.4, 'processes')
+    channel_analysis = analyzer.analyze_channels(simulation.ipc_channels)
+    report(0.7, 'channels')
+    
+    planner = CapacityPlanner.from_simulation(sim_id, analyzer, Config)
+    capacity = planner.plan()
+    report(0.9, 'capacity')
+    
+    # Processes the model puts near saturation are bottlenecks even at low measured delays
+    utilization = {p['process_id']: p['utilization'] for p in capacity['processes']}
+    for process in process_analysis:
+        process['utilization'] = utilization.get(process['process_id'])
+        if (process['utilization'] or 0) >= Config.CAPACITY_UTILIZATION_THRESHOLD:
+            process['is_bottleneck'] = True
+    
+    # Suggestions consider every channel type change, not just the overall top ones
+    bottlenecks = [p for p in process_analysis if p['is_bottleneck']]
+    suggestions = analyzer.get_suggestions(bottlenecks, {
+        **capacity, 'channel_type_changes': planner.channel_type_changes(limit=None)
+    })
+    
+    # bottleneck_detected events are logged once per latency shift as messages
+    # are recorded, so analyzing is read-only
+    return {
         'process_analysis': process_analysis,
         'channel_analysis': channel_analysis,
+        'capacity': capacity['sustainable'],
         'suggestions': suggestions
+    }
+
+
+@api_bp.route('/bottleneck/analyze/<int:sim_id>', methods=['GET'])
+def analyze_bottleneck(sim_id):
+    """Analyze bottlenecks in simulation (?async=1 runs it as a job)"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    
+    # Recorded messages bump the version through their channel stats
+    return run_job(
+        'bottleneck_analysis', sim_id, (), f'v{simulation.version}',
+        lambda report: bottleneck_analysis_job(sim_id, report)
+    )
+
+
+@api_bp.route('/capacity/<int:sim_id>', methods=['GET'])
+def plan_capacity(sim_id):
+    """
+    Queueing-model capacity report: per-process utilization, expected wait
+    and saturation point, the sustainable message rate, and the channel
+    type changes with the biggest effect. ?rate=<msgs/s> adds the load the
+    topology would carry at that offered rate.
+    """
+    Simulation.query.get_or_404(sim_id)
+    target_rate = request.args.get('rate')
+    if target_rate is not None:
+        try:
+            target_rate = float(target_rate)
+        except ValueError:
+            target_rate = None
+        if target_rate is None or not math.isfinite(target_rate) or target_rate <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'rate must be a positive number'
+            }), 400
+    
+    planner = CapacityPlanner.from_simulation(sim_id, get_bottleneck_analyzer(sim_id), Config)
+    return jsonify({
+        'success': True,
+        **planner.plan(target_rate)
     })
 
 
-# ============= Export Endpoints =============
+# ============= Time Travel =============
 
-@api_bp.route('/export/logs/<int:sim_id>', methods=['GET'])
-def export_logs(sim_id):
-    """Export logs as JSON"""
-    format_type = request.args.get('format', 'json')
+@api_bp.route('/timetravel/<int:sim_id>', methods=['GET'])
+def time_travel_state(sim_id):
+    """Processes, channels and states as they were at ?at= (ISO 8601 or epoch seconds, UTC)"""
+    Simulation.query.get_or_404(sim_id)
+    at = request.args.get('at')
+    if not at:
+        return jsonify({
+            'success': False,
+            'error': 'at is required'
+        }), 400
+    try:
+        moment, _ = parse_timestamp(at)
+    except (ValueError, OverflowError, OSError):
+        return jsonify({
+            'success': False,
+            'error': f'Invalid timestamp: {at}'
+        }), 400
     
-    events = Event.query.filter_by(simulation_id=sim_id).order_by(Event.timestamp).all()
+    return jsonify({
+        'success': True,
+        'simulation_id': sim_id,
+        'at': moment.isoformat(),
+        **time_travel.reconstruct(sim_id, moment)
+    })
+
+
+@api_bp.route('/timetravel/<int:sim_id>/snapshots', methods=['GET'])
+def list_state_snapshots(sim_id):
+    """Snapshot index of a simulation, with the time range that can be rebuilt"""
+    simulation = Simulation.query.get_or_404(sim_id)
+    snapshots = time_travel.snapshots(sim_id)
+    start = simulation.started_at.isoformat() if simulation.started_at else None
+    if snapshots and (start is None or snapshots[0]['taken_at'] < start):
+        start = snapshots[0]['taken_at']
+    
+    return jsonify({
+        'success': True,
+        'snapshots': snapshots,
+        'start': start,
+        'now': datetime.utcnow().isoformat()
+    })
+
+
+@api_bp.route('/timetravel/<int:sim_id>/snapshots', methods=['POST'])
+def take_state_snapshot(sim_id):
+    """Snapshot a simulation now (e.g. to mark a moment before a risky change)"""
+    Simulation.query.get_or_404(sim_id)
+    snapshot = time_travel.take(sim_id)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'snapshot': snapshot.to_dict()
+    }), 201
+
+
+# ============= Export Endpoints =============
+
+def log_export_job(sim_id, format_type, report):
+    """Serialize a simulation's event history as JSON or CSV"""
+    simulation = db.session.get(Simulation, sim_id)
+    events = history_events(sim_id, simulation, progress=lambda done: report(0.8 * done, 'events'))
     
     if format_type == 'json':
-        return jsonify({
+        content = {
             'simulation_id': sim_id,
             'exported_at': datetime.utcnow().isoformat(),
             'events': [e.to_dict() for e in events]
-        })
+        }
+        # Large exports are handed over serialized so the job runner can
+        # keep them on disk (served as JSON, without msgpack negotiation)
+        text = json.dumps(content)
+        return {
+            'format': 'json',
+            'filename': f'simulation_{sim_id}_logs.json',
+            'content': text if len(text) > Config.JOB_SPILL_BYTES else content
+        }
     
     # CSV format
-    elif format_type == 'csv':
-        import io
-        import csv
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Timestamp', 'Type', 'Severity', 'Message', 'Process ID'])
-        
-        for event in events:
-            writer.writerow([
-                event.id,
-                event.timestamp.isoformat(),
-                event.event_type,
-                event.severity,
-                event.message,
-                event.process_id or ''
-            ])
-        
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/csv',
-            'Content-Disposition': f'attachment; filename=simulation_{sim_id}_logs.csv'
-        }
+    import io
+    import csv
+    
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['ID', 'Timestamp', 'Type', 'Severity', 'Message', 'Process ID'])
+    
+    for event in events:
+        writer.writerow([
+            event.id,
+            event.timestamp.isoformat(),
+            event.event_type,
+            event.severity,
+            event.message,
+            event.process_id or ''
+        ])
+    
+    return {
+        'format': 'csv',
+        'filename': f'simulation_{sim_id}_logs.csv',
+        'content': output.getvalue()
+    }
+
+
+@api_bp.route('/export/logs/<int:sim_id>', methods=['GET'])
+def export_logs(sim_id):
+    """Export logs as JSON or CSV (?async=1 runs it as a job)"""
+    format_type = request.args.get('format', 'json')
+    if format_type not in ('json', 'csv'):
+        return jsonify({
+            'success': False,
+            'error': f'Unknown export format: {format_type}'
+        }), 400
+    
+    # Events are appended without touching versioned rows, so the newest
+    # event id is part of the data version
+    simulation = db.session.get(Simulation, sim_id)
+    last_event = last_event_id(sim_id, simulation)
+    data_version = f'v{simulation.version if simulation else 0}-e{last_event}'
+    
+    return run_job(
+        'log_export', sim_id, (format_type,), data_version,
+        lambda report: log_export_job(sim_id, format_type, report)
+    )
@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from collections import defaultdict
+
+
+class TokenBucket:
+    """Refills at `rate` tokens/sec up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self):
+        self.tokens -= 1
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    """
+    Admission control for write requests.
+
+    Each simulation has its own token bucket and all simulations share a
+    global one, so a single noisy simulation is throttled before it can
+    starve the others. Admitted requests then need one of max_inflight
+    slots; requests wait up to queue_timeout for a slot and are rejected
+    after that instead of piling up on the SQLite write lock.
+
+    Under eventlet (nothing monkey-patched) waiting on the condition would
+    block the whole hub, including the request that would free the slot,
+    so callers there pass a green sleep and the wait polls instead.
+    """
+
+    POLL_INTERVAL = 0.005  # seconds between slot checks when waiting with sleep
+
+    def __init__(self, sim_rate, sim_burst, global_rate, global_burst, max_inflight, queue_timeout):
+        self.sim_rate = sim_rate
+        self.sim_burst = sim_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets = {}  # simulation_id -> TokenBucket
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+
+        self.lock = threading.Lock()
+        self.slot_free = threading.Condition(self.lock)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = defaultdict(int)  # reason -> count
+        self.rejected_by_simulation = defaultdict(int)
+
+    def _bucket(self, simulation_id):
+        bucket = self.buckets.get(simulation_id)
+        if bucket is None:
+            bucket = self.buckets[simulation_id] = TokenBucket(self.sim_rate, self.sim_burst)
+        return bucket
+
+    def _reject(self, reason, simulation_id, retry_after):
+        self.rejected[reason] += 1
+        if simulation_id is not None:
+            self.rejected_by_simulation[simulation_id] += 1
+        return False, retry_after, reason
+
+    def acquire(self, simulation_id=None, sleep=None):
+        """
+        Admit a write request; on success the caller must release().
+        sleep (socketio.sleep) waits for a slot cooperatively.
+        Returns: (admitted, retry_after_seconds, reason)
+        """
+        with self.lock:
+            now = time.monotonic()
+            # Check both buckets before taking from either, and refund both if
+            # no slot frees up in time, so a rejection costs nothing
+            wait = self.global_bucket.wait_time(now)
+            if wait > 0:
+                return self._reject('global_rate', simulation_id, wait)
+            bucket = self._bucket(simulation_id) if simulation_id is not None else None
+            if bucket is not None:
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    return self._reject('simulation_rate', simulation_id, wait)
+                bucket.take()
+            self.global_bucket.take()
+
+            if self.in_flight >= self.max_inflight:
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+                try:
+                    deadline = now + self.queue_timeout
+                    while self.in_flight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            if bucket is not None:
+                                bucket.refund()
+                            self.global_bucket.refund()
+                            return self._reject('queue_timeout', simulation_id, self.queue_timeout)
+                        if sleep is None:
+                            self.slot_free.wait(remaining)
+                            continue
+                        self.lock.release()
+                        try:
+                            sleep(min(self.POLL_INTERVAL, remaining))
+                        finally:
+                            self.lock.acquire()
+                finally:
+                    self.queued -= 1
+
+            self.in_flight += 1
+            self.admitted += 1
+            return True, 0.0, None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.slot_free.notify()
+
+    def forget(self, simulation_id):
+        with self.lock:
+            self.buckets.pop(simulation_id, None)
+            self.rejected_by_simulation.pop(simulation_id, None)
+
+    def metrics(self):
+        with self.lock:
+            now = time.monotonic()
+            self.global_bucket.wait_time(now)
+            return {
+                'in_flight': self.in_flight,
+                'max_inflight': self.max_inflight,
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queued,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'rejected_by_simulation': dict(self.rejected_by_simulation),
+                'global_tokens': round(self.global_bucket.tokens, 1),
+                'simulation_tokens': {
+                    simulation_id: round(min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate), 1)
+                    for simulation_id, bucket in self.buckets.items()
+                }
+            }
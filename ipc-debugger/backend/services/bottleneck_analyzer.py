@@ -1,24 +1,95 @@
+import copy
+import time
 from collections import defaultdict
 from datetime import datetime, timedelta
+from backend.services.latency_monitor import LatencyShiftDetector
+
+class DelayStats:
+    """Running delay aggregates: constant memory however many messages are recorded"""
+
+    __slots__ = ('count', 'total', 'squares', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.max = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, delay_ms):
+        self.count += 1
+        self.total += delay_ms
+        self.squares += delay_ms * delay_ms
+        self.max = max(self.max, delay_ms)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def second_moment(self):
+        return self.squares / self.count if self.count else 0
+
+    def copy(self):
+        clone = DelayStats()
+        clone.count, clone.total, clone.squares, clone.max = self.count, self.total, self.squares, self.max
+        return clone
+
 
 class BottleneckAnalyzer:
     """Analyzes communication patterns to identify bottlenecks"""
     
-    def __init__(self, threshold_ms=500):
+    def __init__(self, threshold_ms=500, detector_settings=None):
         self.threshold_ms = threshold_ms
-        self.process_delays = defaultdict(list)  # process_id -> [delays]
-        self.channel_delays = defaultdict(list)  # channel_id -> [delays]
+        self.detector_settings = detector_settings or {}
+        self.process_delays = defaultdict(DelayStats)  # process_id -> DelayStats
+        self.channel_delays = defaultdict(DelayStats)  # channel_id -> DelayStats
+        self.detectors = {}  # ('process'|'channel', id) -> LatencyShiftDetector
+        self.channel_arrivals = {}  # channel_id -> [first, last, count] (monotonic seconds)
+    
+    def record_transfer(self, sender_id, receiver_id, channel_id, delay_ms):
+        """Record a message's delay against both endpoints and the channel"""
+        self.process_delays[sender_id].add(delay_ms)
+        self.process_delays[receiver_id].add(delay_ms)
+        self.channel_delays[channel_id].add(delay_ms)
+    
+    def record_message(self, sender_id, receiver_id, channel_id, delay_ms):
+        """
+        Record a delivered message and run the streaming shift detectors
+        for the channel and both endpoints
+        Returns: [{'scope', 'id', 'state': 'started'|'ended', ...detector state}]
+        """
+        self.record_transfer(sender_id, receiver_id, channel_id, delay_ms)
+        
+        now = time.monotonic()
+        arrivals = self.channel_arrivals.get(channel_id)
+        if arrivals is None:
+            self.channel_arrivals[channel_id] = [now, now, 1]
+        else:
+            arrivals[1] = now
+            arrivals[2] += 1
+        
+        transitions = []
+        for key in (('channel', channel_id), ('process', sender_id), ('process', receiver_id)):
+            detector = self.detectors.get(key)
+            if detector is None:
+                detector = self.detectors[key] = LatencyShiftDetector(**self.detector_settings)
+            state = detector.update(delay_ms)
+            if state:
+                transitions.append({'scope': key[0], 'id': key[1], 'state': state, **detector.state()})
+        return transitions
     
-    def record_delay(self, process_id, channel_id, delay_ms):
-        """Record a communication delay"""
-        self.process_delays[process_id].append(delay_ms)
-        self.channel_delays[channel_id].append(delay_ms)
+    def shifting(self, scope):
+        """Ids currently in a latency shift"""
+        return {key[1] for key, detector in self.detectors.items()
+                if key[0] == scope and detector.in_shift}
     
-    def get_average_delay(self, delays):
-        """Calculate average delay"""
-        if not delays:
-            return 0
-        return sum(delays) / len(delays)
+    def arrival_rate(self, channel_id):
+        """Observed messages/sec on a channel (0 until two messages were seen)"""
+        arrivals = self.channel_arrivals.get(channel_id)
+        if arrivals is None or arrivals[2] < 2 or arrivals[1] <= arrivals[0]:
+            return 0.0
+        return (arrivals[2] - 1) / (arrivals[1] - arrivals[0])
     
     def analyze_processes(self, processes):
         """
@@ -28,18 +99,21 @@ class BottleneckAnalyzer:
             'process_name': str,
             'avg_delay': float,
             'max_delay': int,
+            'latency_shift': bool,
             'is_bottleneck': bool
         }]
         """
         results = []
+        shifting = self.shifting('process')
         
         for process in processes:
-            delays = self.process_delays.get(process.id, [])
+            delays = self.process_delays.get(process.id)
             
             if delays:
-                avg_delay = self.get_average_delay(delays)
-                max_delay = max(delays)
-                is_bottleneck = avg_delay > self.threshold_ms
+                avg_delay = delays.mean()
+                max_delay = delays.max
+                # A recent shift counts even when the lifetime average hides it
+                is_bottleneck = avg_delay > self.threshold_ms or process.id in shifting
                 
                 results.append({
                     'process_id': process.id,
@@ -47,6 +121,7 @@ class BottleneckAnalyzer:
                     'avg_delay': round(avg_delay, 2),
                     'max_delay': max_delay,
                     'message_count': len(delays),
+                    'latency_shift': process.id in shifting,
                     'is_bottleneck': is_bottleneck
                 })
         
@@ -61,17 +136,19 @@ class BottleneckAnalyzer:
             'channel_id': int,
             'ipc_type': str,
             'avg_delay': float,
+            'latency_shift': bool,
             'is_slow': bool
         }]
         """
         results = []
+        shifting = self.shifting('channel')
         
         for channel in channels:
-            delays = self.channel_delays.get(channel.id, [])
+            delays = self.channel_delays.get(channel.id)
             
             if delays:
-                avg_delay = self.get_average_delay(delays)
-                is_slow = avg_delay > self.threshold_ms
+                avg_delay = delays.mean()
+                is_slow = avg_delay > self.threshold_ms or channel.id in shifting
                 
                 results.append({
                     'channel_id': channel.id,
@@ -80,35 +157,99 @@ class BottleneckAnalyzer:
                     'receiver': channel.receiver.process_name,
                     'avg_delay': round(avg_delay, 2),
                     'message_count': len(delays),
+                    'latency_shift': channel.id in shifting,
                     'is_slow': is_slow
                 })
         
         results.sort(key=lambda x: x['avg_delay'], reverse=True)
         return results
     
-    def get_suggestions(self, bottlenecks):
-        """Generate optimization suggestions"""
+    def get_suggestions(self, bottlenecks, plan):
+        """
+        Optimization suggestions for bottleneck processes, from the capacity
+        model (CapacityPlanner.plan()): utilization and saturation point, the
+        inbound channel carrying most of the load, and the channel type
+        changes that help this process most
+        """
+        processes = {p['process_id']: p for p in plan['processes']}
         suggestions = []
         
         for bottleneck in bottlenecks:
-            if bottleneck['is_bottleneck']:
-                process_name = bottleneck['process_name']
-                avg_delay = bottleneck['avg_delay']
+            if not bottleneck['is_bottleneck']:
+                continue
+            process_name = bottleneck['process_name']
+            avg_delay = bottleneck['avg_delay']
+            
+            model = processes.get(bottleneck['process_id'])
+            if avg_delay > self.threshold_ms:
+                issue = f'High average delay: {avg_delay}ms'
+            elif bottleneck.get('latency_shift'):
+                issue = f'Recent latency shift (lifetime average {avg_delay}ms)'
+            else:
+                issue = f'Modeled utilization {model["utilization"]:.0%} (average delay {avg_delay}ms)'
+            
+            tips = []
+            if model is None or not model['utilization']:
+                tips.append('Not enough inbound traffic observed to model this process')
+            else:
+                if model['saturated']:
+                    tips.append(f'Saturated: utilization {model["utilization"]:.0%} at '
+                                f'{model["arrival_rate"]} msg/s, so its queue grows without bound')
+                else:
+                    tips.append(f'Utilization {model["utilization"]:.0%}, expected wait {model["expected_wait_ms"]}ms; '
+                                f'saturates at {model["saturation_rate"]} msg/s ({model["headroom"]}x current load)')
                 
-                suggestions.append({
-                    'process': process_name,
-                    'issue': f'High average delay: {avg_delay}ms',
-                    'suggestions': [
-                        'Consider using shared memory instead of pipes/queues',
-                        'Reduce message size',
-                        'Implement asynchronous communication',
-                        'Check for resource contention'
-                    ]
-                })
+                # Inbound channel contributing the most work
+                inbound = [c for c in plan['channels'] if c['receiver_id'] == bottleneck['process_id']
+                           and c['arrival_rate'] > 0 and c['service_ms']]
+                if inbound:
+                    top = max(inbound, key=lambda c: c['arrival_rate'] * c['service_ms'])
+                    share = top['arrival_rate'] * top['service_ms'] / 1000 / model['utilization']
+                    tips.append(f'{top["name"]} ({top["ipc_type"]}) accounts for {share:.0%} of its load')
+                
+                # Channel type change that relieves this process the most
+                changes = [c for c in plan['channel_type_changes'] if c['receiver_id'] == bottleneck['process_id']]
+                if changes:
+                    best = min(changes, key=lambda c: c['utilization'])
+                    if best['utilization'] < model['utilization']:
+                        tip = (f'Switch {best["name"]} from {best["from_type"]} to {best["to_type"]}: '
+                               f'utilization {model["utilization"]:.0%} → {best["utilization"]:.0%}')
+                        if best['capacity_gain'] and best['capacity_gain'] > 1:
+                            tip += f', sustainable load x{best["capacity_gain"]}'
+                        tips.append(tip)
+            
+            if bottleneck.get('latency_shift'):
+                tips.append('Latency shifted recently: check for resource contention')
+            
+            suggestions.append({
+                'process': process_name,
+                'issue': issue,
+                'suggestions': tips
+            })
         
         return suggestions
     
+    def clone(self, process_map, channel_map):
+        """Copy recorded delays onto remapped process/channel ids"""
+        clone = BottleneckAnalyzer(self.threshold_ms, self.detector_settings)
+        for process_id, delays in self.process_delays.items():
+            if process_id in process_map:
+                clone.process_delays[process_map[process_id]] = delays.copy()
+        for channel_id, delays in self.channel_delays.items():
+            if channel_id in channel_map:
+                clone.channel_delays[channel_map[channel_id]] = delays.copy()
+        for (scope, key), detector in self.detectors.items():
+            mapping = process_map if scope == 'process' else channel_map
+            if key in mapping:
+                clone.detectors[(scope, mapping[key])] = copy.copy(detector)
+        for channel_id, arrivals in self.channel_arrivals.items():
+            if channel_id in channel_map:
+                clone.channel_arrivals[channel_map[channel_id]] = list(arrivals)
+        return clone
+    
     def reset(self):
         """Reset analyzer state"""
         self.process_delays.clear()
         self.channel_delays.clear()
+        self.detectors.clear()
+        self.channel_arrivals.clear()
@@ -0,0 +1,309 @@
+import json
+import numpy as np
+from backend.models import db, Process, IPCChannel
+
+IPC_TYPES = ('pipe', 'queue', 'shmem')
+
+
+def uniform_moments(low, high):
+    """Mean and second moment of random.randint(low, high)"""
+    mean = (low + high) / 2
+    variance = ((high - low + 1) ** 2 - 1) / 12
+    return mean, variance + mean * mean
+
+
+def service_moments(ipc_type, channel_config, config):
+    """
+    Mean and second moment (ms, ms^2) of the delay IPCSimulator draws for a
+    channel type, used for channels without observations and for what-ifs
+    """
+    if ipc_type == 'queue':
+        mean, second = uniform_moments(*config.DEFAULT_QUEUE_DELAY)
+        factor = max(0.5, 1 - (channel_config.get('priority', 0) * 0.1))
+        return mean * factor, second * factor * factor
+    if ipc_type == 'shmem':
+        mean, second = uniform_moments(*config.DEFAULT_SHMEM_DELAY)
+        if channel_config.get('use_mutex', True):
+            # Independent mutex overhead adds its mean and variance
+            mutex_mean, mutex_second = uniform_moments(10, 30)
+            variance = (second - mean * mean) + (mutex_second - mutex_mean * mutex_mean)
+            mean += mutex_mean
+            second = variance + mean * mean
+        return mean, second
+    return uniform_moments(*config.DEFAULT_PIPE_DELAY)
+
+
+class CapacityPlanner:
+    """
+    Analytical capacity model of a simulation.
+
+    Each process is a single FCFS server for the messages of its inbound
+    channels: arrivals are Poisson at the observed per-channel rates and
+    service times follow the observed delay distribution of each channel
+    (mean and second moment), so every process is an M/G/1 queue and the
+    expected wait is the Pollaczek-Khinchine formula. The topology forms an
+    open network: a process forwards min(inbound, outbound) of its traffic
+    to its outbound channels in proportion to their rates and originates
+    the rest.
+    """
+
+    def __init__(self, processes, channels, config):
+        """
+        processes: [(id, name)]
+        channels: [{'id', 'ipc_type', 'sender_id', 'receiver_id', 'config',
+                    'rate' (msgs/s), 'mean_ms', 'second_ms2', 'observed'}]
+        """
+        self.config = config
+        self.process_ids = [process_id for process_id, _ in processes]
+        self.names = dict(processes)
+        index = {process_id: i for i, process_id in enumerate(self.process_ids)}
+        # Channels whose endpoints are gone cannot be modeled
+        self.channels = [c for c in channels if c['sender_id'] in index and c['receiver_id'] in index]
+        count = len(self.process_ids)
+
+        self.sender = np.array([index[c['sender_id']] for c in self.channels], dtype=np.int64)
+        self.receiver = np.array([index[c['receiver_id']] for c in self.channels], dtype=np.int64)
+        self.rate = np.array([c['rate'] for c in self.channels], dtype=np.float64)
+        self.s1 = np.array([c['mean_ms'] for c in self.channels], dtype=np.float64) / 1e3  # seconds
+        self.s2 = np.array([c['second_ms2'] for c in self.channels], dtype=np.float64) / 1e6
+
+        self.rate_in = np.bincount(self.receiver, self.rate, count)
+        self.rate_out = np.bincount(self.sender, self.rate, count)
+        self.utilization = np.bincount(self.receiver, self.rate * self.s1, count)
+        self.second_in = np.bincount(self.receiver, self.rate * self.s2, count)  # sum of rate * E[S^2]
+
+        # Routing: forwarded share of inbound traffic and external arrivals per channel
+        forwarded = np.minimum(self.rate_in, self.rate_out)
+        self.forward = np.divide(forwarded, self.rate_in, out=np.zeros(count), where=self.rate_in > 0)
+        self.share = np.divide(self.rate, self.rate_out[self.sender], out=np.zeros(len(self.channels)),
+                               where=self.rate_out[self.sender] > 0)
+        self.external = (self.rate_out - forwarded)[self.sender] * self.share
+
+    @classmethod
+    def from_simulation(cls, simulation_id, analyzer, config):
+        """Planner from the topology and the analyzer's observed rates and delays"""
+        processes = db.session.query(Process.id, Process.process_name).filter(
+            Process.simulation_id == simulation_id
+        ).order_by(Process.id).all()
+        rows = db.session.query(
+            IPCChannel.id, IPCChannel.ipc_type, IPCChannel.sender_id, IPCChannel.receiver_id, IPCChannel.config
+        ).filter(IPCChannel.simulation_id == simulation_id).order_by(IPCChannel.id).all()
+
+        channels = []
+        for channel_id, ipc_type, sender_id, receiver_id, channel_config in rows:
+            channel_config = json.loads(channel_config) if channel_config else {}
+            delays = analyzer.channel_delays.get(channel_id)
+            arrivals = analyzer.channel_arrivals.get(channel_id)
+            if delays:
+                mean, second = float(delays.mean()), float(delays.second_moment())
+            else:
+                mean, second = service_moments(ipc_type, channel_config, config)
+            channels.append({
+                'id': channel_id,
+                'ipc_type': ipc_type,
+                'sender_id': sender_id,
+                'receiver_id': receiver_id,
+                'config': channel_config,
+                'rate': analyzer.arrival_rate(channel_id),
+                'mean_ms': mean,
+                'second_ms2': second,
+                'observed': arrivals[2] if arrivals else 0
+            })
+        return cls(processes, channels, config)
+
+    @staticmethod
+    def _wait(utilization, second_in):
+        """M/G/1 expected queueing delay in seconds (inf when saturated)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wait = second_in / (2 * (1 - utilization))
+        return np.where(utilization < 1, np.nan_to_num(wait), np.inf)
+
+    def _channel_name(self, i):
+        channel = self.channels[i]
+        return f'{self.names[channel["sender_id"]]} → {self.names[channel["receiver_id"]]}'
+
+    @staticmethod
+    def _ms(seconds):
+        return round(float(seconds) * 1e3, 2) if np.isfinite(seconds) else None
+
+    def processes(self):
+        """Per-process utilization, expected wait and saturation point"""
+        wait = self._wait(self.utilization, self.second_in)
+        results = []
+        for i, process_id in enumerate(self.process_ids):
+            rho = float(self.utilization[i])
+            results.append({
+                'process_id': process_id,
+                'process_name': self.names[process_id],
+                'arrival_rate': round(float(self.rate_in[i]), 3),
+                'utilization': round(rho, 4),
+                'expected_wait_ms': self._ms(wait[i]),
+                # Inbound rate at which utilization reaches 1, and its ratio to the current load
+                'saturation_rate': round(float(self.rate_in[i]) / rho, 3) if rho > 0 else None,
+                'headroom': round(1 / rho, 3) if rho > 0 else None,
+                'saturated': rho >= 1
+            })
+        results.sort(key=lambda p: p['utilization'], reverse=True)
+        return results
+
+    def channels_report(self):
+        """Per-channel rate, service time and expected response time (wait at the receiver + service)"""
+        wait = self._wait(self.utilization, self.second_in)
+        results = []
+        for i, channel in enumerate(self.channels):
+            variance = float(self.s2[i] - self.s1[i] ** 2)
+            results.append({
+                'channel_id': channel['id'],
+                'name': self._channel_name(i),
+                'receiver_id': channel['receiver_id'],
+                'ipc_type': channel['ipc_type'],
+                'arrival_rate': round(float(self.rate[i]), 3),
+                'service_ms': self._ms(self.s1[i]),
+                'service_scv': round(variance / self.s1[i] ** 2, 4) if self.s1[i] > 0 else None,
+                'response_ms': self._ms(wait[self.receiver[i]] + self.s1[i]),
+                'observed_messages': channel['observed']
+            })
+        return results
+
+    def sustainable(self):
+        """
+        Largest uniform scaling of the offered load the topology sustains:
+        every rate scales linearly with the external arrivals, so it is
+        1 / max utilization.
+        """
+        total = float(self.rate.sum())
+        peak = float(self.utilization.max()) if len(self.utilization) else 0.0
+        if peak <= 0:
+            return {'observed_rate': total, 'scale': None, 'rate': None, 'bottleneck': None}
+        bottleneck = self.process_ids[int(self.utilization.argmax())]
+        return {
+            'observed_rate': round(total, 3),
+            'scale': round(1 / peak, 4),
+            'rate': round(total / peak, 3),
+            'bottleneck': {'process_id': bottleneck, 'process_name': self.names[bottleneck]}
+        }
+
+    def carried_load(self, target_rate, max_iterations=1000, tolerance=1e-9):
+        """
+        Throughput at an offered message rate (messages/s over all channels).
+        Saturated processes serve only up to their capacity, which also
+        throttles what they forward downstream; solved by fixed-point
+        iteration over the traffic equations.
+        """
+        total = float(self.rate.sum())
+        if total <= 0:
+            return None
+        scale = target_rate / total
+        count = len(self.process_ids)
+        served_in = self.rate_in * scale
+        offered = self.rate * scale
+
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            offered = scale * self.external + self.share * (self.forward * served_in)[self.sender]
+            utilization = np.bincount(self.receiver, offered * self.s1, count)
+            throttle = np.minimum(1.0, np.divide(1.0, utilization, out=np.ones(count), where=utilization > 0))
+            updated = np.bincount(self.receiver, offered, count) * throttle
+            converged = np.abs(updated - served_in).max(initial=0) <= tolerance * max(1.0, target_rate)
+            served_in = updated
+            if converged:
+                break
+
+        carried = offered * throttle[self.receiver]
+        return {
+            'offered_rate': round(float(target_rate), 3),
+            'carried_rate': round(float(carried.sum()), 3),
+            'backlog_rate': round(float((offered - carried).sum()), 3),
+            'saturated_processes': [self.names[self.process_ids[i]] for i in np.flatnonzero(utilization >= 1)],
+            'iterations': iterations,
+            'channels': [
+                {'channel_id': channel['id'], 'offered_rate': round(float(offered[i]), 3),
+                 'carried_rate': round(float(carried[i]), 3)}
+                for i, channel in enumerate(self.channels)
+            ]
+        }
+
+    def channel_type_changes(self, limit=10):
+        """
+        Effect of switching each active channel to each other IPC type, in
+        closed form: only the receiver's utilization and wait change.
+        Returns: candidates ordered by sustainable-load gain, then mean latency
+        """
+        candidates = []
+        for i, channel in enumerate(self.channels):
+            if self.rate[i] <= 0:
+                continue
+            for ipc_type in IPC_TYPES:
+                if ipc_type != channel['ipc_type']:
+                    mean, second = service_moments(ipc_type, channel['config'], self.config)
+                    candidates.append((i, ipc_type, mean / 1e3, second / 1e6))
+        total = float(self.rate.sum())
+        if not candidates or total <= 0:
+            return []
+
+        index = np.array([c[0] for c in candidates])
+        new_s1 = np.array([c[2] for c in candidates])
+        new_s2 = np.array([c[3] for c in candidates])
+        receiver = self.receiver[index]
+        rate = self.rate[index]
+
+        # Utilization and P-K wait of the receiver with the switched channel
+        rho = self.utilization[receiver] + rate * (new_s1 - self.s1[index])
+        second = self.second_in[receiver] + rate * (new_s2 - self.s2[index])
+        wait = self._wait(rho, second)
+
+        # Highest utilization among the other processes
+        order = np.argsort(self.utilization)[::-1]
+        first = order[0]
+        runner_up = self.utilization[order[1]] if len(order) > 1 else 0.0
+        others = np.where(receiver == first, runner_up, self.utilization[first])
+        peak = np.maximum(rho, others)
+        current_peak = float(self.utilization.max())
+
+        # Mean response time over all messages
+        current_wait = self._wait(self.utilization, self.second_in)
+        current_total = float((self.rate * (current_wait[self.receiver] + self.s1)).sum())
+        with np.errstate(invalid='ignore'):
+            new_total = (current_total
+                         - self.rate_in[receiver] * current_wait[receiver] - rate * self.s1[index]
+                         + self.rate_in[receiver] * wait + rate * new_s1)
+        current_mean = current_total / total
+        new_mean = new_total / total
+
+        results = []
+        for k, (i, ipc_type, _, _) in enumerate(candidates):
+            gain = current_peak / peak[k] if peak[k] > 0 else None
+            results.append({
+                'channel_id': self.channels[i]['id'],
+                'name': self._channel_name(i),
+                'receiver_id': self.channels[i]['receiver_id'],
+                'from_type': self.channels[i]['ipc_type'],
+                'to_type': ipc_type,
+                'utilization': round(float(rho[k]), 4),
+                'sustainable_scale': round(1 / float(peak[k]), 4) if peak[k] > 0 else None,
+                'capacity_gain': round(gain, 4) if gain is not None else None,
+                'mean_latency_ms': self._ms(new_mean[k]),
+                'latency_change_ms': round((new_mean[k] - current_mean) * 1e3, 2)
+                if np.isfinite(new_mean[k]) and np.isfinite(current_mean) else None
+            })
+
+        def rank(change):
+            latency = change['mean_latency_ms']
+            return (-(change['capacity_gain'] or 0), latency if latency is not None else float('inf'),
+                    change['utilization'])
+
+        results.sort(key=rank)
+        return results[:limit]
+
+    def plan(self, target_rate=None):
+        """Full capacity report; target_rate adds the carried load at that offered rate"""
+        report = {
+            'model': 'M/G/1 per process, open network',
+            'sustainable': self.sustainable(),
+            'processes': self.processes(),
+            'channels': self.channels_report(),
+            'channel_type_changes': self.channel_type_changes()
+        }
+        if target_rate is not None:
+            report['at_rate'] = self.carried_load(target_rate)
+        return report
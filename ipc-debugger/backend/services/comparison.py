@@ -0,0 +1,262 @@
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import and_, case, exists, select, union_all, update
+from backend.models import db, Simulation, Process, IPCChannel, ChannelStats, LatencyBucket, Event
+from backend.utils.sharding import shards
+
+
+def bucket_percentiles(buckets, percentiles):
+    """
+    Nearest-rank percentiles of a delay histogram
+    buckets: [(bucket, count)] sorted by bucket
+    Returns: {'p50': ms, ...} (None when the histogram is empty)
+    """
+    total = sum(count for _, count in buckets)
+    results = {}
+    for percentile in percentiles:
+        if not total:
+            results[f'p{percentile}'] = None
+            continue
+        rank = max(1, math.ceil(percentile / 100 * total))
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                results[f'p{percentile}'] = bucket
+                break
+    return results
+
+
+def count_deadlocks(simulation_id):
+    """
+    Store the number of deadlock_detected events of a simulation counted
+    before the counter existed. Written without bumping the version.
+    Returns: the count
+    """
+    with shards.scope(simulation_id):
+        count = Event.query.filter_by(
+            simulation_id=simulation_id,
+            event_type='deadlock_detected'
+        ).count()
+    db.session.execute(update(Simulation).where(
+        Simulation.id == simulation_id,
+        Simulation.deadlock_count.is_(None)
+    ).values(deadlock_count=count))
+    return count
+
+
+def seed_latency_buckets(simulation_ids):
+    """
+    Histograms of channels whose stats predate latency_buckets, seeded from
+    their recorded messages (as ChannelStats.seed does for new stats rows).
+    Written without bumping the version.
+    Returns: ids of the simulations that got buckets
+    """
+    unseeded = db.session.query(IPCChannel.simulation_id, IPCChannel.id).join(
+        ChannelStats, ChannelStats.channel_id == IPCChannel.id
+    ).filter(
+        IPCChannel.simulation_id.in_(simulation_ids),
+        ChannelStats.message_count > 0,
+        ~exists().where(LatencyBucket.channel_id == IPCChannel.id)
+    ).all()
+    seeded = set()
+    for simulation_id, channel_id in unseeded:
+        with shards.scope(simulation_id):
+            if LatencyBucket.seed(db.session, channel_id):
+                seeded.add(simulation_id)
+    return seeded
+
+
+def record_deadlock(simulation_id):
+    """Count a logged deadlock_detected event (a not-yet-counted simulation stays NULL)"""
+    db.session.execute(update(Simulation).where(
+        Simulation.id == simulation_id
+    ).values(deadlock_count=Simulation.deadlock_count + 1))
+
+
+class SimulationComparator:
+    """
+    Side-by-side statistics for a set of simulations.
+
+    Everything comes from catalog aggregates that are exact even when raw
+    rows are sampled (channel_stats, latency_buckets, the deadlock counter),
+    so each metric is one grouped query over all requested simulations
+    rather than queries per simulation or per shard. Results are cached per
+    simulation under (version, deadlock_count): any change to topology,
+    states or message stats bumps the version.
+    """
+
+    def __init__(self, threshold_ms, percentiles, cache_size=1024):
+        self.threshold_ms = threshold_ms
+        self.percentiles = tuple(percentiles)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # simulation_id -> (key, aggregates)
+        self.lock = threading.Lock()
+
+    def compare(self, simulation_ids):
+        """
+        Statistics of each simulation, in the order requested
+        Returns: (results, missing_ids, cached_count)
+        """
+        rows = {row.id: row for row in db.session.query(
+            Simulation.id, Simulation.name, Simulation.status, Simulation.version,
+            Simulation.deadlock_count, Simulation.started_at, Simulation.ended_at
+        ).filter(Simulation.id.in_(simulation_ids))}
+        missing = [simulation_id for simulation_id in simulation_ids if simulation_id not in rows]
+
+        # Simulations from before the deadlock counter are counted once
+        deadlocks = {simulation_id: row.deadlock_count for simulation_id, row in rows.items()}
+        uncounted = [simulation_id for simulation_id, count in deadlocks.items() if count is None]
+        for simulation_id in uncounted:
+            deadlocks[simulation_id] = count_deadlocks(simulation_id)
+        # ... and so are channel histograms from before latency_buckets
+        seeded = seed_latency_buckets(list(rows))
+        if uncounted or seeded:
+            db.session.commit()
+
+        aggregates = {}
+        stale = []
+        with self.lock:
+            for simulation_id, row in rows.items():
+                entry = self.cache.get(simulation_id)
+                if entry is not None and simulation_id not in seeded \
+                        and entry[0] == (row.version, deadlocks[simulation_id]):
+                    self.cache.move_to_end(simulation_id)
+                    aggregates[simulation_id] = entry[1]
+                else:
+                    stale.append(simulation_id)
+        cached = len(aggregates)
+
+        if stale:
+            computed = self._aggregate(stale)
+            with self.lock:
+                for simulation_id in stale:
+                    key = (rows[simulation_id].version, deadlocks[simulation_id])
+                    self.cache[simulation_id] = (key, computed[simulation_id])
+                    self.cache.move_to_end(simulation_id)
+                    aggregates[simulation_id] = computed[simulation_id]
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        now = datetime.utcnow()
+        results = []
+        for simulation_id in dict.fromkeys(simulation_ids):
+            row = rows.get(simulation_id)
+            if row is None:
+                continue
+            result = {
+                'simulation_id': simulation_id,
+                'name': row.name,
+                'status': row.status,
+                'version': row.version,
+                **aggregates[simulation_id],
+                'deadlock_count': deadlocks[simulation_id]
+            }
+            # Throughput over the active period (still growing while running);
+            # an end from before the last start belongs to an earlier run
+            duration = 0
+            if row.started_at:
+                ended = row.ended_at if row.ended_at and row.ended_at >= row.started_at else now
+                duration = (ended - row.started_at).total_seconds()
+            result['active_seconds'] = round(duration, 3)
+            result['throughput_per_sec'] = round(result['total_messages'] / duration, 2) if duration > 0 else None
+            results.append(result)
+        return results, missing, cached
+
+    def _aggregate(self, simulation_ids):
+        """
+        Version-dependent aggregates of several simulations with one grouped
+        query per metric
+        Returns: {simulation_id: {...}}
+        """
+        results = {simulation_id: {
+            'total_processes': 0,
+            'total_channels': 0,
+            'total_messages': 0,
+            'total_bytes': 0,
+            'avg_latency_ms': 0,
+            'max_latency_ms': 0,
+            'latency_percentiles': bucket_percentiles([], self.percentiles),
+            'latency_samples': 0,
+            'ipc_distribution': {},
+            'ipc_messages': {},
+            'slow_channels': 0,
+            'bottleneck_processes': 0
+        } for simulation_id in simulation_ids}
+        delay_sums = dict.fromkeys(simulation_ids, 0)
+
+        for simulation_id, count in db.session.query(
+            Process.simulation_id, db.func.count(Process.id)
+        ).filter(Process.simulation_id.in_(simulation_ids)).group_by(Process.simulation_id):
+            results[simulation_id]['total_processes'] = count
+
+        # Channel mix and message totals per IPC type
+        message_count = db.func.coalesce(ChannelStats.message_count, 0)
+        delay_sum = db.func.coalesce(ChannelStats.delay_sum_ms, 0)
+        slow = and_(message_count > 0, delay_sum > self.threshold_ms * message_count)
+        for simulation_id, ipc_type, channels, messages, delays, delay_max, size_bytes, slow_channels in db.session.query(
+            IPCChannel.simulation_id, IPCChannel.ipc_type, db.func.count(IPCChannel.id),
+            db.func.sum(message_count), db.func.sum(delay_sum),
+            db.func.max(db.func.coalesce(ChannelStats.delay_max_ms, 0)),
+            db.func.sum(db.func.coalesce(ChannelStats.bytes_total, 0)),
+            db.func.sum(case((slow, 1), else_=0))
+        ).outerjoin(ChannelStats, ChannelStats.channel_id == IPCChannel.id).filter(
+            IPCChannel.simulation_id.in_(simulation_ids)
+        ).group_by(IPCChannel.simulation_id, IPCChannel.ipc_type):
+            result = results[simulation_id]
+            result['total_channels'] += channels
+            result['total_messages'] += messages
+            result['total_bytes'] += size_bytes
+            result['max_latency_ms'] = max(result['max_latency_ms'], delay_max)
+            result['ipc_distribution'][ipc_type] = channels
+            result['ipc_messages'][ipc_type] = messages
+            result['slow_channels'] += slow_channels
+            delay_sums[simulation_id] += delays
+
+        for simulation_id, result in results.items():
+            if result['total_messages']:
+                result['avg_latency_ms'] = round(delay_sums[simulation_id] / result['total_messages'], 2)
+
+        # Delay histograms merged per simulation
+        histograms = {}
+        for simulation_id, bucket, count in db.session.query(
+            IPCChannel.simulation_id, LatencyBucket.bucket, db.func.sum(LatencyBucket.count)
+        ).join(IPCChannel, IPCChannel.id == LatencyBucket.channel_id).filter(
+            IPCChannel.simulation_id.in_(simulation_ids)
+        ).group_by(IPCChannel.simulation_id, LatencyBucket.bucket).order_by(
+            IPCChannel.simulation_id, LatencyBucket.bucket
+        ):
+            histograms.setdefault(simulation_id, []).append((bucket, count))
+        for simulation_id, buckets in histograms.items():
+            results[simulation_id]['latency_percentiles'] = bucket_percentiles(buckets, self.percentiles)
+            results[simulation_id]['latency_samples'] = sum(count for _, count in buckets)
+
+        # Bottleneck processes: lifetime average delay over every channel the
+        # process sends or receives on above the threshold (as BottleneckAnalyzer)
+        endpoints = union_all(*(
+            select(
+                IPCChannel.simulation_id, endpoint.label('process_id'),
+                ChannelStats.message_count.label('messages'), ChannelStats.delay_sum_ms.label('delays')
+            ).join(ChannelStats, ChannelStats.channel_id == IPCChannel.id).where(
+                IPCChannel.simulation_id.in_(simulation_ids)
+            )
+            for endpoint in (IPCChannel.sender_id, IPCChannel.receiver_id)
+        )).subquery()
+        bottlenecks = select(endpoints.c.simulation_id).group_by(
+            endpoints.c.simulation_id, endpoints.c.process_id
+        ).having(and_(
+            db.func.sum(endpoints.c.messages) > 0,
+            db.func.sum(endpoints.c.delays) > self.threshold_ms * db.func.sum(endpoints.c.messages)
+        )).subquery()
+        for simulation_id, count in db.session.execute(
+            select(bottlenecks.c.simulation_id, db.func.count()).group_by(bottlenecks.c.simulation_id)
+        ):
+            results[simulation_id]['bottleneck_processes'] = count
+
+        return results
+
+    def forget(self, simulation_id):
+        with self.lock:
+            self.cache.pop(simulation_id, None)
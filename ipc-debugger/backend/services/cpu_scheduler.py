@@ -0,0 +1,309 @@
+import heapq
+import json
+import random
+from collections import defaultdict, deque
+
+SCHEDULING_POLICIES = ('fcfs', 'rr', 'priority', 'mlfq')
+
+
+def is_int(value, minimum=1):
+    """Whether value is an integer (not a bool) of at least minimum"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+
+def is_number(value, minimum=0, exclusive=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return False
+    return value > minimum if exclusive else value >= minimum
+
+
+def validate_specs(specs):
+    """
+    Check a workload before scheduling it
+    Returns: [error] - empty when every spec can be scheduled
+    """
+    if not isinstance(specs, list):
+        return ['specs must be a list']
+    errors = []
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            errors.append(f'specs[{index}]: must be an object')
+            continue
+        if spec.get('id') is None:
+            errors.append(f'specs[{index}]: id is required')
+        bursts = spec.get('bursts')
+        if not isinstance(bursts, list) or not bursts:
+            errors.append(f'specs[{index}]: bursts must be a non-empty list')
+        elif not all(is_number(burst, exclusive=True) for burst in bursts):
+            errors.append(f'specs[{index}]: bursts must be positive numbers')
+        ipc_delays = spec.get('ipc_delays', [])
+        if not isinstance(ipc_delays, list) or not all(is_number(delay) for delay in ipc_delays):
+            errors.append(f'specs[{index}]: ipc_delays must be a list of non-negative numbers')
+        if not is_number(spec.get('arrival', 0)):
+            errors.append(f'specs[{index}]: arrival must be a non-negative number')
+        if not is_number(spec.get('priority', 0), minimum=float('-inf')):
+            errors.append(f'specs[{index}]: priority must be a number')
+    return errors
+
+
+class SchedulerProcess:
+    """Per-process scheduling state and metrics"""
+
+    __slots__ = ('id', 'name', 'priority', 'arrival', 'bursts', 'ipc_delays', 'phase', 'remaining',
+                 'level', 'epoch', 'first_run', 'completion', 'cpu_time', 'blocked_time')
+
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.name = spec.get('name', str(spec['id']))
+        self.priority = spec.get('priority', 0)
+        self.arrival = spec.get('arrival', 0)
+        self.bursts = spec['bursts']  # CPU burst lengths (ms)
+        self.ipc_delays = spec.get('ipc_delays', [])  # blocking IPC between bursts (ms)
+        self.phase = 0
+        self.remaining = self.bursts[0]
+        self.level = 0
+        self.epoch = 0  # MLFQ boost epoch the level belongs to
+        self.first_run = None
+        self.completion = None
+        self.cpu_time = 0
+        self.blocked_time = 0
+
+    def to_dict(self):
+        turnaround = self.completion - self.arrival
+        return {
+            'process_id': self.id,
+            'process_name': self.name,
+            'arrival': self.arrival,
+            'completion': self.completion,
+            'turnaround': turnaround,
+            'waiting': turnaround - self.cpu_time - self.blocked_time,
+            'response': self.first_run - self.arrival,
+            'cpu_time': self.cpu_time,
+            'blocked_time': self.blocked_time
+        }
+
+
+class CPUScheduler:
+    """
+    Discrete-event single-CPU scheduler on a virtual clock.
+
+    Processes alternate CPU bursts with blocking IPC operations; the ready
+    queue is a heap keyed by the policy (arrival order, priority, or MLFQ
+    level), and arrivals/IPC completions come from a second heap of timed
+    events, so each scheduling decision is O(log n).
+    """
+
+    def __init__(self, policy='rr', quantum=10, mlfq_levels=3, mlfq_boost=0):
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        # A zero quantum would never advance the clock
+        if not is_int(quantum):
+            raise ValueError('quantum must be a positive integer')
+        if not is_int(mlfq_levels):
+            raise ValueError('mlfq_levels must be a positive integer')
+        if not is_int(mlfq_boost, minimum=0):
+            raise ValueError('mlfq_boost must be a non-negative integer (0 disables boosting)')
+        self.policy = policy
+        self.quantum = quantum
+        self.mlfq_levels = mlfq_levels
+        self.mlfq_boost = mlfq_boost
+
+    def _slice(self, process):
+        """Time the process may run before it is preempted"""
+        if self.policy == 'rr':
+            return min(process.remaining, self.quantum)
+        if self.policy == 'mlfq':
+            return min(process.remaining, self.quantum * (2 ** process.level))
+        return process.remaining
+
+    def run(self, specs):
+        """
+        Schedule a workload
+        specs: [{'id', 'name', 'priority', 'arrival', 'bursts': [ms], 'ipc_delays': [ms]}]
+        Returns: {'summary': {...}, 'processes': [...]}
+        """
+        errors = validate_specs(specs)
+        if errors:
+            raise ValueError(errors[0])
+        processes = [SchedulerProcess(spec) for spec in specs]
+        if not processes:
+            return {'summary': self._summary([], 0, 0, 0, 0), 'processes': []}
+
+        seq = 0
+        events = []  # (time, seq, process) - arrivals and IPC completions
+        for process in processes:
+            events.append((process.arrival, seq, process))
+            seq += 1
+        heapq.heapify(events)
+
+        levels = [[] for _ in range(self.mlfq_levels)] if self.policy == 'mlfq' else None
+        boosted = deque()  # MLFQ queue sets frozen by a boost; all run at the top level, oldest first
+        epoch = 0
+        ready = []
+
+        def level_of(process):
+            # A boost resets every level lazily instead of touching each process
+            if process.epoch != epoch:
+                process.level = 0
+                process.epoch = epoch
+            return process.level
+
+        def enqueue(process):
+            nonlocal seq
+            seq += 1
+            if self.policy == 'priority':
+                heapq.heappush(ready, (-process.priority, seq, process))
+            elif self.policy == 'mlfq':
+                heapq.heappush(levels[level_of(process)], (seq, process))
+            else:
+                heapq.heappush(ready, (seq, process))
+
+        def dequeue():
+            if self.policy != 'mlfq':
+                return heapq.heappop(ready)[-1] if ready else None
+
+            while boosted:
+                queues = [queue for queue in boosted[0] if queue]
+                if queues:
+                    return heapq.heappop(min(queues, key=lambda q: q[0][0]))[-1]
+                boosted.popleft()
+            for queue in levels:
+                if queue:
+                    return heapq.heappop(queue)[-1]
+            return None
+
+        def boost():
+            nonlocal levels, epoch
+            # Everything queued so far predates (by seq) anything queued later
+            boosted.append(levels)
+            levels = [[] for _ in range(self.mlfq_levels)]
+            epoch += 1
+
+        start = min(p.arrival for p in processes)
+        clock = start
+        busy = 0
+        context_switches = 0
+        previous = None
+        next_boost = start + self.mlfq_boost if self.policy == 'mlfq' and self.mlfq_boost else None
+
+        while True:
+            if next_boost is not None and clock >= next_boost:
+                boost()
+                next_boost += self.mlfq_boost * ((clock - next_boost) // self.mlfq_boost + 1)
+
+            current = dequeue()
+            if current is None:
+                if not events:
+                    break
+                # CPU idles until the next arrival or IPC completion
+                clock = max(clock, events[0][0])
+                while events and events[0][0] <= clock:
+                    enqueue(heapq.heappop(events)[-1])
+                continue
+
+            if current.first_run is None:
+                current.first_run = clock
+            if current is not previous:
+                context_switches += 1
+                previous = current
+
+            if self.policy == 'mlfq':
+                level_of(current)
+            ran = self._slice(current)
+            slice_end = clock + ran
+            while events and events[0][0] <= slice_end:
+                enqueue(heapq.heappop(events)[-1])
+
+            clock = slice_end
+            busy += ran
+            current.cpu_time += ran
+            current.remaining -= ran
+
+            if current.remaining > 0:
+                # Quantum expired: MLFQ demotes CPU-bound processes
+                if self.policy == 'mlfq':
+                    current.level = min(current.level + 1, self.mlfq_levels - 1)
+                enqueue(current)
+                continue
+
+            current.phase += 1
+            if current.phase < len(current.bursts):
+                # Block on IPC, then become ready for the next burst
+                delay = current.ipc_delays[current.phase - 1] if current.phase - 1 < len(current.ipc_delays) else 0
+                current.blocked_time += delay
+                current.remaining = current.bursts[current.phase]
+                seq += 1
+                heapq.heappush(events, (clock + delay, seq, current))
+            else:
+                current.completion = clock
+            previous = None
+
+        return {
+            'summary': self._summary(processes, start, clock, busy, context_switches),
+            'processes': [p.to_dict() for p in processes]
+        }
+
+    def _summary(self, processes, start, end, busy, context_switches):
+        count = len(processes)
+        makespan = end - start
+        return {
+            'policy': self.policy,
+            'quantum': self.quantum if self.policy in ('rr', 'mlfq') else None,
+            'process_count': count,
+            'makespan': makespan,
+            'cpu_busy': busy,
+            'cpu_utilization': round(busy / makespan * 100, 2) if makespan else 0,
+            'throughput_per_sec': round(count / makespan * 1000, 3) if makespan else 0,
+            'avg_turnaround': round(sum(p.completion - p.arrival for p in processes) / count, 2) if count else 0,
+            'avg_waiting': round(sum(
+                p.completion - p.arrival - p.cpu_time - p.blocked_time for p in processes
+            ) / count, 2) if count else 0,
+            'avg_response': round(sum(p.first_run - p.arrival for p in processes) / count, 2) if count else 0,
+            'context_switches': context_switches
+        }
+
+
+def build_workload(processes, channels, simulator, overrides=None, seed=None,
+                   burst_range=(5, 50), arrival_window=0, message_size=64):
+    """
+    Build scheduler specs for a simulation's processes. Each process gets one
+    more CPU burst than it has outgoing channels; between bursts it blocks on
+    a send through the next channel, with the delay drawn from IPCSimulator.
+    overrides: {process_id: {'arrival', 'bursts', 'ipc_delays'}}
+    """
+    rng = random.Random(seed)
+    overrides = overrides or {}
+
+    outgoing = defaultdict(list)
+    for channel in channels:
+        outgoing[channel.sender_id].append(channel)
+
+    specs = []
+    for process in processes:
+        override = overrides.get(process.id) or overrides.get(str(process.id)) or {}
+        sends = outgoing[process.id]
+
+        bursts = override.get('bursts') or [rng.randint(*burst_range) for _ in range(len(sends) + 1)]
+        ipc_delays = override.get('ipc_delays')
+        if ipc_delays is None:
+            ipc_delays = []
+            for i in range(len(bursts) - 1):
+                if not sends:
+                    break
+                channel = sends[i % len(sends)]
+                channel_config = json.loads(channel.config) if channel.config else {}
+                success, delay, _ = simulator.send_message(
+                    channel.ipc_type, '', channel_config, message_size=message_size
+                )
+                ipc_delays.append(delay if success else 0)
+
+        specs.append({
+            'id': process.id,
+            'name': process.process_name,
+            'priority': process.priority or 0,
+            'arrival': override.get('arrival', rng.randint(0, arrival_window) if arrival_window else 0),
+            'bursts': bursts,
+            'ipc_delays': ipc_delays
+        })
+
+    return specs
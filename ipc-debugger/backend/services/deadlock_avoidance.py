@@ -0,0 +1,211 @@
+import numpy as np
+
+
+class BankersAvoidance:
+    """
+    Deadlock avoidance with the Banker's algorithm over multi-instance resources.
+
+    Processes declare maximum claims up front; every request is granted only
+    if the resulting state is still safe. State is kept as NumPy matrices
+    (rows = processes, columns = resource types) so the safety check is a
+    handful of vectorized passes even for hundreds of processes and resources.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Reset the avoidance state"""
+        self.process_index = {}  # process_id -> row
+        self.resource_index = {}  # resource name -> column
+        self.total = np.zeros(0, dtype=np.int64)
+        self.maximum = np.zeros((0, 0), dtype=np.int64)
+        self.allocation = np.zeros((0, 0), dtype=np.int64)
+
+    @property
+    def available(self):
+        return self.total - self.allocation.sum(axis=0)
+
+    @property
+    def need(self):
+        return self.maximum - self.allocation
+
+    def _grow(self, rows, cols):
+        """Pad the matrices to hold more processes or resource types"""
+        pad_rows = rows - self.maximum.shape[0]
+        pad_cols = cols - self.maximum.shape[1]
+        if pad_rows > 0 or pad_cols > 0:
+            padding = ((0, max(pad_rows, 0)), (0, max(pad_cols, 0)))
+            self.maximum = np.pad(self.maximum, padding)
+            self.allocation = np.pad(self.allocation, padding)
+            self.total = np.pad(self.total, (0, max(pad_cols, 0)))
+
+    def _row(self, process_id):
+        if process_id not in self.process_index:
+            self.process_index[process_id] = len(self.process_index)
+            self._grow(len(self.process_index), len(self.resource_index))
+        return self.process_index[process_id]
+
+    def _vector(self, amounts):
+        """{resource: count} -> resource vector (checked with amounts_error first)"""
+        vector = np.zeros(len(self.resource_index), dtype=np.int64)
+        for resource, count in amounts.items():
+            vector[self.resource_index[resource]] = count
+        return vector
+
+    def amounts_error(self, process_id, amounts, name='request'):
+        """
+        Check a process id and a {resource: count} mapping from a request body
+        Returns: error message, or None if they can be applied
+        """
+        if isinstance(process_id, bool) or not isinstance(process_id, int):
+            return "process_id must be an integer"
+        if not isinstance(amounts, dict):
+            return f"{name} must map resource names to instance counts"
+        for resource, count in amounts.items():
+            if resource not in self.resource_index:
+                return f"Unknown resource: {resource}"
+            if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+                return f"{name} count of {resource} must be a non-negative integer"
+        return None
+
+    def resource_error(self, resource, instances):
+        """
+        Check an instance count for a resource type
+        Returns: error message, or None if add_resource() would accept it
+        """
+        if isinstance(instances, bool) or not isinstance(instances, (int, np.integer)) or instances < 0:
+            return f"Instance count of {resource} must be a non-negative integer"
+        column = self.resource_index.get(resource)
+        if column is not None:
+            allocated = int(self.allocation[:, column].sum())
+            if instances < allocated:
+                return f"{resource} has {allocated} instances allocated; total cannot drop to {instances}"
+        return None
+
+    def add_resource(self, resource, instances):
+        """
+        Declare a resource type (or change its instance count)
+        Returns: (success, info)
+        """
+        error = self.resource_error(resource, instances)
+        if error:
+            return False, error
+        if resource not in self.resource_index:
+            self.resource_index[resource] = len(self.resource_index)
+            self._grow(len(self.process_index), len(self.resource_index))
+        self.total[self.resource_index[resource]] = int(instances)
+        return True, "Resource declared"
+
+    def declare_claim(self, process_id, maximum):
+        """
+        Set a process's maximum claim
+        Returns: (success, info)
+        """
+        error = self.amounts_error(process_id, maximum, 'maximum')
+        if error:
+            return False, error
+        claim = self._vector(maximum)
+
+        if (claim > self.total).any():
+            return False, "Maximum claim exceeds total resource instances"
+
+        row = self._row(process_id)
+        if (claim < self.allocation[row]).any():
+            return False, "Maximum claim is below current allocation"
+
+        self.maximum[row] = claim
+        return True, "Claim declared"
+
+    def is_safe(self, allocation=None, available=None):
+        """
+        Banker's safety check. All processes whose need fits in the current
+        work vector finish together in one vectorized pass.
+        Returns: (safe, safe_sequence_of_process_ids)
+        """
+        allocation = self.allocation if allocation is None else allocation
+        work = (self.total - allocation.sum(axis=0)) if available is None else available.copy()
+        need = self.maximum - allocation
+
+        finished = np.zeros(allocation.shape[0], dtype=bool)
+        row_ids = np.empty(len(self.process_index), dtype=object)
+        for process_id, row in self.process_index.items():
+            row_ids[row] = process_id
+
+        sequence = []
+        while not finished.all():
+            runnable = ~finished & (need <= work).all(axis=1)
+            if not runnable.any():
+                return False, sequence
+            work = work + allocation[runnable].sum(axis=0)
+            finished |= runnable
+            sequence.extend(row_ids[runnable].tolist())
+
+        return True, sequence
+
+    def request(self, process_id, amounts):
+        """
+        Request resources for a process; grant only if the state stays safe
+        Returns: (granted, info)
+        """
+        if process_id not in self.process_index:
+            return False, "Process has not declared a maximum claim"
+        request = self._vector(amounts)
+
+        row = self.process_index[process_id]
+        if (request > self.need[row]).any():
+            return False, "Request exceeds declared maximum claim"
+        if (request > self.available).any():
+            return False, "Insufficient resources available; process must wait"
+
+        allocation = self.allocation.copy()
+        allocation[row] += request
+        safe, _ = self.is_safe(allocation)
+        if not safe:
+            return False, "Request denied: granting it would leave the system in an unsafe state"
+
+        self.allocation = allocation
+        return True, "Request granted"
+
+    def release(self, process_id, amounts=None):
+        """
+        Release some (or all) resources held by a process
+        Returns: (success, info)
+        """
+        if process_id not in self.process_index:
+            return True, "Process holds no resources"
+        row = self.process_index[process_id]
+        if amounts is None:
+            self.allocation[row] = 0
+            return True, "Resources released"
+        vector = self._vector(amounts)
+        if (vector > self.allocation[row]).any():
+            return False, "Release exceeds the resources the process holds"
+        self.allocation[row] -= vector
+        return True, "Resources released"
+
+    def state(self):
+        """Serializable snapshot of the avoidance matrices"""
+        safe, sequence = self.is_safe()
+        resources = sorted(self.resource_index, key=self.resource_index.get)
+        processes = sorted(self.process_index, key=self.process_index.get)
+        return {
+            'resources': resources,
+            'processes': processes,
+            'total': self.total.tolist(),
+            'available': self.available.tolist(),
+            'maximum': self.maximum.tolist(),
+            'allocation': self.allocation.tolist(),
+            'need': self.need.tolist(),
+            'safe': safe,
+            'safe_sequence': sequence
+        }
+
+
+def channel_instances(channel_config, ipc_type):
+    """Instance count of a channel used as a resource"""
+    if 'instances' in channel_config:
+        return int(channel_config['instances'])
+    if ipc_type == 'queue':
+        return int(channel_config.get('max_queue_size', 100))
+    return 1
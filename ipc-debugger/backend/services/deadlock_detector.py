@@ -1,7 +1,14 @@
 from collections import defaultdict, deque
+import numpy as np
+
+DETECTION_METHODS = ('cycle', 'reduction')
 
 class DeadlockDetector:
-    """Detects deadlocks using Resource Allocation Graph (RAG) cycle detection"""
+    """
+    Detects deadlocks using Resource Allocation Graph (RAG) cycle detection
+    (single-instance resources) or allocation/request matrix reduction
+    (multi-instance resources)
+    """
     
     def __init__(self):
         self.reset()
@@ -10,15 +17,24 @@ class DeadlockDetector:
         """Reset the detector state"""
         self.waiting_for = {}  # process_id -> resource_id (what process is waiting for)
         self.held_by = defaultdict(list)  # resource_id -> [process_ids] (who holds the resource)
+        self.instances = {}  # resource_id -> instance count (default 1)
+        self.requested = defaultdict(dict)  # process_id -> {resource_id: count}
+        self.allocated = defaultdict(dict)  # process_id -> {resource_id: count}
+    
+    def set_instances(self, resource_id, instances):
+        """Record how many instances a resource has"""
+        self.instances[resource_id] = instances
     
-    def add_wait(self, process_id, resource_id):
+    def add_wait(self, process_id, resource_id, count=1):
         """Record that a process is waiting for a resource"""
         self.waiting_for[process_id] = resource_id
+        self.requested[process_id][resource_id] = count
     
-    def add_hold(self, process_id, resource_id):
+    def add_hold(self, process_id, resource_id, count=1):
         """Record that a process holds a resource"""
         if process_id not in self.held_by[resource_id]:
             self.held_by[resource_id].append(process_id)
+        self.allocated[process_id][resource_id] = count
     
     def release_resource(self, process_id, resource_id):
         """Release a resource held by a process"""
@@ -26,6 +42,8 @@ class DeadlockDetector:
             self.held_by[resource_id].remove(process_id)
         if process_id in self.waiting_for:
             del self.waiting_for[process_id]
+        self.allocated[process_id].pop(resource_id, None)
+        self.requested[process_id].pop(resource_id, None)
     
     def detect_cycle(self):
         """
@@ -78,22 +96,78 @@ class DeadlockDetector:
         
         return False, []
     
-    def analyze_deadlock(self, processes):
+    def detect_reduction(self):
+        """
+        Detect deadlock with the multi-instance matrix-reduction algorithm.
+        Allocation and request matrices are kept in sparse (row, col, count)
+        form; every process whose outstanding request fits in the available
+        vector is reduced in the same vectorized pass.
+        Returns: (has_deadlock, deadlocked_processes)
+        """
+        process_ids = sorted(set(self.requested) | set(self.allocated))
+        resource_ids = sorted(
+            set(self.instances)
+            | {r for held in self.allocated.values() for r in held}
+            | {r for wanted in self.requested.values() for r in wanted}
+        )
+        if not process_ids or not resource_ids:
+            return False, []
+        
+        rows = {p: i for i, p in enumerate(process_ids)}
+        cols = {r: j for j, r in enumerate(resource_ids)}
+        
+        def sparse(entries):
+            cells = [(rows[p], cols[r], n) for p, held in entries.items() for r, n in held.items()]
+            if not cells:
+                return (np.zeros(0, dtype=np.int64),) * 3
+            return tuple(np.array(column, dtype=np.int64) for column in zip(*cells))
+        
+        alloc_rows, alloc_cols, alloc_counts = sparse(self.allocated)
+        req_rows, req_cols, req_counts = sparse(self.requested)
+        
+        total = np.array([self.instances.get(r, 1) for r in resource_ids], dtype=np.int64)
+        work = total - np.bincount(alloc_cols, weights=alloc_counts, minlength=len(resource_ids)).astype(np.int64)
+        
+        # Processes holding nothing cannot be part of a deadlock
+        finished = np.ones(len(process_ids), dtype=bool)
+        finished[alloc_rows[alloc_counts > 0]] = False
+        
+        while True:
+            unmet = np.bincount(req_rows[req_counts > work[req_cols]], minlength=len(process_ids))
+            runnable = ~finished & (unmet == 0)
+            if not runnable.any():
+                break
+            released = runnable[alloc_rows]
+            work += np.bincount(alloc_cols[released], weights=alloc_counts[released],
+                                minlength=len(resource_ids)).astype(np.int64)
+            finished |= runnable
+        
+        deadlocked = [process_ids[i] for i in np.flatnonzero(~finished)]
+        return bool(deadlocked), deadlocked
+    
+    def analyze_deadlock(self, processes, method='cycle'):
         """
         Analyze current state for deadlock
+        method: 'cycle' (RAG cycle search) or 'reduction' (multi-instance matrix reduction)
         Returns: {
             'deadlock_found': bool,
+            'method': str,
             'processes': [process_ids],
             'cycle': [process_names],
             'suggestion': str
         }
         """
-        has_deadlock, cycle_processes = self.detect_cycle()
+        if method == 'reduction':
+            has_deadlock, cycle_processes = self.detect_reduction()
+        else:
+            method = 'cycle'
+            has_deadlock, cycle_processes = self.detect_cycle()
         
         if has_deadlock:
             process_names = [p.process_name for p in processes if p.id in cycle_processes]
             return {
                 'deadlock_found': True,
+                'method': method,
                 'processes': cycle_processes,
                 'cycle': process_names,
                 'suggestion': 'Break the circular wait by releasing resources or using timeouts'
@@ -101,6 +175,7 @@ class DeadlockDetector:
         
         return {
             'deadlock_found': False,
+            'method': method,
             'processes': [],
             'cycle': [],
             'suggestion': None
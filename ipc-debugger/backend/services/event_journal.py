@@ -0,0 +1,313 @@
+import atexit
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from backend.services.topology_io import PROCESS_STATES
+from backend.utils.sharding import ID_SHIFT
+
+# High-rate events kept in the journal instead of the events table
+JOURNAL_TYPES = ('message_sent', 'process_state_changed')
+TYPE_CODES = {event_type: code for code, event_type in enumerate(JOURNAL_TYPES)}
+STATE_CODES = {state: code for code, state in enumerate(PROCESS_STATES)}
+
+# id, timestamp (UTC epoch seconds), process_id, peer_id (receiver), channel_id,
+# delay_ms, type, from state, to state
+RECORD = struct.Struct('<qdqqqiBBBx')
+ID, TIMESTAMP, PROCESS, PEER, CHANNEL, DELAY, TYPE, FROM, TO = range(9)
+
+# Journal ids follow the simulation's event ids (simulation_id << ID_SHIFT)
+# in the upper half of its range, so they never collide with events rows
+JOURNAL_ID_OFFSET = 1 << (ID_SHIFT - 1)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+class JournalEvent:
+    """A journal record rendered like an Event row (same attributes and to_dict())"""
+
+    __slots__ = ('id', 'simulation_id', 'process_id', 'event_type', 'severity',
+                 'message', 'timestamp', 'metadata')
+
+    def __init__(self, simulation_id, record, names):
+        self.id = record[ID]
+        self.simulation_id = simulation_id
+        self.event_type = JOURNAL_TYPES[record[TYPE]]
+        self.severity = 'info'
+        self.timestamp = EPOCH + timedelta(seconds=record[TIMESTAMP])
+        # Processes deleted since then are unlinked, as in the events table
+        process_id = record[PROCESS]
+        self.process_id = process_id if process_id in names else None
+        name = names.get(process_id, f'#{process_id}')
+
+        if self.event_type == 'message_sent':
+            self.message = f'{name} → {names.get(record[PEER], f"#{record[PEER]}")} ({record[DELAY]}ms)'
+            self.metadata = {'channel_id': record[CHANNEL], 'delay': record[DELAY]}
+        else:
+            old, new = PROCESS_STATES[record[FROM]], PROCESS_STATES[record[TO]]
+            self.message = f'Process "{name}" state: {old} → {new}'
+            self.metadata = {'from': old, 'state': new}
+
+    @property
+    def event_metadata(self):
+        return json.dumps(self.metadata)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'simulation_id': self.simulation_id,
+            'process_id': self.process_id,
+            'event_type': self.event_type,
+            'severity': self.severity,
+            'message': self.message,
+            'timestamp': self.timestamp.isoformat(),
+            'metadata': self.metadata
+        }
+
+
+class EventJournal:
+    """
+    Append-only file of fixed-size binary event records for one simulation.
+
+    Appends go to an in-memory buffer that is written out with a single
+    write() when it fills up or flush_interval has passed (and before any
+    read). Reads go through a read-only memory map of the file. Record n
+    sits at offset n * RECORD.size; a sparse index holds the timestamp of
+    every index_stride-th record, so time bounds are found by bisecting the
+    index and then bisecting one stride. Timestamps never decrease.
+    """
+
+    def __init__(self, simulation_id, path, index_stride=1024, flush_interval=0.2, buffer_bytes=65536):
+        self.simulation_id = simulation_id
+        self.path = path
+        self.index_stride = index_stride
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+        self.base_id = (int(simulation_id) << ID_SHIFT) + JOURNAL_ID_OFFSET
+        self.lock = threading.RLock()
+        self.pending = bytearray()
+        self.last_flush = time.monotonic()
+        self.map = None
+        self.mapped = 0  # records covered by self.map
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        size = os.fstat(self.fd).st_size
+        if size % RECORD.size:
+            # Drop a record torn by a crash mid-write
+            size -= size % RECORD.size
+            os.ftruncate(self.fd, size)
+        self.written = size // RECORD.size
+        self.count = self.written
+        self.index = []  # timestamp of record k * index_stride
+        self.last_ts = 0.0
+        if self.count:
+            view = self._view()
+            self.index = [RECORD.unpack_from(view, n * RECORD.size)[TIMESTAMP]
+                          for n in range(0, self.count, index_stride)]
+            self.last_ts = RECORD.unpack_from(view, (self.count - 1) * RECORD.size)[TIMESTAMP]
+
+    def __len__(self):
+        return self.count
+
+    # ----- appends -----
+
+    def append(self, event_type, process_id, peer_id=0, channel_id=0, delay_ms=0,
+               old_state=None, new_state=None, timestamp=None):
+        """
+        Append one record
+        Returns: its id
+        """
+        with self.lock:
+            ts = max(timestamp if timestamp is not None else time.time(), self.last_ts)
+            if self.count % self.index_stride == 0:
+                self.index.append(ts)
+            self.count += 1
+            record_id = self.base_id + self.count
+            self.pending += RECORD.pack(
+                record_id, ts, process_id or 0, peer_id or 0, channel_id or 0, int(delay_ms),
+                TYPE_CODES[event_type], STATE_CODES.get(old_state, 0), STATE_CODES.get(new_state, 0)
+            )
+            self.last_ts = ts
+            if len(self.pending) >= self.buffer_bytes or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+            return record_id
+
+    def message_sent(self, sender_id, receiver_id, channel_id, delay_ms):
+        return self.append('message_sent', sender_id, receiver_id, channel_id, delay_ms)
+
+    def state_changed(self, process_id, old_state, new_state):
+        return self.append('process_state_changed', process_id, old_state=old_state, new_state=new_state)
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                os.write(self.fd, self.pending)
+                self.written = self.count
+                self.pending = bytearray()
+            self.last_flush = time.monotonic()
+
+    # ----- reads -----
+
+    def _view(self):
+        """Read-only map of every record, flushing pending appends (remapped as the file grows)"""
+        with self.lock:
+            self.flush()
+            if self.mapped != self.written:
+                # Readers may still hold the old map; it is released with them
+                self.map = mmap.mmap(self.fd, self.written * RECORD.size, access=mmap.ACCESS_READ) \
+                    if self.written else None
+                self.mapped = self.written
+            return self.map
+
+    def position(self, until):
+        """Number of records with timestamp <= until (epoch seconds)"""
+        view = self._view()
+        block = bisect.bisect_right(self.index, until)
+        if block == 0:
+            return 0
+        # Binary search for the first record past the bound within the block
+        low = (block - 1) * self.index_stride + 1
+        high = min(low - 1 + self.index_stride, self.mapped)
+        while low < high:
+            middle = (low + high) // 2
+            if RECORD.unpack_from(view, middle * RECORD.size)[TIMESTAMP] > until:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def records(self, start=0, stop=None, reverse=False):
+        """Record tuples in [start, stop), oldest first unless reverse"""
+        view = self._view()
+        stop = self.mapped if stop is None else min(stop, self.mapped)
+        if view is None or start >= stop:
+            return
+        if reverse:
+            for n in range(stop - 1, start - 1, -1):
+                yield RECORD.unpack_from(view, n * RECORD.size)
+        else:
+            yield from RECORD.iter_unpack(memoryview(view)[start * RECORD.size:stop * RECORD.size])
+
+    def after(self, record_id):
+        """Records newer than a record id (from this or any earlier id range)"""
+        return self.records(start=max(0, record_id - self.base_id))
+
+    def last_id(self, until=None):
+        """Newest record id, optionally at or before a datetime (0 if none)"""
+        self._view()
+        count = self.mapped if until is None else self.position(to_epoch(until))
+        return self.base_id + count if count else 0
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.map = None
+            os.close(self.fd)
+
+
+class JournalStore:
+    """
+    Open journals per simulation (least recently used are closed), stored as
+    JOURNAL_DIR/simulation_<id>.journal. Pending appends are flushed at exit.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.options = {}
+        self.max_open = 64
+        self.journals = OrderedDict()  # simulation_id -> EventJournal
+        self.lock = threading.RLock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('EVENT_JOURNAL_ENABLED', False)
+        self.directory = app.config.get('JOURNAL_DIR')
+        self.max_open = app.config.get('JOURNAL_MAX_OPEN', 64)
+        self.options = {
+            'index_stride': app.config.get('JOURNAL_INDEX_STRIDE', 1024),
+            'flush_interval': app.config.get('JOURNAL_FLUSH_INTERVAL', 0.2),
+            'buffer_bytes': app.config.get('JOURNAL_BUFFER_BYTES', 65536)
+        }
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.close_all)
+
+    def path(self, simulation_id):
+        return os.path.join(self.directory, f'simulation_{int(simulation_id)}.journal')
+
+    def get(self, simulation_id, create=True):
+        """Journal of a simulation; None if it has none and create is False"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            journal = self.journals.get(simulation_id)
+            if journal is not None:
+                self.journals.move_to_end(simulation_id)
+                return journal
+            path = self.path(simulation_id)
+            if not create and not os.path.exists(path):
+                return None
+            journal = self.journals[simulation_id] = EventJournal(simulation_id, path, **self.options)
+            while len(self.journals) > self.max_open:
+                _, evicted = self.journals.popitem(last=False)
+                evicted.close()
+            return journal
+
+    def drop(self, simulation_id):
+        """Delete a simulation's journal"""
+        if not self.enabled:
+            return False
+        with self.lock:
+            journal = self.journals.pop(simulation_id, None)
+            if journal is not None:
+                journal.close()
+            try:
+                os.remove(self.path(simulation_id))
+                return True
+            except FileNotFoundError:
+                return False
+
+    def close_all(self):
+        with self.lock:
+            while self.journals:
+                _, journal = self.journals.popitem()
+                journal.close()
+
+
+journals = JournalStore()
+
+
+def journal_events(simulation_id, names, until=None, event_type=None, newest_first=False, limit=None,
+                   match=None):
+    """
+    A simulation's journal records as JournalEvents, optionally up to a
+    datetime, of one type and accepted by match(event).
+    names: {process_id: process_name}
+    Returns: [JournalEvent] ordered by (timestamp, id)
+    """
+    journal = journals.get(simulation_id, create=False)
+    if journal is None or (event_type is not None and event_type not in TYPE_CODES):
+        return []
+    stop = journal.position(to_epoch(until)) if until is not None else None
+    code = TYPE_CODES.get(event_type)
+
+    events = []
+    for record in journal.records(stop=stop, reverse=newest_first):
+        if code is not None and record[TYPE] != code:
+            continue
+        event = JournalEvent(simulation_id, record, names)
+        if match is not None and not match(event):
+            continue
+        events.append(event)
+        if limit is not None and len(events) >= limit:
+            break
+    return events
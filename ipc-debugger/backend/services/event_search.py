@@ -0,0 +1,285 @@
+import re
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from backend.models import db, Event
+from backend.services.event_journal import journals, journal_events, JOURNAL_TYPES
+from backend.services.simulation_clone import history_members, history_scope, process_names
+from backend.utils.sharding import shards
+
+# Contentless FTS5 index over events; rowid = events.id. Every events table
+# (each simulation shard, or the catalog without sharding) has its own index.
+# The simulation column holds an "s<id>" token so scoping to a simulation
+# happens inside the index.
+# "_" and "→" are token characters: Process_17 is one token, and the phrase
+# "→ Worker" matches messages sent to Worker.
+FTS_TABLE = 'events_fts'
+
+# Writing to FTS5 from a per-row trigger flushes its buffer on every row, which
+# makes event inserts an order of magnitude slower, so the insert trigger only
+# queues the id and the index catches up in one batch before each search.
+PENDING_TABLE = 'events_fts_pending'
+
+# Text leaves of the JSON metadata (process names, deadlock cycles, ...)
+METADATA_TEXT = (
+    "CASE WHEN json_valid({row}.event_metadata) THEN "
+    "(SELECT group_concat(value, ' ') FROM json_tree({row}.event_metadata) WHERE type = 'text') END"
+)
+
+CREATE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        simulation, message, metadata, content='', tokenize="unicode61 tokenchars '_→'"
+    )""",
+    f"CREATE TABLE IF NOT EXISTS {PENDING_TABLE} (event_id INTEGER PRIMARY KEY)",
+    f"""CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO {PENDING_TABLE}(event_id) VALUES (NEW.id);
+    END""",
+    # Contentless tables delete by re-tokenizing the original values
+    f"""CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, simulation, message, metadata)
+        SELECT 'delete', OLD.id, 's' || OLD.simulation_id, OLD.message, {METADATA_TEXT.format(row='OLD')}
+        WHERE NOT EXISTS (SELECT 1 FROM {PENDING_TABLE} WHERE event_id = OLD.id);
+        DELETE FROM {PENDING_TABLE} WHERE event_id = OLD.id;
+    END"""
+]
+
+INDEX_PENDING = f"""INSERT INTO {FTS_TABLE}(rowid, simulation, message, metadata)
+        SELECT events.id, 's' || events.simulation_id, events.message, {METADATA_TEXT.format(row='events')}
+        FROM {PENDING_TABLE} JOIN events ON events.id = {PENDING_TABLE}.event_id
+        WHERE {PENDING_TABLE}.event_id <= :upto"""
+
+CLEAR_PENDING = f"DELETE FROM {PENDING_TABLE} WHERE event_id <= :upto"
+
+# Quoted phrases (with an optional trailing * for prefix search) or bare words
+QUERY_TERM = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+# Tokens as the index splits them, for matching journal records in Python
+TOKEN = re.compile(r'[\w→]+')
+
+_available = False
+
+
+def install_event_index(connection):
+    """
+    Create the FTS5 index and its sync triggers next to an events table,
+    queueing existing events the first time. Runs in the caller's transaction.
+    Returns: True if full-text search is available
+    """
+    global _available
+    try:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {'name': FTS_TABLE}).first()
+        for statement in CREATE_STATEMENTS:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(f"INSERT INTO {PENDING_TABLE}(event_id) SELECT id FROM events"))
+        _available = True
+    except OperationalError as e:
+        print(f"Event search index unavailable ({e}); using LIKE search")
+        _available = False
+    return _available
+
+
+def create_event_index(db):
+    """
+    Set up full-text search at startup: index the catalog's events table, or
+    with sharding index every new shard as it is created. Without SQLite/FTS5
+    the search endpoint falls back to LIKE.
+    Returns: True if full-text search is available
+    """
+    global _available
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    if shards.enabled:
+        try:
+            db.session.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+            db.session.execute(text("DROP TABLE temp.fts5_probe"))
+            _available = True
+        except OperationalError as e:
+            print(f"Event search index unavailable ({e}); using LIKE search")
+            _available = False
+        db.session.rollback()
+        if _available:
+            shards.on_create(lambda simulation_id, connection: install_event_index(connection))
+        return _available
+
+    if install_event_index(events_connection()):
+        db.session.commit()
+        sync_event_index()
+    else:
+        db.session.rollback()
+    return _available
+
+
+def events_connection():
+    """Session connection of the events table in the current shard"""
+    return db.session.connection(bind_arguments={'mapper': inspect(Event)})
+
+
+def sync_event_index():
+    """
+    Index queued events of the current shard in one batch
+    Returns: number of events indexed
+    """
+    connection = events_connection()
+    upto = connection.execute(text(f"SELECT max(event_id) FROM {PENDING_TABLE}")).scalar()
+    if upto is None:
+        return 0
+    indexed = connection.execute(text(INDEX_PENDING), {'upto': upto}).rowcount
+    connection.execute(text(CLEAR_PENDING), {'upto': upto})
+    db.session.commit()
+    return indexed
+
+
+def query_terms(query):
+    """Quoted phrases and bare words of user input: [(phrase, prefix '*' or '')]"""
+    terms = []
+    for phrase, prefix, word in QUERY_TERM.findall(query):
+        if word:
+            prefix = '*' if word.endswith('*') else ''
+            phrase = word.rstrip('*')
+        phrase = phrase.strip()
+        if phrase:
+            terms.append((phrase, prefix))
+    return terms
+
+
+def build_match(query):
+    """
+    Turn user input into an FTS5 expression: quoted phrases stay phrases,
+    other words are AND-ed, a trailing * means prefix match.
+    Returns: expression string, or None if the query has no terms
+    """
+    terms = ['"' + phrase.replace('"', '""') + '"' + prefix for phrase, prefix in query_terms(query)]
+    return ' AND '.join(terms) if terms else None
+
+
+def tokenize(value):
+    return TOKEN.findall(value.lower())
+
+
+def has_phrase(tokens, phrase, prefix):
+    """Whether the phrase's tokens appear consecutively (the last as a prefix with *)"""
+    size = len(phrase)
+    for start in range(len(tokens) - size + 1):
+        last = tokens[start + size - 1]
+        if tokens[start:start + size - 1] == phrase[:-1] and \
+                (last.startswith(phrase[-1]) if prefix else last == phrase[-1]):
+            return True
+    return False
+
+
+def journal_matcher(query, full_text):
+    """
+    Predicate for journaled events, which are not in the index: every term
+    in the message or the metadata text (full_text), else a
+    case-insensitive substring of the message, as the LIKE fallback.
+    Journal messages repeat a lot, so results are cached per message.
+    Returns: match(JournalEvent) -> bool
+    """
+    if not full_text:
+        needle = query.lower()
+        return lambda event: needle in event.message.lower()
+
+    terms = [(tokenize(phrase), prefix) for phrase, prefix in query_terms(query)]
+    terms = [(phrase, prefix) for phrase, prefix in terms if phrase]
+    cache = {}
+
+    def match(event):
+        found = cache.get(event.message)
+        if found is None:
+            columns = (tokenize(event.message), tokenize(' '.join(
+                value for value in event.metadata.values() if isinstance(value, str)
+            )))
+            found = cache[event.message] = bool(terms) and all(
+                any(has_phrase(tokens, phrase, prefix) for tokens in columns) for phrase, prefix in terms
+            )
+        return found
+    return match
+
+
+def search_events(simulation, query, page=1, per_page=50, severity=None, event_type=None):
+    """
+    Ranked full-text search over a simulation's event history. Each lineage
+    member is searched in its own shard and the ranked results are merged.
+    Journaled events (message_sent, process_state_changed) are not indexed:
+    each member's journal is scanned newest first for matches, which rank
+    below every indexed match.
+    Returns: {'events': [...], 'page', 'per_page', 'has_more', 'engine'}
+    """
+    page = max(page, 1)
+    per_page = max(min(per_page, 500), 1)
+    offset = (page - 1) * per_page
+    engine = 'fts5' if _available else 'like'
+
+    match = build_match(query) if _available else None
+    if _available and match is None:
+        return {'events': [], 'page': page, 'per_page': per_page, 'has_more': False, 'engine': engine}
+
+    # Journaled events are all info-level
+    read_journal = journals.enabled and severity in (None, '', 'info') and \
+        (not event_type or event_type in JOURNAL_TYPES)
+    matcher = journal_matcher(query, _available) if read_journal else None
+
+    found = []  # (sort key, event dict)
+    for simulation_id, until in history_members(simulation.id, simulation):
+        with shards.scope(simulation_id):
+            if _available:
+                found.extend(_search_shard(simulation_id, until, match, severity, event_type, offset + per_page + 1))
+            else:
+                rows = Event.query.filter(history_scope(simulation_id, until), Event.message.contains(query))
+                if severity:
+                    rows = rows.filter(Event.severity == severity)
+                if event_type:
+                    rows = rows.filter(Event.event_type == event_type)
+                rows = rows.order_by(Event.timestamp.desc()).limit(offset + per_page + 1).all()
+                found.extend(((-event.timestamp.timestamp(), -event.id), event.to_dict()) for event in rows)
+            if read_journal:
+                matches = journal_events(
+                    simulation_id, process_names(simulation_id), until, event_type or None,
+                    newest_first=True, limit=offset + per_page + 1, match=matcher
+                )
+                if _available:
+                    found.extend(((0.0, -event.id), dict(event.to_dict(), score=0.0)) for event in matches)
+                else:
+                    found.extend(((-event.timestamp.timestamp(), -event.id), event.to_dict()) for event in matches)
+
+    found.sort(key=lambda item: item[0])
+    events = [event for _, event in found[offset:offset + per_page + 1]]
+
+    return {
+        'events': events[:per_page],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(events) > per_page,
+        'engine': engine
+    }
+
+
+def _search_shard(simulation_id, until, match, severity, event_type, limit):
+    """Top matches in the current shard: [((rank, -id), event dict)]"""
+    sync_event_index()
+    expression = f'simulation : (s{simulation_id}) AND {{message metadata}} : ({match})'
+
+    # bm25 weights: simulation column ignored, message ranks above metadata
+    ranked = text(
+        f"SELECT rowid AS id, bm25({FTS_TABLE}, 0.0, 10.0, 2.0) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).columns(id=db.Integer, rank=db.Float).subquery()
+
+    rows = db.session.query(Event, ranked.c.rank).join(ranked, ranked.c.id == Event.id).filter(
+        history_scope(simulation_id, until)
+    )
+    if severity:
+        rows = rows.filter(Event.severity == severity)
+    if event_type:
+        rows = rows.filter(Event.event_type == event_type)
+    rows = rows.order_by(ranked.c.rank, Event.id.desc()).params(match=expression)
+    try:
+        rows = rows.limit(limit).all()
+    except OperationalError:
+        db.session.rollback()
+        raise ValueError('Invalid search query')
+
+    return [((rank, -event.id), dict(event.to_dict(), score=round(-rank, 4))) for event, rank in rows]
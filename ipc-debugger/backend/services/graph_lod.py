@@ -0,0 +1,387 @@
+import copy
+import math
+from collections import Counter, defaultdict, deque
+import numpy as np
+from backend.models import db, Process, IPCChannel, Tombstone
+
+# Detail levels: 0 = connected components, 1 = communities, 2 = individual processes
+LEVEL_COMPONENTS = 0
+LEVEL_COMMUNITIES = 1
+LEVEL_PROCESSES = 2
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+NODE_SPACING = 40.0
+
+
+def topology_signature(simulation_id):
+    """
+    Fingerprint of the node/edge sets. Row counts and id sums catch
+    inserts and deletes; a deleted row reusing its id on the next insert
+    leaves both unchanged, but the deletion left a tombstone stamped with
+    a new simulation version. Row versions are not used: they also move
+    on state changes, which share the geometry.
+    """
+    processes = db.session.query(
+        db.func.count(Process.id), db.func.coalesce(db.func.sum(Process.id), 0)
+    ).filter(Process.simulation_id == simulation_id).one()
+    channels = db.session.query(
+        db.func.count(IPCChannel.id), db.func.coalesce(db.func.sum(IPCChannel.id), 0)
+    ).filter(IPCChannel.simulation_id == simulation_id).one()
+    deleted = db.session.query(
+        db.func.coalesce(db.func.max(Tombstone.version), 0)
+    ).filter(Tombstone.simulation_id == simulation_id).scalar()
+    return tuple(processes) + tuple(channels) + (deleted,)
+
+
+def spiral(count, spacing, center=(0.0, 0.0)):
+    """Phyllotaxis spiral: evenly packed, deterministic positions"""
+    index = np.arange(count, dtype=np.float64)
+    radius = spacing * np.sqrt(index + 0.5)
+    theta = index * GOLDEN_ANGLE
+    return center[0] + radius * np.cos(theta), center[1] + radius * np.sin(theta)
+
+
+def connected_components(node_ids, edges):
+    """Union-find over undirected edges; returns {node_id: component_index}"""
+    parent = {n: n for n in node_ids}
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    for a, b in edges:
+        if a in parent and b in parent:
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[ra] = rb
+
+    roots = {}
+    return {n: roots.setdefault(find(n), len(roots)) for n in node_ids}
+
+
+def label_propagation(node_ids, edges, max_rounds=10):
+    """Community detection by asynchronous label propagation in a fixed node order"""
+    neighbors = defaultdict(list)
+    for a, b in edges:
+        if a != b:
+            neighbors[a].append(b)
+            neighbors[b].append(a)
+
+    labels = {n: n for n in node_ids}
+    for _ in range(max_rounds):
+        changed = False
+        for n in node_ids:
+            if not neighbors[n]:
+                continue
+            counts = Counter(labels[m] for m in neighbors[n] if m in labels)
+            best = max(counts.values())
+            label = min(l for l, c in counts.items() if c == best)
+            if label != labels[n]:
+                labels[n] = label
+                changed = True
+        if not changed:
+            break
+
+    index = {}
+    return {n: index.setdefault(labels[n], len(index)) for n in node_ids}
+
+
+class GraphLayout:
+    """
+    Precomputed layout and cluster hierarchy for one version of a topology.
+
+    Positions are kept in NumPy arrays so viewport queries are a single
+    vectorized mask. Clusters (components, communities) are placed on a
+    spiral and their members on a smaller spiral around the cluster center;
+    when the topology changes, surviving processes keep their positions and
+    new ones are placed next to their neighbors.
+    """
+
+    def __init__(self, simulation_id, version, previous=None, states=None):
+        self.simulation_id = simulation_id
+        self.version = version
+
+        rows = db.session.query(
+            Process.id, Process.process_name, Process.state
+        ).filter(Process.simulation_id == simulation_id).order_by(Process.id).all()
+        self.edges = db.session.query(
+            IPCChannel.id, IPCChannel.sender_id, IPCChannel.receiver_id, IPCChannel.ipc_type
+        ).filter(IPCChannel.simulation_id == simulation_id).order_by(IPCChannel.id).all()
+
+        self.ids = [r[0] for r in rows]
+        self.names = {r[0]: r[1] for r in rows}
+        self.states = {r[0]: r[2] for r in rows}
+        if states:
+            self.states.update((k, v) for k, v in states.items() if k in self.states)
+        self.index = {process_id: i for i, process_id in enumerate(self.ids)}
+
+        pairs = [(sender, receiver) for _, sender, receiver, _ in self.edges]
+        self.clusters = {
+            LEVEL_COMPONENTS: connected_components(self.ids, pairs),
+            LEVEL_COMMUNITIES: label_propagation(self.ids, pairs)
+        }
+
+        self.x = np.zeros(len(self.ids))
+        self.y = np.zeros(len(self.ids))
+        if previous is not None and previous.ids:
+            self._extend(previous, pairs)
+        else:
+            self._layout()
+
+        self.centroids = {level: self._centroids(level) for level in self.clusters}
+
+    def _layout(self):
+        """Place communities on a spiral and members around each community center"""
+        members = defaultdict(list)
+        for process_id in self.ids:
+            members[self.clusters[LEVEL_COMMUNITIES][process_id]].append(process_id)
+
+        # Largest communities closest to the origin
+        ordered = sorted(members.values(), key=len, reverse=True)
+        radii = [NODE_SPACING * math.sqrt(len(m) + 1) for m in ordered]
+        spacing = 2.2 * max(radii) / math.sqrt(2) if radii else NODE_SPACING
+        cx, cy = spiral(len(ordered), spacing)
+
+        for k, group in enumerate(ordered):
+            gx, gy = spiral(len(group), NODE_SPACING, (cx[k], cy[k]))
+            rows = [self.index[p] for p in group]
+            self.x[rows] = gx
+            self.y[rows] = gy
+
+    def _extend(self, previous, pairs):
+        """Keep surviving positions; put new processes next to a placed neighbor"""
+        neighbors = defaultdict(list)
+        for a, b in pairs:
+            neighbors[a].append(b)
+            neighbors[b].append(a)
+
+        placed = {}
+        for process_id in self.ids:
+            row = previous.index.get(process_id)
+            if row is not None:
+                placed[process_id] = (previous.x[row], previous.y[row])
+
+        new = [p for p in self.ids if p not in placed]
+        if placed:
+            xs = [xy[0] for xy in placed.values()]
+            ys = [xy[1] for xy in placed.values()]
+            outer = math.hypot(max(map(abs, xs)), max(map(abs, ys))) + NODE_SPACING
+        else:
+            outer = 0.0
+
+        overflow = 0
+        for i, process_id in enumerate(new):
+            anchor = next((placed[n] for n in neighbors[process_id] if n in placed), None)
+            if anchor is not None:
+                angle = i * GOLDEN_ANGLE
+                placed[process_id] = (anchor[0] + NODE_SPACING * math.cos(angle),
+                                      anchor[1] + NODE_SPACING * math.sin(angle))
+            else:
+                angle = overflow * GOLDEN_ANGLE
+                radius = outer + NODE_SPACING * math.sqrt(overflow + 1)
+                placed[process_id] = (radius * math.cos(angle), radius * math.sin(angle))
+                overflow += 1
+
+        for process_id, (px, py) in placed.items():
+            row = self.index[process_id]
+            self.x[row] = px
+            self.y[row] = py
+
+    def _centroids(self, level):
+        """Per-cluster center, radius, size and state counts"""
+        assignment = np.array([self.clusters[level][p] for p in self.ids], dtype=np.int64)
+        count = int(assignment.max()) + 1 if len(assignment) else 0
+        size = np.bincount(assignment, minlength=count)
+        cx = np.bincount(assignment, weights=self.x, minlength=count) / np.maximum(size, 1)
+        cy = np.bincount(assignment, weights=self.y, minlength=count) / np.maximum(size, 1)
+        spread = np.hypot(self.x - cx[assignment], self.y - cy[assignment]) if count else np.zeros(0)
+        radius = np.zeros(count)
+        if count:
+            np.maximum.at(radius, assignment, spread)
+
+        return {
+            'assignment': assignment,
+            'x': cx,
+            'y': cy,
+            'size': size,
+            'radius': radius + NODE_SPACING / 2,
+            'states': self._state_counts(assignment)
+        }
+
+    def _state_counts(self, assignment):
+        states = defaultdict(Counter)
+        for process_id, cluster in zip(self.ids, assignment.tolist()):
+            states[cluster][self.states[process_id]] += 1
+        return states
+
+    def with_states(self, states, version):
+        """New version with updated process states, sharing this layout's geometry"""
+        layout = copy.copy(self)
+        layout.version = version
+        layout.states = states
+        layout.centroids = {
+            level: dict(centroids, states=layout._state_counts(centroids['assignment']))
+            for level, centroids in self.centroids.items()
+        }
+        return layout
+
+    def view(self, level, bounds=None):
+        """
+        Nodes and edges visible in a viewport at a detail level
+        bounds: (x0, y0, x1, y1) or None for everything
+        Returns: {'nodes': {key: node}, 'edges': {key: edge}}
+        """
+        if level >= LEVEL_PROCESSES:
+            return self._process_view(bounds)
+        return self._cluster_view(level, bounds)
+
+    def _process_view(self, bounds):
+        if bounds is None:
+            visible = np.ones(len(self.ids), dtype=bool)
+        else:
+            x0, y0, x1, y1 = bounds
+            visible = (self.x >= x0) & (self.x <= x1) & (self.y >= y0) & (self.y <= y1)
+        nodes = {}
+        for row in np.flatnonzero(visible).tolist():
+            process_id = self.ids[row]
+            nodes[f'p{process_id}'] = {
+                'id': f'p{process_id}',
+                'type': 'process',
+                'process_id': process_id,
+                'name': self.names[process_id],
+                'state': self.states[process_id],
+                'x': round(float(self.x[row]), 1),
+                'y': round(float(self.y[row]), 1)
+            }
+
+        edges = {}
+        for channel_id, sender, receiver, ipc_type in self.edges:
+            if f'p{sender}' in nodes or f'p{receiver}' in nodes:
+                edges[f'e{channel_id}'] = {
+                    'id': f'e{channel_id}',
+                    'source': f'p{sender}',
+                    'target': f'p{receiver}',
+                    'ipc_type': ipc_type,
+                    'count': 1
+                }
+        return {'nodes': nodes, 'edges': edges}
+
+    def _cluster_view(self, level, bounds):
+        centroids = self.centroids[level]
+        prefix = 'k' if level == LEVEL_COMPONENTS else 'c'
+        if bounds is None:
+            visible = np.ones(len(centroids['size']), dtype=bool)
+        else:
+            # A cluster is visible if its disk intersects the viewport
+            x0, y0, x1, y1 = bounds
+            nearest_x = np.clip(centroids['x'], x0, x1)
+            nearest_y = np.clip(centroids['y'], y0, y1)
+            visible = np.hypot(centroids['x'] - nearest_x, centroids['y'] - nearest_y) <= centroids['radius']
+
+        nodes = {}
+        for cluster in np.flatnonzero(visible).tolist():
+            key = f'{prefix}{cluster}'
+            nodes[key] = {
+                'id': key,
+                'type': 'cluster',
+                'size': int(centroids['size'][cluster]),
+                'states': dict(centroids['states'][cluster]),
+                'x': round(float(centroids['x'][cluster]), 1),
+                'y': round(float(centroids['y'][cluster]), 1),
+                'radius': round(float(centroids['radius'][cluster]), 1)
+            }
+
+        # Channels between clusters collapse into one weighted edge per pair and type
+        assignment = self.clusters[level]
+        edges = {}
+        for _, sender, receiver, ipc_type in self.edges:
+            a, b = assignment.get(sender), assignment.get(receiver)
+            if a is None or b is None or a == b:
+                continue
+            source, target = f'{prefix}{a}', f'{prefix}{b}'
+            if source not in nodes and target not in nodes:
+                continue
+            key = f'{source}-{target}-{ipc_type}'
+            edge = edges.get(key)
+            if edge is None:
+                edges[key] = {'id': key, 'source': source, 'target': target, 'ipc_type': ipc_type, 'count': 1}
+            else:
+                edge['count'] += 1
+        return {'nodes': nodes, 'edges': edges}
+
+    def bounds(self):
+        if not self.ids:
+            return [0, 0, 0, 0]
+        return [float(self.x.min()), float(self.y.min()), float(self.x.max()), float(self.y.max())]
+
+
+class GraphService:
+    """Caches layouts per simulation and serves viewport views and diffs"""
+
+    def __init__(self, history=8, live_states=None):
+        self.history = history
+        self.live_states = live_states  # simulation_id -> {process_id: state} not yet checkpointed
+        self.layouts = {}  # simulation_id -> deque of GraphLayout (newest last)
+        self.signatures = {}  # simulation_id -> topology signature of the newest layout
+
+    def layout(self, simulation_id):
+        """
+        Current layout. The geometry is rebuilt only when the topology changed;
+        a change in process states alone produces a new version sharing it.
+        """
+        signature = topology_signature(simulation_id)
+        live = self.live_states(simulation_id) if self.live_states else {}
+        versions = self.layouts.get(simulation_id)
+        previous = versions[-1] if versions else None
+
+        if previous is not None and self.signatures.get(simulation_id) == signature:
+            states = dict(db.session.query(Process.id, Process.state).filter(
+                Process.simulation_id == simulation_id
+            ).all())
+            states.update(live)
+            if states == previous.states:
+                return previous
+            latest = previous.with_states(states, previous.version + 1)
+        else:
+            version = previous.version + 1 if previous else 1
+            latest = GraphLayout(simulation_id, version, previous, live)
+
+        if versions is None:
+            versions = self.layouts[simulation_id] = deque(maxlen=self.history)
+        versions.append(latest)
+        self.signatures[simulation_id] = signature
+        return latest
+
+    def find(self, simulation_id, version):
+        for layout in self.layouts.get(simulation_id, ()):
+            if layout.version == version:
+                return layout
+        return None
+
+    def forget(self, simulation_id):
+        self.layouts.pop(simulation_id, None)
+        self.signatures.pop(simulation_id, None)
+
+    @staticmethod
+    def diff(old_view, new_view):
+        """Added, removed and changed nodes/edges between two views"""
+        result = {}
+        for kind in ('nodes', 'edges'):
+            old, new = old_view[kind], new_view[kind]
+            result[kind] = {
+                'added': [new[k] for k in new.keys() - old.keys()],
+                'removed': sorted(old.keys() - new.keys()),
+                'changed': [new[k] for k in new.keys() & old.keys() if new[k] != old[k]]
+            }
+        return result
+
+
+def level_for_zoom(zoom, thresholds):
+    """Map a zoom factor to a detail level (coarse when zoomed out)"""
+    if zoom < thresholds[0]:
+        return LEVEL_COMPONENTS
+    if zoom < thresholds[1]:
+        return LEVEL_COMMUNITIES
+    return LEVEL_PROCESSES
@@ -2,6 +2,7 @@ import random
 import time
 from datetime import datetime
 import json
+from backend.services import shmem_ring
 
 class IPCSimulator:
     """Simulates different IPC mechanisms"""
@@ -11,14 +12,17 @@ class IPCSimulator:
         self.pipe_delay_range = config.DEFAULT_PIPE_DELAY
         self.queue_delay_range = config.DEFAULT_QUEUE_DELAY
         self.shmem_delay_range = config.DEFAULT_SHMEM_DELAY
+        self.ring_capacity = config.SHMEM_RING_CAPACITY
+        self.max_ring_capacity = config.SHMEM_RING_MAX_CAPACITY
         
-    def simulate_pipe(self, message, channel_config):
+    def simulate_pipe(self, message, channel_config, message_size=None):
         """
         Simulate pipe communication (unidirectional FIFO)
         Returns: (success, delay_ms, info)
         """
         buffer_size = channel_config.get('buffer_size', 4096)
-        message_size = len(message.encode('utf-8'))
+        if message_size is None:
+            message_size = len(message.encode('utf-8'))
         
         if message_size > buffer_size:
             return False, 0, f"Message size ({message_size}) exceeds buffer size ({buffer_size})"
@@ -66,13 +70,63 @@ class IPCSimulator:
         
         return True, delay, info
     
-    def send_message(self, ipc_type, message, channel_config):
+    def benchmark_error(self, channel_config, message_size, producers=1):
         """
-        Send message through specified IPC mechanism
+        Check a shared-memory benchmark before allocating the ring
+        Returns: error message, or None
+        """
+        capacity = channel_config.get('ring_capacity', self.ring_capacity)
+        if isinstance(capacity, bool) or not isinstance(capacity, int) \
+                or not 0 < capacity <= self.max_ring_capacity:
+            return f"ring_capacity must be an integer between 1 and {self.max_ring_capacity} bytes"
+        if producers > 1 and not channel_config.get('use_mutex', True):
+            return "Multiple producers require use_mutex"
+        if shmem_ring.record_size(message_size) > shmem_ring.record_size(capacity):
+            return f"Message size ({message_size}) exceeds ring capacity ({capacity})"
+        return None
+    
+    def benchmark_shared_memory(self, channel_config, message_size=4096, count=10000, producers=1,
+                                progress=None):
+        """
+        Move real messages between processes through a shared-memory ring buffer.
+        use_mutex selects the locked multi-producer ring, otherwise the
+        lock-free single-producer ring is used.
+        Returns: (success, results, info)
+        """
+        use_mutex = channel_config.get('use_mutex', True)
+        capacity = channel_config.get('ring_capacity', self.ring_capacity)
+        
+        error = self.benchmark_error(channel_config, message_size, producers)
+        if error:
+            return False, None, error
+        
+        try:
+            results = shmem_ring.benchmark(
+                message_size=message_size,
+                count=count,
+                capacity=capacity,
+                use_mutex=use_mutex,
+                producers=producers,
+                progress=progress
+            )
+        except (ValueError, RuntimeError) as e:
+            return False, None, str(e)
+        
+        if use_mutex:
+            info = f"Locked ring buffer, {producers} producer(s)"
+        else:
+            info = "Lock-free SPSC ring buffer"
+        
+        return True, results, info
+    
+    def send_message(self, ipc_type, message, channel_config, message_size=None):
+        """
+        Send message through specified IPC mechanism.
+        message_size lets trace replay simulate a payload without building it.
         Returns: (success, delay_ms, info)
         """
         if ipc_type == 'pipe':
-            return self.simulate_pipe(message, channel_config)
+            return self.simulate_pipe(message, channel_config, message_size)
         elif ipc_type == 'queue':
             return self.simulate_message_queue(message, channel_config)
         elif ipc_type == 'shmem':
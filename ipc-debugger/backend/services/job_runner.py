@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+JOB_KINDS = ('bottleneck_analysis', 'deadlock_detection', 'log_export', 'shmem_benchmark')
+
+
+class Job:
+    """One queued or running analysis/export and its result"""
+
+    def __init__(self, kind, simulation_id, key):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.simulation_id = simulation_id
+        self.key = key
+        self.status = 'queued'  # queued, running, completed, failed
+        self.progress = 0.0
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        now = time.monotonic()
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'simulation_id': self.simulation_id,
+            'data_version': self.key[-1],
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'stage': self.stage,
+            'error': self.error,
+            'queued_s': round((self.started or now) - self.created, 3),
+            'elapsed_s': round((self.finished or now) - self.started, 3) if self.started else 0
+        }
+
+
+class JobRunner:
+    """
+    Bounded executor for heavy analyses and exports.
+
+    Jobs are keyed by (kind, simulation_id, params, data_version). A request
+    whose key matches a completed job gets that job back without recomputing;
+    one matching a queued or running job shares it. At most max_workers jobs
+    run at once; the rest wait in a FIFO queue.
+
+    A result dict whose 'content' is text or bytes longer than spill_bytes
+    is written to spill_dir and its 'content' replaced by 'path', so the
+    history does not hold large exports in memory; the file is deleted when
+    the job leaves the history.
+    """
+
+    def __init__(self, max_workers=2, history=256, spill_dir=None, spill_bytes=0):
+        self.max_workers = max_workers
+        self.history = history
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()  # job_id -> Job, oldest first
+        self.by_key = {}  # key -> Job (queued, running or completed)
+        self.queue = deque()  # (job, task, on_progress, offload, sleep)
+        self.workers = 0
+
+        # Spilled results do not outlive the process that computed them
+        if spill_dir and os.path.isdir(spill_dir):
+            for name in os.listdir(spill_dir):
+                if name.endswith('.result'):
+                    os.remove(os.path.join(spill_dir, name))
+
+    def find(self, key):
+        """Completed, queued or running job for this key, if any"""
+        with self.lock:
+            return self.by_key.get(key)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def submit(self, kind, simulation_id, key, task, on_progress=None, spawn=None,
+               offload=None, sleep=None):
+        """
+        Queue task(report) unless an identical job exists; report(fraction, stage)
+        updates progress and is forwarded to on_progress(job). Workers are
+        started with spawn (socketio.start_background_task, so they cooperate
+        with eventlet) or a daemon thread.
+
+        Under eventlet those workers are green threads, so a CPU-bound task
+        would stall every request; offload(fn, *args) (eventlet.tpool.execute)
+        runs the task on a native thread instead. Its progress is then
+        forwarded by a separate green thread polling with sleep, since the
+        native thread must not emit socket events itself.
+        Returns: (job, created)
+        """
+        with self.lock:
+            job = self.by_key.get(key)
+            if job is not None:
+                return job, False
+
+            job = Job(kind, simulation_id, key)
+            self._track(job)
+            self.queue.append((job, task, on_progress, offload, sleep))
+            start = self.workers < self.max_workers
+            if start:
+                self.workers += 1
+
+        if start:
+            spawn = spawn or (lambda target: threading.Thread(target=target, daemon=True).start())
+            spawn(lambda: self._work(spawn))
+        return job, True
+
+    def run(self, kind, simulation_id, key, task, offload=None, sleep=None):
+        """
+        Run task inline (synchronous requests), sharing the result cache;
+        offload as in submit(). A matching queued or running job is awaited
+        by polling with sleep (socketio.sleep): blocking on the job's
+        threading.Event would freeze the unpatched eventlet hub, and with it
+        the job's own progress and tpool result.
+        Returns: the completed or failed Job
+        """
+        with self.lock:
+            job = self.by_key.get(key)
+            if job is None:
+                job = Job(kind, simulation_id, key)
+                self._track(job)
+                inline = True
+            else:
+                inline = False
+
+        if inline:
+            self._execute(job, task, None, offload)
+        elif sleep:
+            while not job.done.is_set():
+                sleep(0.05)
+        else:
+            job.done.wait()
+        return job
+
+    def forget(self, simulation_id):
+        """Drop cached results of a deleted simulation"""
+        with self.lock:
+            for key, job in list(self.by_key.items()):
+                if job.simulation_id == simulation_id and job.done.is_set():
+                    del self.by_key[key]
+                    self.jobs.pop(job.job_id, None)
+                    self._release(job)
+
+    def stats(self):
+        with self.lock:
+            statuses = {}
+            for job in self.jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                'workers': self.workers,
+                'max_workers': self.max_workers,
+                'queued': len(self.queue),
+                'jobs': statuses
+            }
+
+    def _track(self, job):
+        """Register a new job, evicting the oldest finished ones (lock held)"""
+        self.jobs[job.job_id] = job
+        self.by_key[job.key] = job
+        while len(self.jobs) > self.history:
+            oldest = next((j for j in self.jobs.values() if j.done.is_set()), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest.job_id]
+            if self.by_key.get(oldest.key) is oldest:
+                del self.by_key[oldest.key]
+            self._release(oldest)
+
+    def _spill(self, job):
+        """Move a large result's content to a file"""
+        result = job.result
+        content = result.get('content') if isinstance(result, dict) else None
+        if not self.spill_dir or not isinstance(content, (str, bytes)) or len(content) <= self.spill_bytes:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f'{job.job_id}.result')
+        with open(path, 'wb') as f:
+            f.write(content.encode('utf-8') if isinstance(content, str) else content)
+        job.result = {key: value for key, value in result.items() if key != 'content'}
+        job.result['path'] = path
+
+    def _release(self, job):
+        """Delete an evicted job's spilled result"""
+        path = job.result.get('path') if isinstance(job.result, dict) else None
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _work(self, spawn):
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.workers -= 1
+                    return
+                job, task, on_progress, offload, sleep = self.queue.popleft()
+            if offload and on_progress and sleep:
+                spawn(lambda: self._forward_progress(job, on_progress, sleep))
+            self._execute(job, task, on_progress, offload)
+
+    def _forward_progress(self, job, on_progress, sleep, interval=0.25):
+        """Emit progress of a job running on a native thread until it finishes"""
+        reported = None
+        while not job.done.is_set():
+            if (job.progress, job.stage) != reported and job.status == 'running':
+                reported = (job.progress, job.stage)
+                on_progress(job)
+            sleep(interval)
+
+    def _execute(self, job, task, on_progress, offload=None):
+        def report(fraction, stage=None):
+            job.progress = min(max(fraction, 0.0), 1.0)
+            job.stage = stage
+            if on_progress and not offload:
+                on_progress(job)
+
+        job.status = 'running'
+        job.started = time.monotonic()
+        report(0.0, 'started')
+        try:
+            job.result = offload(task, report) if offload else task(report)
+            self._spill(job)
+            job.status = 'completed'
+            job.progress = 1.0
+            job.stage = 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.stage = 'failed'
+            # Failures are not cached: the next identical request retries
+            with self.lock:
+                if self.by_key.get(job.key) is job:
+                    del self.by_key[job.key]
+        finally:
+            job.finished = time.monotonic()
+            job.done.set()
+        if on_progress:
+            on_progress(job)
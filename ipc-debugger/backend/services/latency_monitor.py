@@ -0,0 +1,114 @@
+import json
+import math
+from backend.models import Event
+
+
+class LatencyShiftDetector:
+    """
+    Streaming change-point detector for one latency series, O(1) per sample.
+
+    A baseline mean/variance is learned over a warm-up window and then
+    tracked with an EWMA while the series is in control. Standardized
+    samples feed a one-sided CUSUM; when it crosses h a shift has started.
+    During a shift the baseline is frozen and a second CUSUM accumulates
+    samples back near the baseline; when that crosses h the shift has ended.
+    """
+
+    __slots__ = ('alpha', 'k', 'h', 'warmup', 'count', 'mean', 'var',
+                 'high', 'low', 'run_sum', 'run_count', 'in_shift', 'shift_sum', 'shift_count', 'shift_peak')
+
+    def __init__(self, alpha=0.01, k=0.75, h=8.0, warmup=20):
+        self.alpha = alpha
+        self.k = k
+        self.h = h
+        self.warmup = warmup
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.high = 0.0  # CUSUM for an upward shift
+        self.low = 0.0  # CUSUM for the return to baseline
+        self.run_sum = 0.0  # samples since the upward CUSUM last left zero
+        self.run_count = 0
+        self.in_shift = False
+        self.shift_sum = 0.0
+        self.shift_count = 0
+        self.shift_peak = 0
+
+    @property
+    def sigma(self):
+        # Floor keeps near-constant series from alarming on tiny jitter
+        return max(math.sqrt(self.var), 0.05 * self.mean, 1.0)
+
+    def update(self, delay_ms):
+        """
+        Add a sample
+        Returns: 'started', 'ended' or None
+        """
+        self.count += 1
+        if self.count <= self.warmup:
+            # Welford running mean/variance for the initial baseline
+            delta = delay_ms - self.mean
+            self.mean += delta / self.count
+            self.var += (delta * (delay_ms - self.mean) - self.var) / self.count
+            return None
+
+        z = (delay_ms - self.mean) / self.sigma
+
+        if not self.in_shift:
+            self.high = max(0.0, self.high + z - self.k)
+            if self.high == 0.0:
+                self.run_sum, self.run_count = 0.0, 0
+            else:
+                self.run_sum += delay_ms
+                self.run_count += 1
+            if self.high > self.h:
+                # The shift began where the CUSUM run started
+                self.in_shift = True
+                self.high = self.low = 0.0
+                self.shift_sum, self.shift_count, self.shift_peak = self.run_sum, self.run_count, delay_ms
+                return 'started'
+            delta = delay_ms - self.mean
+            self.mean += self.alpha * delta
+            self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+            return None
+
+        self.shift_sum += delay_ms
+        self.shift_count += 1
+        self.shift_peak = max(self.shift_peak, delay_ms)
+        self.low = max(0.0, self.low - z + self.k)
+        if self.low > self.h:
+            self.in_shift = False
+            self.low = 0.0
+            return 'ended'
+        return None
+
+    def state(self):
+        return {
+            'baseline_ms': round(self.mean, 2),
+            'sigma_ms': round(self.sigma, 2),
+            'in_shift': self.in_shift,
+            'shift_avg_ms': round(self.shift_sum / self.shift_count, 2) if self.shift_count else None,
+            'shift_peak_ms': self.shift_peak if self.shift_count else None,
+            'samples': self.count
+        }
+
+
+def shift_event(simulation_id, transition, name):
+    """Event row for the start or end of a latency shift"""
+    started = transition['state'] == 'started'
+    subject = f'{transition["scope"]} {name}'
+    if started:
+        message = (f'Latency shift on {subject}: {transition["shift_avg_ms"]}ms '
+                   f'(baseline {transition["baseline_ms"]}ms)')
+    else:
+        message = (f'Latency shift ended on {subject}: back to {transition["baseline_ms"]}ms '
+                   f'(shift avg {transition["shift_avg_ms"]}ms, peak {transition["shift_peak_ms"]}ms)')
+
+    return Event(
+        simulation_id=simulation_id,
+        process_id=transition['id'] if transition['scope'] == 'process' else None,
+        event_type='bottleneck_detected' if started else 'bottleneck_resolved',
+        severity='warning' if started else 'info',
+        message=message,
+        event_metadata=json.dumps(dict(transition, name=name))
+    )
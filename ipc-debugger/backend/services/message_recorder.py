@@ -0,0 +1,213 @@
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.models import latency_bucket
+
+SAMPLING_MODES = ('all', 'nth', 'reservoir', 'outliers', 'adaptive')
+
+
+class MessageRecorder:
+    """
+    Decides which messages get a Message/Event row while keeping exact
+    per-channel aggregates for every message.
+
+    Modes:
+        all       - record every message
+        nth       - record 1 in every n messages per channel
+        reservoir - keep a uniform random sample of reservoir_size rows per channel
+        outliers  - record only messages slower than the outlier threshold
+        adaptive  - 1-in-n where n follows the observed write pressure
+    Outliers are always recorded in the sampled modes.
+    """
+
+    def __init__(self, policy, config):
+        if policy_error(policy) is not None:
+            # Stored before policies were validated; record with the app default
+            policy = config.RECORDING_POLICY
+        if isinstance(policy, str):
+            policy = {'mode': policy}
+
+        self.mode = policy.get('mode', 'all')
+        if self.mode not in SAMPLING_MODES:
+            self.mode = 'all'
+        self.n = max(1, int(policy.get('n', config.RECORDER_SAMPLE_N)))
+        self.reservoir_size = max(1, int(policy.get('reservoir_size', config.RECORDER_RESERVOIR_SIZE)))
+        self.outlier_threshold = policy.get('outlier_threshold', config.BOTTLENECK_THRESHOLD)
+
+        self.target_rows_per_sec = config.RECORDER_TARGET_ROWS_PER_SEC
+        self.max_commit_ms = config.RECORDER_MAX_COMMIT_MS
+        self.flush_interval = config.RECORDER_FLUSH_INTERVAL
+
+        self.seen = defaultdict(int)  # channel_id -> messages observed
+        self.reservoirs = defaultdict(list)  # channel_id -> [(message_id, event_id)]
+        self.pending = {}  # channel_id -> [count, delay_sum, delay_max, bytes]
+        self.pending_buckets = defaultdict(lambda: defaultdict(int))  # channel_id -> {latency bucket: count}
+        self.last_flush = time.monotonic()
+
+        # Write pressure tracking for adaptive mode
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.arrival_rate = 0.0
+        self.commit_ms = 0.0
+        self.adaptive_n = 1
+
+    def observe(self, channel_id, size_bytes, delay_ms):
+        """Account for a message in the exact aggregates, recorded or not"""
+        self.seen[channel_id] += 1
+
+        stats = self.pending.get(channel_id)
+        if stats is None:
+            stats = self.pending[channel_id] = [0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += delay_ms
+        stats[2] = max(stats[2], delay_ms)
+        stats[3] += size_bytes
+        self.pending_buckets[channel_id][latency_bucket(delay_ms)] += 1
+
+        now = time.monotonic()
+        self.window_count += 1
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            self.arrival_rate = self.window_count / elapsed
+            self.window_start = now
+            self.window_count = 0
+            self._adapt()
+
+    def _adapt(self):
+        """Pick n so recorded rows stay within the write budget"""
+        n = max(1, math.ceil(self.arrival_rate / self.target_rows_per_sec))
+        if self.commit_ms > self.max_commit_ms:
+            n = max(n, self.adaptive_n * 2)
+        self.adaptive_n = n
+
+    def record_commit(self, duration_ms):
+        """Feed back how long the last recorded write took"""
+        self.commit_ms = 0.8 * self.commit_ms + 0.2 * duration_ms
+
+    def sample(self, channel_id, delay_ms):
+        """
+        Decide whether the message just observed gets raw rows
+        Returns: (record, slot) - slot is the reservoir index to replace, if any
+        """
+        if self.mode == 'all':
+            return True, None
+
+        if delay_ms > self.outlier_threshold:
+            return True, None
+
+        seen = self.seen[channel_id]
+        if self.mode == 'nth':
+            return (seen - 1) % self.n == 0, None
+        if self.mode == 'adaptive':
+            return (seen - 1) % self.adaptive_n == 0, None
+        if self.mode == 'reservoir':
+            reservoir = self.reservoirs[channel_id]
+            if len(reservoir) < self.reservoir_size:
+                return True, len(reservoir)
+            slot = random.randrange(seen)
+            if slot < self.reservoir_size:
+                return True, slot
+
+        return False, None
+
+    def admit(self, channel_id, slot, row_ids):
+        """
+        Place recorded rows in the channel's reservoir
+        Returns: (message_id, event_id) of the evicted sample, or None
+        """
+        if slot is None:
+            return None
+
+        reservoir = self.reservoirs[channel_id]
+        if slot == len(reservoir):
+            reservoir.append(row_ids)
+            return None
+
+        evicted = reservoir[slot]
+        reservoir[slot] = row_ids
+        return evicted
+
+    def due(self):
+        """Whether pending aggregates should be flushed"""
+        return bool(self.pending) and time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self, session):
+        """Add pending aggregates to the persisted channel statistics and delay histograms"""
+        from backend.models import ChannelStats, LatencyBucket
+
+        for channel_id, (count, delay_sum, delay_max, size_bytes) in self.pending.items():
+            stats = session.get(ChannelStats, channel_id)
+            if stats is None:
+                # Normally created with the channel or seeded on its first send
+                stats = ChannelStats(channel_id=channel_id, message_count=0, delay_sum_ms=0,
+                                     delay_max_ms=0, bytes_total=0)
+                session.add(stats)
+            stats.message_count += count
+            stats.delay_sum_ms += delay_sum
+            stats.delay_max_ms = max(stats.delay_max_ms, delay_max)
+            stats.bytes_total += size_bytes
+
+        rows = [
+            {'channel_id': channel_id, 'bucket': bucket, 'count': count}
+            for channel_id, buckets in self.pending_buckets.items()
+            for bucket, count in buckets.items()
+        ]
+        if rows:
+            upsert = sqlite_insert(LatencyBucket)
+            session.execute(upsert.on_conflict_do_update(
+                index_elements=['channel_id', 'bucket'],
+                set_={'count': LatencyBucket.count + upsert.excluded['count']}
+            ), rows)
+
+        self.pending.clear()
+        self.pending_buckets.clear()
+        self.last_flush = time.monotonic()
+
+    def forget_channel(self, channel_id):
+        """Drop in-memory state for a deleted channel"""
+        self.seen.pop(channel_id, None)
+        self.reservoirs.pop(channel_id, None)
+        self.pending.pop(channel_id, None)
+        self.pending_buckets.pop(channel_id, None)
+
+    def summary(self):
+        return {
+            'mode': self.mode,
+            'n': self.adaptive_n if self.mode == 'adaptive' else self.n,
+            'reservoir_size': self.reservoir_size,
+            'outlier_threshold': self.outlier_threshold,
+            'arrival_rate': round(self.arrival_rate, 2),
+            'commit_ms': round(self.commit_ms, 3)
+        }
+
+
+def policy_error(policy):
+    """
+    Check a recording policy: a mode name or {'mode', 'n', 'reservoir_size', 'outlier_threshold'}
+    Returns: error message, or None if the policy is valid
+    """
+    if isinstance(policy, str):
+        policy = {'mode': policy}
+    if not isinstance(policy, dict):
+        return 'recording_policy must be a mode name or an object'
+
+    mode = policy.get('mode', 'all')
+    if mode not in SAMPLING_MODES:
+        return f"Unknown recording mode: {mode} (expected one of {', '.join(SAMPLING_MODES)})"
+    for key in ('n', 'reservoir_size'):
+        value = policy.get(key, 1)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            return f'recording_policy.{key} must be a positive integer'
+    threshold = policy.get('outlier_threshold', 0)
+    if not isinstance(threshold, (int, float)) or isinstance(threshold, bool) or not 0 <= threshold < math.inf:
+        return 'recording_policy.outlier_threshold must be a non-negative number'
+    return None
+
+
+def get_sampling_policy(simulation, default='all'):
+    """Recording policy from the simulation config, falling back to the app default"""
+    config = json.loads(simulation.config) if simulation.config else {}
+    return config.get('recording_policy', default)
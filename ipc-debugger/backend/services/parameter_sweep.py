@@ -0,0 +1,215 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from backend.services.ipc_simulator import IPCSimulator
+from backend.services.bottleneck_analyzer import BottleneckAnalyzer
+
+DELAY_SETTINGS = {
+    'pipe': 'DEFAULT_PIPE_DELAY',
+    'queue': 'DEFAULT_QUEUE_DELAY',
+    'shmem': 'DEFAULT_SHMEM_DELAY'
+}
+
+RANK_METRICS = {
+    'avg_latency_ms': False,  # metric -> descending?
+    'p95_latency_ms': False,
+    'throughput_per_sec': True,
+    'bottleneck_count': False,
+    'failed': False
+}
+
+_pool = None
+_cache = OrderedDict()  # variant hash -> metrics
+
+
+def get_pool(max_workers=None):
+    """Shared process pool, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    return _pool
+
+
+def snapshot_topology(simulation):
+    """Plain, picklable copy of a simulation's processes and channels"""
+    return {
+        'processes': [
+            {'id': p.id, 'process_name': p.process_name}
+            for p in sorted(simulation.processes, key=lambda p: p.id)
+        ],
+        'channels': [
+            {
+                'id': c.id,
+                'ipc_type': c.ipc_type,
+                'sender_id': c.sender_id,
+                'receiver_id': c.receiver_id,
+                'config': json.loads(c.config) if c.config else {}
+            }
+            for c in sorted(simulation.ipc_channels, key=lambda c: c.id)
+        ]
+    }
+
+
+def is_delay_range(value):
+    return (isinstance(value, list) and len(value) == 2
+            and all(isinstance(v, int) and not isinstance(v, bool) for v in value)
+            and 0 <= value[0] <= value[1])
+
+
+def expand_grid(grid):
+    """
+    Cartesian product of channel config and delay-range variations
+    grid: {'channel_config': {key: [values]}, 'delay_ranges': {ipc_type: [[lo, hi], ...]}}
+    Returns: [{'channel_config': {...}, 'delay_ranges': {...}}]
+    Raises: ValueError for a malformed grid
+    """
+    if not isinstance(grid, dict):
+        raise ValueError("grid must be an object with channel_config and/or delay_ranges")
+    unknown = sorted(set(grid) - {'channel_config', 'delay_ranges'})
+    if unknown:
+        raise ValueError(f"Unknown grid section: {unknown[0]} (expected channel_config or delay_ranges)")
+    channel_config = grid.get('channel_config', {})
+    delay_ranges = grid.get('delay_ranges', {})
+    if not isinstance(channel_config, dict) or not isinstance(delay_ranges, dict):
+        raise ValueError("channel_config and delay_ranges must map names to lists of values")
+
+    axes = []
+    for key, values in sorted(channel_config.items()):
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"channel_config.{key} must be a non-empty list of values")
+        axes.append([('channel_config', key, value) for value in values])
+    for ipc_type, ranges in sorted(delay_ranges.items()):
+        if ipc_type not in DELAY_SETTINGS:
+            raise ValueError(f"Unknown IPC type in delay_ranges: {ipc_type}")
+        if not isinstance(ranges, list) or not ranges or not all(is_delay_range(r) for r in ranges):
+            raise ValueError(f"delay_ranges.{ipc_type} must be a non-empty list of [low, high] "
+                             f"non-negative integer ranges")
+        axes.append([('delay_ranges', ipc_type, list(r)) for r in ranges])
+
+    variants = []
+    for combination in itertools.product(*axes):
+        variant = {'channel_config': {}, 'delay_ranges': {}}
+        for section, key, value in combination:
+            variant[section][key] = value
+        variants.append(variant)
+    return variants
+
+
+def variant_key(topology, variant, messages_per_channel, message_size, seed):
+    payload = json.dumps([topology, variant, messages_per_channel, message_size, seed], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def run_variant(topology, variant, base_settings, messages_per_channel, message_size, seed):
+    """
+    Run one configuration through IPCSimulator and BottleneckAnalyzer.
+    Executed in a worker process, so it only takes plain data.
+    """
+    settings = dict(base_settings)
+    for ipc_type, delay_range in variant['delay_ranges'].items():
+        settings[DELAY_SETTINGS[ipc_type]] = tuple(delay_range)
+
+    random.seed(seed)
+    simulator = IPCSimulator(SimpleNamespace(**settings))
+    analyzer = BottleneckAnalyzer(settings['BOTTLENECK_THRESHOLD'])
+    message = 'x' * message_size
+
+    processes = {p['id']: SimpleNamespace(**p) for p in topology['processes']}
+    channels = []
+    delays = []
+    failed = 0
+    throughput = 0.0
+
+    for spec in topology['channels']:
+        channel_config = {**spec['config'], **variant['channel_config']}
+        channel_time = 0
+        delivered = 0
+        for _ in range(messages_per_channel):
+            success, delay_ms, _ = simulator.send_message(spec['ipc_type'], message, channel_config)
+            if not success:
+                failed += 1
+                continue
+            delivered += 1
+            channel_time += delay_ms
+            delays.append(delay_ms)
+            analyzer.record_transfer(spec['sender_id'], spec['receiver_id'], spec['id'], delay_ms)
+
+        # Channels transfer in parallel; each one is serial
+        if channel_time:
+            throughput += delivered / channel_time * 1000
+
+        channels.append(SimpleNamespace(
+            id=spec['id'],
+            ipc_type=spec['ipc_type'],
+            sender=processes.get(spec['sender_id']),
+            receiver=processes.get(spec['receiver_id'])
+        ))
+
+    process_analysis = analyzer.analyze_processes(processes.values())
+    delays.sort()
+    return {
+        'messages': len(delays),
+        'failed': failed,
+        'avg_latency_ms': round(sum(delays) / len(delays), 2) if delays else 0,
+        'p95_latency_ms': delays[min(len(delays) - 1, int(len(delays) * 0.95))] if delays else 0,
+        'max_latency_ms': delays[-1] if delays else 0,
+        'throughput_per_sec': round(throughput, 2),
+        'bottleneck_count': sum(1 for p in process_analysis if p['is_bottleneck']),
+        'slow_channels': sum(1 for c in analyzer.analyze_channels(channels) if c['is_slow'])
+    }
+
+
+def run_sweep(topology, grid, config, messages_per_channel=100, message_size=64,
+              seed=0, rank_by='avg_latency_ms', max_workers=None):
+    """
+    Run every grid variant in parallel and rank the results.
+    Variants already computed for the same topology come from the cache.
+    Returns: {'variants': [...ranked], 'computed': int, 'cached': int}
+    """
+    base_settings = {k: getattr(config, k) for k in dir(config) if k.isupper()}
+    variants = expand_grid(grid)
+    if len(variants) > config.SWEEP_MAX_VARIANTS:
+        raise ValueError(f"Grid has {len(variants)} variants (max {config.SWEEP_MAX_VARIANTS})")
+
+    keys = [variant_key(topology, v, messages_per_channel, message_size, seed) for v in variants]
+    metrics = {}
+    missing = []
+    for key, variant in zip(keys, variants):
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics[key] = _cache[key]
+        elif key not in metrics:
+            metrics[key] = None
+            missing.append((key, variant))
+
+    if missing:
+        pool = get_pool(max_workers)
+        futures = [
+            (key, pool.submit(run_variant, topology, v, base_settings, messages_per_channel, message_size, seed))
+            for key, v in missing
+        ]
+        for key, future in futures:
+            metrics[key] = _cache[key] = future.result()
+            if len(_cache) > config.SWEEP_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    results = [
+        {'config_hash': key[:16], 'variant': variant, 'metrics': metrics[key]}
+        for key, variant in zip(keys, variants)
+    ]
+
+    descending = RANK_METRICS.get(rank_by, False)
+    results.sort(key=lambda r: r['metrics'].get(rank_by, 0), reverse=descending)
+    for rank, result in enumerate(results, start=1):
+        result['rank'] = rank
+
+    return {
+        'variants': results,
+        'computed': len(missing),
+        'cached': len(variants) - len(missing)
+    }
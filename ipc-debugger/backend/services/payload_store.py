@@ -0,0 +1,138 @@
+import hashlib
+import json
+import zlib
+from collections import OrderedDict
+from sqlalchemy.exc import IntegrityError
+from backend.models import Payload, Message, IPCChannel
+from backend.utils.sharding import shards
+
+RECORDING_MODES = ('full', 'dedup', 'metadata')
+
+
+class PayloadStore:
+    """Content-addressed, compressed storage for message payloads"""
+    
+    def __init__(self, compress_threshold=1024, cache_size=4096):
+        self.compress_threshold = compress_threshold
+        self.cache_size = cache_size
+        self.digest_cache = OrderedDict()  # digest -> payload_id
+        self.candidates = set()  # payload ids that may have lost their last reference
+    
+    def digest(self, raw):
+        """Content address of a payload"""
+        return hashlib.sha256(raw).hexdigest()
+    
+    def encode(self, raw):
+        """
+        Compress large payloads when it actually saves space
+        Returns: (data, compressed)
+        """
+        if len(raw) >= self.compress_threshold:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                return packed, True
+        return raw, False
+    
+    @staticmethod
+    def decode(payload):
+        """Return the original text of a stored payload"""
+        raw = zlib.decompress(payload.data) if payload.compressed else payload.data
+        return raw.decode('utf-8')
+    
+    def _remember(self, digest, payload_id):
+        self.digest_cache[digest] = payload_id
+        self.digest_cache.move_to_end(digest)
+        if len(self.digest_cache) > self.cache_size:
+            self.digest_cache.popitem(last=False)
+    
+    def get_or_create(self, session, content):
+        """
+        Store content once and return the id of its payload row.
+        Repeated templates hit the in-memory digest cache and cost no query.
+        """
+        raw = content.encode('utf-8')
+        digest = self.digest(raw)
+        
+        payload_id = self.digest_cache.get(digest)
+        if payload_id is not None:
+            self.digest_cache.move_to_end(digest)
+            return payload_id
+        
+        payload = Payload.query.filter_by(digest=digest).first()
+        if payload is None:
+            data, compressed = self.encode(raw)
+            payload = Payload(
+                digest=digest,
+                data=data,
+                compressed=compressed,
+                size_bytes=len(raw)
+            )
+            try:
+                with session.begin_nested():
+                    session.add(payload)
+            except IntegrityError:
+                # Another writer stored the same content first
+                payload = Payload.query.filter_by(digest=digest).first()
+        
+        self._remember(digest, payload.id)
+        return payload.id
+    
+    def forget_simulation(self, session, simulation_id):
+        """
+        Mark the payloads of a simulation about to be deleted as prune
+        candidates. Only these can become unreferenced, so prune() checks
+        them instead of every message of every simulation.
+        Returns: number of candidates added
+        """
+        query = session.query(Message.payload_id).filter(Message.payload_id.isnot(None))
+        if shards.enabled:
+            with shards.scope(simulation_id):
+                payload_ids = {payload_id for (payload_id,) in query.distinct()}
+        else:
+            channel_ids = session.query(IPCChannel.id).filter(IPCChannel.simulation_id == simulation_id)
+            payload_ids = {payload_id for (payload_id,) in query.filter(Message.channel_id.in_(channel_ids)).distinct()}
+        self.candidates.update(payload_ids)
+        return len(payload_ids)
+    
+    def prune(self, session, batch_size=500):
+        """
+        Delete up to batch_size prune candidates that no message references
+        any more. With sharding, each shard is checked with an indexed lookup
+        of just these ids.
+        Returns: number of payloads deleted
+        """
+        batch = set()
+        while self.candidates and len(batch) < batch_size:
+            batch.add(self.candidates.pop())
+        if not batch:
+            return 0
+        
+        try:
+            query = session.query(Message.payload_id).filter(Message.payload_id.in_(batch)).distinct()
+            if shards.enabled:
+                for simulation_id in shards.simulation_ids():
+                    with shards.scope(simulation_id):
+                        batch.difference_update(payload_id for (payload_id,) in query)
+                    if not batch:
+                        return 0
+            else:
+                batch.difference_update(payload_id for (payload_id,) in query)
+            if not batch:
+                return 0
+            deleted = Payload.query.filter(Payload.id.in_(batch)).delete(synchronize_session=False)
+        except Exception:
+            # Check them again on the next run
+            self.candidates.update(batch)
+            raise
+        
+        self.digest_cache = OrderedDict(
+            (digest, payload_id) for digest, payload_id in self.digest_cache.items() if payload_id not in batch
+        )
+        return deleted
+
+
+def get_recording_mode(simulation, default='dedup'):
+    """Message recording mode from the simulation config, falling back to the app default"""
+    config = json.loads(simulation.config) if simulation.config else {}
+    mode = config.get('message_recording', default)
+    return mode if mode in RECORDING_MODES else default
@@ -0,0 +1,263 @@
+import json
+import time
+import uuid
+from array import array
+from sqlalchemy import update
+from backend.models import db, Simulation, Process, IPCChannel, Event
+from backend.services.event_journal import journals, PROCESS, PEER, TYPE, TO, TYPE_CODES
+from backend.services.topology_io import PROCESS_STATES
+from backend.utils.versioning import bump_version
+
+STATE_CODES = {state: code for code, state in enumerate(PROCESS_STATES)}
+
+# Events whose effect on process states is replayed during recovery
+STATE_EVENTS = ('message_sent', 'process_state_changed')
+
+
+def event_watermark(session, simulation_id):
+    """Newest event id of a simulation, events table or journal (0 if none)"""
+    newest = session.query(db.func.max(Event.id)).filter(
+        Event.simulation_id == simulation_id
+    ).scalar() or 0
+    journal = journals.get(simulation_id, create=False)
+    if journal is not None:
+        newest = max(newest, journal.last_id())
+    return newest
+
+
+class ProcessStateTable:
+    """
+    Live process states of one simulation: process ids and one-byte state
+    codes in parallel arrays, plus a dirty flag per slot. This is the source
+    of truth while the simulation runs; the processes table holds the last
+    checkpoint.
+    """
+
+    def __init__(self, simulation_id):
+        self.simulation_id = simulation_id
+        self.ids = array('q')
+        self.codes = array('B')
+        self.dirty = bytearray()
+        self.index = {}  # process_id -> slot
+        self.epoch = uuid.uuid4().hex[:8]  # distinguishes tables across restarts in ETags
+        self.changes = 0  # state changes since the last checkpoint
+        self.checkpointed = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, process_id):
+        return process_id in self.index
+
+    def add(self, process_id, state):
+        """Track a process whose state is already stored"""
+        if process_id in self.index:
+            return
+        self.index[process_id] = len(self.ids)
+        self.ids.append(process_id)
+        self.codes.append(STATE_CODES.get(state, 0))
+        self.dirty.append(0)
+
+    def remove(self, process_id):
+        slot = self.index.pop(process_id, None)
+        if slot is None:
+            return
+        # Move the last process into the freed slot
+        last = len(self.ids) - 1
+        if slot != last:
+            moved = self.ids[last]
+            self.ids[slot] = moved
+            self.codes[slot] = self.codes[last]
+            self.dirty[slot] = self.dirty[last]
+            self.index[moved] = slot
+        self.ids.pop()
+        self.codes.pop()
+        self.dirty.pop()
+
+    def get(self, process_id):
+        slot = self.index.get(process_id)
+        return PROCESS_STATES[self.codes[slot]] if slot is not None else None
+
+    def set(self, process_id, state):
+        """
+        Change a tracked process's state
+        Returns: the previous state (None if the process is not tracked)
+        """
+        slot = self.index.get(process_id)
+        if slot is None:
+            return None
+        old = PROCESS_STATES[self.codes[slot]]
+        code = STATE_CODES[state]
+        if self.codes[slot] != code:
+            self.codes[slot] = code
+            self.dirty[slot] = 1
+            self.changes += 1
+        return old
+
+    def states(self):
+        """{process_id: state}"""
+        return {process_id: PROCESS_STATES[code] for process_id, code in zip(self.ids, self.codes)}
+
+    def dirty_ids(self):
+        return [process_id for process_id, flag in zip(self.ids, self.dirty) if flag]
+
+    def etag_suffix(self):
+        """Changes not yet checkpointed (which do not bump the simulation version)"""
+        return f'{self.epoch}.{self.changes}' if self.changes else None
+
+    def overlay(self, process_dicts):
+        """Replace checkpointed states in Process.to_dict() results with live ones"""
+        for process in process_dicts:
+            state = self.get(process['id'])
+            if state is not None:
+                process['state'] = state
+        return process_dicts
+
+    def due(self, interval):
+        return self.changes > 0 and time.monotonic() - self.checkpointed >= interval
+
+    def checkpoint(self, session):
+        """
+        Write dirty states and the event watermark they include, in the
+        caller's transaction (the caller commits). The simulation version is
+        bumped so ?since= deltas and ETags pick the new states up.
+        Returns: number of processes written
+        """
+        self.checkpointed = time.monotonic()
+        if not self.changes:
+            return 0  # replaying the events since the last checkpoint changes nothing
+        dirty = [(slot, process_id) for slot, process_id in enumerate(self.ids) if self.dirty[slot]]
+        simulation = session.get(Simulation, self.simulation_id)
+        if simulation is None:
+            return 0
+
+        # Events up to here are reflected in the states being written
+        watermark = event_watermark(session, self.simulation_id)
+        simulation.state_checkpoint = max(simulation.state_checkpoint or 0, watermark)
+
+        if dirty:
+            version = bump_version(session, self.simulation_id)
+            # Bulk UPDATE by primary key, one executemany
+            session.execute(update(Process), [
+                {'id': process_id, 'state': PROCESS_STATES[self.codes[slot]], 'version': version}
+                for slot, process_id in dirty
+            ])
+            for slot, _ in dirty:
+                self.dirty[slot] = 0
+        self.changes = 0
+        return len(dirty)
+
+    def recover(self, session, watermark):
+        """
+        Load the last checkpoint and replay state-changing events logged
+        after it, from the events table and then the journal (message_sent:
+        sender running, receiver waiting; process_state_changed: the new
+        state). Recovered changes are dirty, so the next checkpoint stores them.
+        Returns: number of events replayed
+        """
+        for process_id, state in session.query(Process.id, Process.state).filter(
+            Process.simulation_id == self.simulation_id
+        ).order_by(Process.id):
+            self.add(process_id, state)
+
+        if watermark is None:
+            # Simulation from before live state tracking: the stored states are current
+            return 0
+
+        receivers = dict(session.query(IPCChannel.id, IPCChannel.receiver_id).filter(
+            IPCChannel.simulation_id == self.simulation_id
+        ))
+        replayed = 0
+        events = session.query(Event.event_type, Event.process_id, Event.event_metadata).filter(
+            Event.simulation_id == self.simulation_id,
+            Event.id > watermark,
+            Event.event_type.in_(STATE_EVENTS)
+        ).order_by(Event.id)
+        for event_type, process_id, metadata in events:
+            metadata = json.loads(metadata) if metadata else {}
+            if event_type == 'message_sent':
+                self.set(process_id, 'running')
+                self.set(receivers.get(metadata.get('channel_id')), 'waiting')
+            elif metadata.get('state') in STATE_CODES:
+                self.set(process_id, metadata['state'])
+            replayed += 1
+
+        journal = journals.get(self.simulation_id, create=False)
+        if journal is not None:
+            message_sent = TYPE_CODES['message_sent']
+            for record in journal.after(watermark):
+                if record[TYPE] == message_sent:
+                    self.set(record[PROCESS], 'running')
+                    self.set(record[PEER], 'waiting')
+                else:
+                    self.set(record[PROCESS], PROCESS_STATES[record[TO]])
+                replayed += 1
+        return replayed
+
+
+class ProcessStateStore:
+    """Live state tables per simulation, loaded (and recovered) on first use"""
+
+    def __init__(self, checkpoint_interval=1.0):
+        self.checkpoint_interval = checkpoint_interval
+        self.tables = {}  # simulation_id -> ProcessStateTable
+
+    def table(self, simulation_id, session=None):
+        """
+        Live state table of a simulation, recovered on first use. Load it
+        before the request writes anything: a simulation without a
+        checkpoint is stamped on its own connection.
+        """
+        table = self.tables.get(simulation_id)
+        if table is None:
+            session = session or db.session
+            table = ProcessStateTable(simulation_id)
+            row = session.query(Simulation.state_checkpoint).filter(Simulation.id == simulation_id).first()
+            watermark = row.state_checkpoint if row else None
+            table.recover(session, watermark)
+            if row and watermark is None:
+                self._stamp(session, simulation_id)
+            self.tables[simulation_id] = table
+        return table
+
+    def _stamp(self, session, simulation_id):
+        """
+        Record that the stored states of a simulation from before live state
+        tracking include every event logged so far, so events logged from
+        now on are replayed after a crash. Committed right away on its own
+        connection, without bumping the simulation version.
+        """
+        watermark = event_watermark(session, simulation_id)
+        with db.engine.begin() as connection:
+            connection.execute(update(Simulation.__table__).where(
+                Simulation.__table__.c.id == simulation_id,
+                Simulation.__table__.c.state_checkpoint.is_(None)
+            ).values(state_checkpoint=watermark))
+
+    def loaded(self, simulation_id):
+        return self.tables.get(simulation_id)
+
+    def states(self, simulation_id):
+        """Live {process_id: state} of a simulation"""
+        return self.table(simulation_id).states()
+
+    def checkpoint(self, simulation_id, session=None, force=True):
+        """
+        Checkpoint a loaded table (caller commits); force=False only when
+        the interval has passed
+        Returns: number of processes written
+        """
+        table = self.tables.get(simulation_id)
+        if table is None or (not force and not table.due(self.checkpoint_interval)):
+            return 0
+        return table.checkpoint(session or db.session)
+
+    def due(self):
+        """Simulations whose loaded table has changes older than the checkpoint interval"""
+        return [
+            simulation_id for simulation_id, table in list(self.tables.items())
+            if table.due(self.checkpoint_interval)
+        ]
+
+    def forget(self, simulation_id):
+        self.tables.pop(simulation_id, None)
@@ -0,0 +1,318 @@
+import multiprocessing
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Shared block layout: head and tail counters on separate cache lines,
+# followed by the data area. Counters increase monotonically; the data
+# offset is counter % capacity. The stop flag shares the head's line,
+# which producers read on every write anyway.
+HEAD_OFFSET = 0
+STOP_OFFSET = 8
+TAIL_OFFSET = 64
+DATA_OFFSET = 128
+
+RECORD_HEADER = struct.Struct('<I')  # payload length
+RECORD_ALIGN = 8
+WRAP_MARKER = 0xFFFFFFFF
+
+STAMP = struct.Struct('<Q')  # producer timestamp used by the benchmark
+
+# Backoff while the ring is full (producer) or empty (consumer): spin for a
+# few polls, then give the CPU away so the other side can run (on a single
+# core pure spinning starves it for a whole time slice), then sleep
+SPIN_POLLS = 64
+YIELD_POLLS = 1024
+BACKOFF_SLEEP = 50e-6  # seconds
+
+
+def _align(size):
+    return (size + RECORD_ALIGN - 1) & ~(RECORD_ALIGN - 1)
+
+
+def record_size(message_size):
+    """Bytes a message of this size takes in the ring (the benchmark stamps at least STAMP.size)"""
+    return _align(RECORD_HEADER.size + max(message_size, STAMP.size))
+
+
+def _backoff(polls):
+    """
+    Wait after a failed poll of the ring
+    Returns: the updated poll count (reset it to 0 after a successful poll)
+    """
+    polls += 1
+    if polls > YIELD_POLLS:
+        time.sleep(BACKOFF_SLEEP)
+    elif polls > SPIN_POLLS:
+        os.sched_yield()
+    return polls
+
+
+class SharedMemoryRing:
+    """
+    Lock-free single-producer/single-consumer ring buffer on shared memory.
+
+    Records are stored contiguously (a wrap marker skips the tail of the
+    buffer), so readers get a memoryview straight into the shared block
+    instead of a pickled or copied object.
+    """
+
+    def __init__(self, capacity=None, name=None):
+        if name is None:
+            capacity = _align(capacity)
+            self.shm = shared_memory.SharedMemory(create=True, size=DATA_OFFSET + capacity)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+
+        self.capacity = self.shm.size - DATA_OFFSET if capacity is None else capacity
+        self.buf = self.shm.buf
+        self.data = self.buf[DATA_OFFSET:DATA_OFFSET + self.capacity]
+        self.counters = self.buf[:DATA_OFFSET].cast('Q')
+        if self.owner:
+            self.counters[HEAD_OFFSET // 8] = 0
+            self.counters[STOP_OFFSET // 8] = 0
+            self.counters[TAIL_OFFSET // 8] = 0
+        self._pending = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def attach_args(self):
+        """Arguments needed to attach to this ring from another process"""
+        return {'name': self.name, 'capacity': self.capacity}
+
+    def _head(self):
+        return self.counters[HEAD_OFFSET // 8]
+
+    def _tail(self):
+        return self.counters[TAIL_OFFSET // 8]
+
+    def stop(self):
+        """Ask every process attached to the ring to stop writing"""
+        self.counters[STOP_OFFSET // 8] = 1
+
+    def stopped(self):
+        return self.counters[STOP_OFFSET // 8] != 0
+
+    def write(self, payload):
+        """
+        Copy a bytes-like payload into the ring
+        Returns: True if written, False if the ring is full
+        """
+        size = len(payload)
+        record_size = _align(RECORD_HEADER.size + size)
+        if record_size > self.capacity:
+            raise ValueError(f"Message size ({size}) exceeds ring capacity ({self.capacity})")
+
+        tail = self._tail()
+        offset = tail % self.capacity
+        skip = self.capacity - offset if self.capacity - offset < record_size else 0
+
+        if tail + skip + record_size - self._head() > self.capacity:
+            return False
+
+        if skip:
+            if skip >= RECORD_HEADER.size:
+                RECORD_HEADER.pack_into(self.data, offset, WRAP_MARKER)
+            offset = 0
+
+        RECORD_HEADER.pack_into(self.data, offset, size)
+        start = offset + RECORD_HEADER.size
+        self.data[start:start + size] = payload
+
+        # Publish only after the payload is in place
+        self.counters[TAIL_OFFSET // 8] = tail + skip + record_size
+        return True
+
+    def peek(self):
+        """
+        Return a memoryview of the next record without consuming it
+        Returns: memoryview or None if the ring is empty
+        """
+        head = self._head()
+        tail = self._tail()
+        if head == tail:
+            return None
+
+        offset = head % self.capacity
+        remaining = self.capacity - offset
+        if remaining < RECORD_HEADER.size or RECORD_HEADER.unpack_from(self.data, offset)[0] == WRAP_MARKER:
+            head += remaining
+            self.counters[HEAD_OFFSET // 8] = head
+            if head == tail:
+                return None
+            offset = 0
+
+        size = RECORD_HEADER.unpack_from(self.data, offset)[0]
+        self._pending = _align(RECORD_HEADER.size + size)
+        start = offset + RECORD_HEADER.size
+        return self.data[start:start + size]
+
+    def release(self):
+        """Consume the record returned by the last peek()"""
+        if self._pending:
+            self.counters[HEAD_OFFSET // 8] = self._head() + self._pending
+            self._pending = 0
+
+    def read(self):
+        """Consume the next record and return a copy of it as bytes"""
+        view = self.peek()
+        if view is None:
+            return None
+        payload = bytes(view)
+        view.release()
+        self.release()
+        return payload
+
+    def close(self):
+        """Release views and unlink the block if this ring created it"""
+        self.data.release()
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class LockedSharedMemoryRing(SharedMemoryRing):
+    """Multi-producer variant: writers serialize on a process-shared lock"""
+
+    def __init__(self, capacity=None, name=None, lock=None):
+        super().__init__(capacity=capacity, name=name)
+        self.lock = lock or multiprocessing.Lock()
+
+    def attach_args(self):
+        args = super().attach_args()
+        args['lock'] = self.lock
+        return args
+
+    def write(self, payload):
+        with self.lock:
+            return super().write(payload)
+
+
+def create_ring(capacity, use_mutex=False):
+    """Create a ring matching a shmem channel's synchronization config"""
+    if use_mutex:
+        return LockedSharedMemoryRing(capacity)
+    return SharedMemoryRing(capacity)
+
+
+def _producer(ring_class, attach_args, message_size, count):
+    """Benchmark producer: write timestamped messages until count is reached or the ring is stopped"""
+    ring = ring_class(**attach_args)
+    payload = bytearray(max(message_size, STAMP.size))
+    try:
+        for _ in range(count):
+            STAMP.pack_into(payload, 0, time.perf_counter_ns())
+            polls = 0
+            while not ring.write(payload):
+                if ring.stopped():
+                    return
+                polls = _backoff(polls)
+            if ring.stopped():
+                return
+    finally:
+        ring.close()
+
+
+def _failed(workers):
+    """Whether a producer exited with an error"""
+    return any(worker.exitcode not in (None, 0) for worker in workers)
+
+
+def benchmark(message_size=4096, count=10000, capacity=4 * 1024 * 1024, use_mutex=False, producers=1,
+              progress=None):
+    """
+    Move messages between processes through a shared-memory ring;
+    progress(fraction) is called every 4096 messages
+    Returns: {
+        'messages': int,
+        'bytes': int,
+        'elapsed_s': float,
+        'bytes_per_sec': float,
+        'messages_per_sec': float,
+        'latency_us': {'avg', 'p50', 'p99', 'max'}
+    }
+    """
+    if producers > 1 and not use_mutex:
+        raise ValueError("Multiple producers require use_mutex")
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    message_size = max(message_size, STAMP.size)
+    if record_size(message_size) > _align(capacity):
+        raise ValueError(f"Message size ({message_size}) exceeds ring capacity ({capacity})")
+
+    ring = create_ring(capacity, use_mutex)
+    total = count * producers
+    latencies = []
+
+    workers = [
+        multiprocessing.Process(
+            target=_producer,
+            args=(type(ring), ring.attach_args(), message_size, count),
+            daemon=True
+        )
+        for _ in range(producers)
+    ]
+
+    try:
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        polls = 0
+        while len(latencies) < total:
+            view = ring.peek()
+            if view is None:
+                if _failed(workers) or (not any(worker.is_alive() for worker in workers)
+                                        and ring._head() == ring._tail()):
+                    raise RuntimeError("Producer exited before sending all messages")
+                polls = _backoff(polls)
+                continue
+            polls = 0
+            latencies.append(time.perf_counter_ns() - STAMP.unpack_from(view, 0)[0])
+            view.release()
+            ring.release()
+            # A dead producer stops the run even while the others keep the ring busy
+            if len(latencies) % 4096 == 0:
+                if _failed(workers):
+                    raise RuntimeError("Producer exited before sending all messages")
+                if progress:
+                    progress(len(latencies) / total)
+
+        elapsed = time.perf_counter() - started
+    finally:
+        # On failure the remaining producers see the flag and exit
+        ring.stop()
+        for worker in workers:
+            if worker.pid is not None:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+        ring.close()
+
+    latencies.sort()
+    total_bytes = total * message_size
+    return {
+        'transport': 'locked_ring' if use_mutex else 'spsc_ring',
+        'producers': producers,
+        'message_size': message_size,
+        'messages': total,
+        'bytes': total_bytes,
+        'elapsed_s': round(elapsed, 6),
+        'bytes_per_sec': round(total_bytes / elapsed, 2) if elapsed else 0,
+        'messages_per_sec': round(total / elapsed, 2) if elapsed else 0,
+        'latency_us': {
+            'avg': round(sum(latencies) / total / 1000, 3),
+            'p50': round(latencies[total // 2] / 1000, 3),
+            'p99': round(latencies[min(total - 1, int(total * 0.99))] / 1000, 3),
+            'max': round(latencies[-1] / 1000, 3)
+        }
+    }
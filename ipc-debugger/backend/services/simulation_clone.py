@@ -0,0 +1,199 @@
+import heapq
+import json
+from datetime import datetime
+from sqlalchemy import insert, select, literal, and_
+from sqlalchemy.orm import aliased
+from backend.models import db, Simulation, Process, IPCChannel, ChannelStats, LatencyBucket, Event
+from backend.services.event_journal import journals, journal_events
+from backend.utils.sharding import shards
+
+
+def clone_simulation(source, name=None, include_state=False, snapshot=False):
+    """
+    Duplicate a simulation's topology with set-based INSERT ... SELECT.
+    Processes and channels remember the row they were cloned from
+    (origin_id), which is how channel endpoints are remapped in SQL.
+    Message and event history is not copied: the clone points at its
+    parent and reads the parent's history up to forked_at.
+    Caller commits.
+    Returns: (clone, process_map, channel_map) - old id -> new id
+    """
+    now = datetime.utcnow()
+    clone = Simulation(
+        user_id=source.user_id,
+        name=name or f'{source.name} ({"snapshot" if snapshot else "clone"})',
+        status='snapshot' if snapshot else 'created',
+        config=source.config,
+        parent_id=source.id,
+        forked_at=now
+    )
+    db.session.add(clone)
+    db.session.flush()
+
+    db.session.execute(insert(Process).from_select(
+        ['simulation_id', 'process_name', 'state', 'priority', 'created_at', 'origin_id'],
+        select(
+            literal(clone.id), Process.process_name, Process.state,
+            Process.priority, Process.created_at, Process.id
+        ).where(Process.simulation_id == source.id).order_by(Process.id)
+    ))
+
+    sender = aliased(Process)
+    receiver = aliased(Process)
+    db.session.execute(insert(IPCChannel).from_select(
+        ['simulation_id', 'ipc_type', 'sender_id', 'receiver_id', 'config', 'created_at', 'origin_id'],
+        select(
+            literal(clone.id), IPCChannel.ipc_type, sender.id, receiver.id,
+            IPCChannel.config, IPCChannel.created_at, IPCChannel.id
+        )
+        .join(sender, and_(sender.origin_id == IPCChannel.sender_id, sender.simulation_id == clone.id))
+        .join(receiver, and_(receiver.origin_id == IPCChannel.receiver_id, receiver.simulation_id == clone.id))
+        .where(IPCChannel.simulation_id == source.id)
+        .order_by(IPCChannel.id)
+    ))
+
+    # Aggregates either carry over or start from zero
+    stats_columns = ['channel_id', 'message_count', 'delay_sum_ms', 'delay_max_ms', 'bytes_total']
+    if include_state:
+        stats_select = select(
+            IPCChannel.id, ChannelStats.message_count, ChannelStats.delay_sum_ms,
+            ChannelStats.delay_max_ms, ChannelStats.bytes_total
+        ).join(ChannelStats, ChannelStats.channel_id == IPCChannel.origin_id)
+    else:
+        stats_select = select(IPCChannel.id, literal(0), literal(0), literal(0), literal(0))
+    db.session.execute(insert(ChannelStats).from_select(
+        stats_columns, stats_select.where(IPCChannel.simulation_id == clone.id)
+    ))
+    if include_state:
+        db.session.execute(insert(LatencyBucket).from_select(
+            ['channel_id', 'bucket', 'count'],
+            select(IPCChannel.id, LatencyBucket.bucket, LatencyBucket.count)
+            .join(LatencyBucket, LatencyBucket.channel_id == IPCChannel.origin_id)
+            .where(IPCChannel.simulation_id == clone.id)
+        ))
+
+    process_map = dict(db.session.query(Process.origin_id, Process.id).filter(
+        Process.simulation_id == clone.id
+    ).all())
+    channel_map = dict(db.session.query(IPCChannel.origin_id, IPCChannel.id).filter(
+        IPCChannel.simulation_id == clone.id
+    ).all())
+
+    db.session.add(Event(
+        simulation_id=clone.id,
+        event_type='simulation_cloned',
+        severity='info',
+        message=f'{"Snapshot" if snapshot else "Clone"} of "{source.name}": '
+                f'{len(process_map)} processes, {len(channel_map)} channels',
+        event_metadata=json.dumps({'parent_id': source.id, 'include_state': include_state})
+    ))
+    return clone, process_map, channel_map
+
+
+def lineage(simulation):
+    """
+    Simulations whose events belong to this one's history
+    Returns: [(simulation_id, until)] - until is None for the simulation itself,
+    otherwise the earliest fork point below that ancestor
+    """
+    scope = [(simulation.id, None)]
+    until = None
+    current = simulation
+    seen = {simulation.id}
+
+    while current.parent_id is not None and current.parent_id not in seen:
+        until = current.forked_at if until is None else min(until, current.forked_at)
+        parent = db.session.get(Simulation, current.parent_id)
+        if parent is None:
+            break
+        scope.append((parent.id, until))
+        seen.add(parent.id)
+        current = parent
+
+    return scope
+
+
+def history_scope(simulation_id, until=None):
+    """
+    Event filter for one simulation in a lineage: all of its own events, or
+    an ancestor's events up to the fork point.
+    """
+    if until is None:
+        return Event.simulation_id == simulation_id
+    return and_(Event.simulation_id == simulation_id, Event.timestamp <= until)
+
+
+def history_members(simulation_id, simulation=None):
+    """
+    Lineage of a simulation. A deleted simulation only reads its own rows,
+    and only while it still has a shard.
+    Returns: [(simulation_id, until)]
+    """
+    if simulation is not None:
+        return lineage(simulation)
+    if shards.enabled and not shards.exists(simulation_id):
+        return []
+    return [(simulation_id, None)]
+
+
+def history_events(simulation_id, simulation=None, criteria=(), newest_first=False, limit=None, progress=None,
+                   event_type=None, severity=None):
+    """
+    A simulation's own events plus the history it shares with its ancestors.
+    Each simulation's events live in its own shard (and event journal), so
+    every lineage member is queried separately and the results are merged by
+    timestamp. criteria only apply to the events table; filter journaled
+    events with event_type/severity.
+    progress(fraction) is called after each member.
+    Returns: [Event or JournalEvent]
+    """
+    if newest_first:
+        order = (Event.timestamp.desc(), Event.id.desc())
+    else:
+        order = (Event.timestamp, Event.id)
+    # Journaled events are all info-level and cannot be filtered by SQL criteria
+    read_journal = journals.enabled and not criteria and severity in (None, '', 'info')
+    criteria = list(criteria)
+    if event_type:
+        criteria.append(Event.event_type == event_type)
+    if severity:
+        criteria.append(Event.severity == severity)
+
+    members = history_members(simulation_id, simulation)
+    parts = []
+    for done, (member_id, until) in enumerate(members, 1):
+        with shards.scope(member_id):
+            query = Event.query.filter(history_scope(member_id, until), *criteria).order_by(*order)
+            if limit is not None:
+                query = query.limit(limit)
+            parts.append(query.all())
+        if read_journal:
+            parts.append(journal_events(
+                member_id, process_names(member_id), until, event_type, newest_first, limit
+            ))
+        if progress:
+            progress(done / len(members))
+
+    events = list(heapq.merge(*parts, key=lambda e: (e.timestamp, e.id), reverse=newest_first))
+    return events[:limit] if limit is not None else events
+
+
+def last_event_id(simulation_id, simulation=None):
+    """Newest event id in a simulation's history, events table or journal (0 if it has none)"""
+    newest = 0
+    for member_id, until in history_members(simulation_id, simulation):
+        with shards.scope(member_id):
+            newest = max(newest, db.session.query(db.func.max(Event.id)).filter(
+                history_scope(member_id, until)
+            ).scalar() or 0)
+        journal = journals.get(member_id, create=False)
+        if journal is not None:
+            newest = max(newest, journal.last_id(until))
+    return newest
+
+
+def process_names(simulation_id):
+    """{process_id: process_name} of a simulation"""
+    return dict(db.session.query(Process.id, Process.process_name).filter(
+        Process.simulation_id == simulation_id
+    ).all())
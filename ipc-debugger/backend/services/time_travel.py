@@ -0,0 +1,282 @@
+import heapq
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from backend.models import db, Process, IPCChannel, Event, StateSnapshot
+from backend.services.event_journal import journals, to_epoch, TIMESTAMP, PROCESS, PEER, TYPE, TO, TYPE_CODES
+from backend.services.process_state import STATE_EVENTS
+from backend.services.topology_io import PROCESS_STATES
+from backend.utils.sharding import shards
+
+# Events replayed on top of a snapshot; bulk changes (imports, clones, trace
+# replays) are followed by a snapshot instead
+TOPOLOGY_EVENTS = ('process_created', 'process_deleted', 'channel_created', 'channel_deleted')
+REPLAYED_EVENTS = TOPOLOGY_EVENTS + STATE_EVENTS
+
+
+def encode_snapshot(processes, channels):
+    """
+    processes: [(id, name, priority, state)], channels: [(id, ipc_type, sender_id, receiver_id, config)]
+    Returns: zlib-compressed JSON of both lists
+    """
+    return zlib.compress(json.dumps(
+        {'processes': processes, 'channels': channels}, separators=(',', ':')
+    ).encode('utf-8'))
+
+
+def decode_snapshot(data):
+    """
+    Returns: ({process_id: process dict}, {channel_id: channel dict}), shaped
+    like Process.to_dict() / IPCChannel.to_dict() without the derived fields
+    """
+    content = json.loads(zlib.decompress(data))
+    processes = {
+        process_id: {'id': process_id, 'process_name': name, 'priority': priority, 'state': state}
+        for process_id, name, priority, state in content['processes']
+    }
+    channels = {
+        channel_id: {'id': channel_id, 'ipc_type': ipc_type, 'sender_id': sender_id,
+                     'receiver_id': receiver_id, 'config': config}
+        for channel_id, ipc_type, sender_id, receiver_id, config in content['channels']
+    }
+    return processes, channels
+
+
+class TimeTravel:
+    """
+    Periodic snapshots of a simulation's topology and live process states,
+    and reconstruction of the state at any past moment.
+
+    A snapshot is taken when an active simulation has gone interval seconds
+    or max_events state-changing events without one (and after bulk
+    topology changes). Each snapshot records the newest events row and
+    journal record it includes, so rebuilding the state at T loads the
+    newest snapshot taken at or before T and replays only the topology and
+    state events logged after it, up to T.
+    """
+
+    def __init__(self, process_states, interval=5.0, max_events=5000, cache_size=32):
+        self.process_states = process_states  # ProcessStateStore
+        self.interval = interval
+        self.max_events = max_events
+        self.cache_size = cache_size
+        self.last = {}  # simulation_id -> monotonic time of the last snapshot
+        self.activity = defaultdict(int)  # state-changing events since the last snapshot
+        self.decoded = OrderedDict()  # (simulation_id, snapshot id) -> (processes, channels)
+        self.lock = threading.Lock()
+
+    def observe(self, simulation_id, count=1, session=None):
+        """
+        Count state-changing events, snapshotting when due (caller commits)
+        Returns: the new StateSnapshot, or None
+        """
+        self.activity[simulation_id] += count
+        last = self.last.get(simulation_id)
+        if last is not None and self.activity[simulation_id] < self.max_events \
+                and time.monotonic() - last < self.interval:
+            return None
+        return self.take(simulation_id, session)
+
+    def take(self, simulation_id, session=None):
+        """
+        Snapshot a simulation now, in the caller's transaction (caller commits)
+        Returns: the StateSnapshot
+        """
+        session = session or db.session
+        with shards.scope(simulation_id):
+            session.flush()  # events logged so far get ids below the watermark
+            event_id = session.query(db.func.max(Event.id)).filter(
+                Event.simulation_id == simulation_id
+            ).scalar() or 0
+        journal = journals.get(simulation_id, create=False)
+
+        # A table not loaded yet has no changes beyond the stored states
+        table = self.process_states.loaded(simulation_id)
+        states = table.states() if table is not None else {}
+        processes = [
+            (process_id, name, priority, states.get(process_id, state))
+            for process_id, name, priority, state in session.query(
+                Process.id, Process.process_name, Process.priority, Process.state
+            ).filter(Process.simulation_id == simulation_id).order_by(Process.id)
+        ]
+        channels = [
+            (channel_id, ipc_type, sender_id, receiver_id, json.loads(config) if config else {})
+            for channel_id, ipc_type, sender_id, receiver_id, config in session.query(
+                IPCChannel.id, IPCChannel.ipc_type, IPCChannel.sender_id,
+                IPCChannel.receiver_id, IPCChannel.config
+            ).filter(IPCChannel.simulation_id == simulation_id).order_by(IPCChannel.id)
+        ]
+
+        snapshot = StateSnapshot(
+            simulation_id=simulation_id,
+            taken_at=datetime.utcnow(),
+            event_id=event_id,
+            journal_position=len(journal) if journal is not None else 0,
+            process_count=len(processes),
+            channel_count=len(channels),
+            data=encode_snapshot(processes, channels)
+        )
+        session.add(snapshot)
+        self.last[simulation_id] = time.monotonic()
+        self.activity[simulation_id] = 0
+        return snapshot
+
+    def snapshots(self, simulation_id):
+        """Snapshot index of a simulation, oldest first"""
+        with shards.scope(simulation_id):
+            return [
+                {'id': snapshot_id, 'taken_at': taken_at.isoformat(),
+                 'process_count': process_count, 'channel_count': channel_count}
+                for snapshot_id, taken_at, process_count, channel_count in db.session.query(
+                    StateSnapshot.id, StateSnapshot.taken_at,
+                    StateSnapshot.process_count, StateSnapshot.channel_count
+                ).filter(StateSnapshot.simulation_id == simulation_id).order_by(
+                    StateSnapshot.taken_at, StateSnapshot.id
+                )
+            ]
+
+    def _decode(self, simulation_id, snapshot_id):
+        """Decoded snapshot, from the cache or the shard (in the caller's shard scope)"""
+        key = (simulation_id, snapshot_id)
+        with self.lock:
+            decoded = self.decoded.get(key)
+            if decoded is not None:
+                self.decoded.move_to_end(key)
+                return decoded
+        data = db.session.query(StateSnapshot.data).filter(StateSnapshot.id == snapshot_id).scalar()
+        decoded = decode_snapshot(data)
+        with self.lock:
+            self.decoded[key] = decoded
+            while len(self.decoded) > self.cache_size:
+                self.decoded.popitem(last=False)
+        return decoded
+
+    def reconstruct(self, simulation_id, at):
+        """
+        Topology and process states of a simulation as they were at a moment
+        (naive UTC datetime)
+        Returns: {'snapshot': {...} or None, 'replayed': int,
+                  'processes': [dict], 'channels': [dict]}
+        """
+        with shards.scope(simulation_id):
+            base = db.session.query(
+                StateSnapshot.id, StateSnapshot.taken_at, StateSnapshot.event_id,
+                StateSnapshot.journal_position, StateSnapshot.process_count, StateSnapshot.channel_count
+            ).filter(
+                StateSnapshot.simulation_id == simulation_id,
+                StateSnapshot.taken_at <= at
+            ).order_by(StateSnapshot.taken_at.desc(), StateSnapshot.id.desc()).first()
+
+            if base is not None:
+                processes, channels = self._decode(simulation_id, base.id)
+                # Copy: the decoded snapshot is shared through the cache
+                processes = {key: dict(value) for key, value in processes.items()}
+                channels = {key: dict(value) for key, value in channels.items()}
+            else:
+                processes, channels = {}, {}
+
+            events = db.session.query(
+                Event.timestamp, Event.event_type, Event.process_id, Event.event_metadata
+            ).filter(
+                Event.simulation_id == simulation_id,
+                Event.id > (base.event_id if base else 0),
+                Event.timestamp <= at,
+                Event.event_type.in_(REPLAYED_EVENTS)
+            ).order_by(Event.timestamp, Event.id).all()
+
+        journal = journals.get(simulation_id, create=False)
+        records = journal.records(
+            start=base.journal_position if base else 0,
+            stop=journal.position(to_epoch(at))
+        ) if journal is not None else iter(())
+
+        # Both streams are in time order; apply them interleaved
+        replayed = 0
+        stream = heapq.merge(
+            ((to_epoch(timestamp), 0, (event_type, process_id, metadata))
+             for timestamp, event_type, process_id, metadata in events),
+            ((record[TIMESTAMP], 1, record) for record in records),
+            key=lambda item: (item[0], item[1])
+        )
+        message_sent = TYPE_CODES['message_sent']
+        for _, source, item in stream:
+            if source == 1:
+                if item[TYPE] == message_sent:
+                    self._set_state(processes, item[PROCESS], 'running')
+                    self._set_state(processes, item[PEER], 'waiting')
+                else:
+                    self._set_state(processes, item[PROCESS], PROCESS_STATES[item[TO]])
+            else:
+                event_type, process_id, metadata = item
+                self._apply_event(processes, channels, event_type, process_id,
+                                  json.loads(metadata) if metadata else {})
+            replayed += 1
+
+        return {
+            'snapshot': {
+                'id': base.id,
+                'taken_at': base.taken_at.isoformat(),
+                'process_count': base.process_count,
+                'channel_count': base.channel_count
+            } if base else None,
+            'replayed': replayed,
+            'processes': [processes[key] for key in sorted(processes)],
+            'channels': [channels[key] for key in sorted(channels)]
+        }
+
+    def _set_state(self, processes, process_id, state):
+        process = processes.get(process_id)
+        if process is not None:
+            process['state'] = state
+
+    def _apply_event(self, processes, channels, event_type, process_id, metadata):
+        """
+        Apply one events row. process_id is unlinked once the process is
+        deleted, so ids are taken from the metadata or the channel where
+        possible; events logged without metadata are skipped.
+        """
+        if event_type == 'message_sent':
+            channel = channels.get(metadata.get('channel_id'))
+            if channel is not None:
+                self._set_state(processes, channel['sender_id'], 'running')
+                self._set_state(processes, channel['receiver_id'], 'waiting')
+            else:
+                self._set_state(processes, process_id, 'running')
+        elif event_type == 'process_state_changed':
+            if metadata.get('state') in PROCESS_STATES:
+                self._set_state(processes, metadata.get('process_id', process_id), metadata['state'])
+        elif event_type == 'process_created':
+            created_id = metadata.get('process_id', process_id)
+            if created_id is not None and 'name' in metadata:
+                processes[created_id] = {
+                    'id': created_id,
+                    'process_name': metadata['name'],
+                    'priority': metadata.get('priority', 0),
+                    'state': metadata.get('state', 'ready')
+                }
+        elif event_type == 'process_deleted':
+            processes.pop(metadata.get('process_id'), None)
+            for channel_id in metadata.get('channel_ids', []):
+                channels.pop(channel_id, None)
+        elif event_type == 'channel_created':
+            channel_id = metadata.get('channel_id')
+            if channel_id is not None:
+                channels[channel_id] = {
+                    'id': channel_id,
+                    'ipc_type': metadata.get('ipc_type'),
+                    'sender_id': metadata.get('sender_id'),
+                    'receiver_id': metadata.get('receiver_id'),
+                    'config': metadata.get('config', {})
+                }
+        elif event_type == 'channel_deleted':
+            channels.pop(metadata.get('channel_id'), None)
+
+    def forget(self, simulation_id):
+        self.last.pop(simulation_id, None)
+        self.activity.pop(simulation_id, None)
+        with self.lock:
+            for key in [key for key in self.decoded if key[0] == simulation_id]:
+                del self.decoded[key]
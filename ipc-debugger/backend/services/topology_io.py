@@ -0,0 +1,172 @@
+import json
+from sqlalchemy import insert
+from backend.models import db, Process, IPCChannel, ChannelStats, Event
+from backend.utils.versioning import bump_version
+
+try:
+    import yaml
+except ImportError:  # optional: JSON only
+    yaml = None
+
+IPC_TYPES = ('pipe', 'queue', 'shmem')
+PROCESS_STATES = ('ready', 'running', 'waiting', 'blocked', 'terminated')
+
+
+def parse_spec(body, content_type):
+    """Decode a JSON or YAML topology document"""
+    if 'yaml' in (content_type or ''):
+        if yaml is None:
+            raise ValueError("YAML topologies require PyYAML to be installed")
+        try:
+            return yaml.safe_load(body) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML: {e}")
+    return json.loads(body or '{}')
+
+
+def dump_spec(spec, fmt):
+    """Encode a topology document as JSON or YAML text"""
+    if fmt == 'yaml':
+        if yaml is None:
+            raise ValueError("YAML topologies require PyYAML to be installed")
+        return yaml.safe_dump(spec, sort_keys=False)
+    return json.dumps(spec)
+
+
+def validate_spec(spec, existing_names):
+    """
+    Validate a topology spec entirely in memory
+    spec: {'processes': [{'name', 'priority', 'state'}],
+           'channels': [{'type', 'sender', 'receiver', 'config'}]}
+    Returns: [error messages]
+    """
+    errors = []
+    if not isinstance(spec, dict):
+        return ['Topology must be an object with "processes" and "channels"']
+    for key in ('processes', 'channels'):
+        if not isinstance(spec.get(key, []), list):
+            errors.append(f'{key} must be a list')
+    if errors:
+        return errors
+
+    names = set()
+    for i, process in enumerate(spec.get('processes', [])):
+        name = process.get('name') if isinstance(process, dict) else None
+        if not name:
+            errors.append(f'processes[{i}]: missing name')
+        elif not isinstance(name, str):
+            errors.append(f'processes[{i}]: name must be a string')
+        elif name in names or name in existing_names:
+            errors.append(f'processes[{i}]: duplicate process name "{name}"')
+        else:
+            names.add(name)
+        if isinstance(process, dict) and process.get('state', 'ready') not in PROCESS_STATES:
+            errors.append(f'processes[{i}]: unknown state "{process.get("state")}"')
+
+    known = names | set(existing_names)
+    for i, channel in enumerate(spec.get('channels', [])):
+        if not isinstance(channel, dict):
+            errors.append(f'channels[{i}]: must be an object')
+            continue
+        if channel.get('type') not in IPC_TYPES:
+            errors.append(f'channels[{i}]: unknown IPC type "{channel.get("type")}"')
+        for end in ('sender', 'receiver'):
+            if not isinstance(channel.get(end), str) or channel.get(end) not in known:
+                errors.append(f'channels[{i}]: unknown {end} "{channel.get(end)}"')
+        if not isinstance(channel.get('config', {}), dict):
+            errors.append(f'channels[{i}]: config must be an object')
+
+    return errors
+
+
+def import_topology(simulation_id, spec, existing):
+    """
+    Bulk-insert processes, channels, their stats rows and one summary event.
+    existing: {process_name: process_id} already in the simulation.
+    Caller commits, so the whole import is a single transaction.
+    Returns: (process_count, channel_count)
+    """
+    # Bulk inserts bypass the ORM version hook
+    version = bump_version(db.session, simulation_id)
+    process_rows = [
+        {
+            'simulation_id': simulation_id,
+            'process_name': p['name'],
+            'priority': p.get('priority', 0),
+            'state': p.get('state', 'ready'),
+            'version': version
+        }
+        for p in spec.get('processes', [])
+    ]
+
+    ids = dict(existing)
+    if process_rows:
+        created = db.session.execute(
+            insert(Process).returning(Process.id, Process.process_name, sort_by_parameter_order=True),
+            process_rows
+        ).all()
+        ids.update({name: process_id for process_id, name in created})
+
+    channel_rows = [
+        {
+            'simulation_id': simulation_id,
+            'ipc_type': c['type'],
+            'sender_id': ids[c['sender']],
+            'receiver_id': ids[c['receiver']],
+            'config': json.dumps(c.get('config', {})),
+            'version': version
+        }
+        for c in spec.get('channels', [])
+    ]
+
+    if channel_rows:
+        channel_ids = db.session.scalars(
+            insert(IPCChannel).returning(IPCChannel.id, sort_by_parameter_order=True),
+            channel_rows
+        ).all()
+        db.session.execute(insert(ChannelStats), [
+            {'channel_id': channel_id, 'message_count': 0, 'delay_sum_ms': 0,
+             'delay_max_ms': 0, 'bytes_total': 0, 'version': version}
+            for channel_id in channel_ids
+        ])
+
+    db.session.add(Event(
+        simulation_id=simulation_id,
+        event_type='topology_imported',
+        severity='info',
+        message=f'Topology imported: {len(process_rows)} processes, {len(channel_rows)} channels',
+        event_metadata=json.dumps({'processes': len(process_rows), 'channels': len(channel_rows)})
+    ))
+    return len(process_rows), len(channel_rows)
+
+
+def export_topology(simulation_id, states=None):
+    """
+    Export a simulation's topology in the import spec format using column-only queries.
+    states: live {process_id: state} overriding the stored ones
+    """
+    states = states or {}
+    processes = db.session.query(
+        Process.id, Process.process_name, Process.priority, Process.state
+    ).filter(Process.simulation_id == simulation_id).order_by(Process.id).all()
+    names = {process_id: name for process_id, name, _, _ in processes}
+
+    channels = db.session.query(
+        IPCChannel.ipc_type, IPCChannel.sender_id, IPCChannel.receiver_id, IPCChannel.config
+    ).filter(IPCChannel.simulation_id == simulation_id).order_by(IPCChannel.id).all()
+
+    return {
+        'processes': [
+            {'name': name, 'priority': priority or 0, 'state': states.get(process_id, state) or 'ready'}
+            for process_id, name, priority, state in processes
+        ],
+        'channels': [
+            {
+                'type': ipc_type,
+                'sender': names.get(sender_id),
+                'receiver': names.get(receiver_id),
+                'config': json.loads(config) if config else {}
+            }
+            for ipc_type, sender_id, receiver_id, config in channels
+        ]
+    }
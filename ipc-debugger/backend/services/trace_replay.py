@@ -0,0 +1,298 @@
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from backend.models import db, Process, IPCChannel, ChannelStats, Message, Event
+from backend.services.latency_monitor import shift_event
+
+TRACE_FORMATS = ('csv', 'ndjson')
+IPC_TYPES = ('pipe', 'queue', 'shmem')
+
+# Accepted column names for each trace field
+FIELD_ALIASES = {
+    'sender': ('sender', 'src', 'from'),
+    'receiver': ('receiver', 'dst', 'to'),
+    'ipc_type': ('ipc_type', 'mechanism', 'type'),
+    'size': ('size', 'size_bytes', 'bytes'),
+    'timestamp': ('timestamp', 'ts', 'time')
+}
+
+
+def detect_format(path):
+    """Guess the trace format from the file extension"""
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def parse_timestamp(value):
+    """Epoch seconds or ISO 8601 string -> (datetime, epoch seconds)"""
+    try:
+        seconds = float(value)
+        return datetime.utcfromtimestamp(seconds), seconds
+    except (TypeError, ValueError):
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        seconds = parsed.timestamp()
+        return datetime.utcfromtimestamp(seconds), seconds
+
+
+class TraceProgress:
+    """Ingest counters for a running trace replay"""
+
+    def __init__(self, import_id, simulation_id, path):
+        self.import_id = import_id
+        self.simulation_id = simulation_id
+        self.path = path
+        self.status = 'pending'  # pending, running, completed, failed
+        self.error = None
+        self.rows = 0
+        self.replayed = 0
+        self.failed = 0
+        self.recorded = 0
+        self.bytes_read = 0
+        self.processes_created = 0
+        self.channels_created = 0
+        self.started = None
+        self.finished = None
+
+    def elapsed(self):
+        if self.started is None:
+            return 0
+        return (self.finished or time.monotonic()) - self.started
+
+    def to_dict(self):
+        elapsed = self.elapsed()
+        return {
+            'import_id': self.import_id,
+            'simulation_id': self.simulation_id,
+            'status': self.status,
+            'error': self.error,
+            'rows': self.rows,
+            'replayed': self.replayed,
+            'failed': self.failed,
+            'recorded': self.recorded,
+            'bytes_read': self.bytes_read,
+            'processes_created': self.processes_created,
+            'channels_created': self.channels_created,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_sec': round(self.rows / elapsed, 2) if elapsed else 0,
+            'mb_per_sec': round(self.bytes_read / elapsed / 1e6, 3) if elapsed else 0
+        }
+
+
+class TraceReplayer:
+    """Streams a captured IPC trace from disk and replays it through IPCSimulator"""
+
+    def __init__(self, simulation, simulator, analyzer, recorder, batch_size=5000, yield_every=500):
+        self.simulation_id = simulation.id
+        self.simulator = simulator
+        self.analyzer = analyzer
+        self.recorder = recorder
+        self.batch_size = batch_size
+        self.yield_every = yield_every
+        self.writing = False  # rows flushed since the last commit (SQLite write lock held)
+
+        # Topology caches; bounded by the number of processes/channels, not trace length
+        self.processes = {p.process_name: p.id for p in simulation.processes}
+        self.channels = {
+            (c.sender_id, c.receiver_id, c.ipc_type): (c.id, json.loads(c.config) if c.config else {})
+            for c in simulation.ipc_channels
+        }
+
+    def _lines(self, f, progress):
+        for raw in f:
+            progress.bytes_read += len(raw)
+            yield raw.decode('utf-8', errors='replace')
+
+    def _json_rows(self, lines):
+        """Parsed NDJSON objects; None for a line that is not a JSON object"""
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else None
+
+    def iter_records(self, f, fmt, progress):
+        """Yield normalized trace records one at a time (None for a malformed row)"""
+        lines = self._lines(f, progress)
+        if fmt == 'csv':
+            rows = csv.DictReader(lines)
+        else:
+            rows = self._json_rows(lines)
+
+        for row in rows:
+            if row is None:
+                yield None
+                continue
+            record = {}
+            for field, aliases in FIELD_ALIASES.items():
+                record[field] = next((row[a] for a in aliases if row.get(a) not in (None, '')), None)
+            yield record
+
+    def _process_id(self, name, progress):
+        process_id = self.processes.get(name)
+        if process_id is None:
+            process = Process(simulation_id=self.simulation_id, process_name=name, state='ready')
+            db.session.add(process)
+            db.session.flush()
+            self.writing = True
+            process_id = self.processes[name] = process.id
+            progress.processes_created += 1
+        return process_id
+
+    def _channel(self, sender_id, receiver_id, ipc_type, progress):
+        key = (sender_id, receiver_id, ipc_type)
+        channel = self.channels.get(key)
+        if channel is None:
+            created = IPCChannel(
+                simulation_id=self.simulation_id,
+                ipc_type=ipc_type,
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                config='{}',
+                stats=ChannelStats(message_count=0, delay_sum_ms=0, delay_max_ms=0, bytes_total=0)
+            )
+            db.session.add(created)
+            db.session.flush()
+            self.writing = True
+            channel = self.channels[key] = (created.id, {})
+            progress.channels_created += 1
+        return channel
+
+    def _write_batch(self, rows, slots, progress):
+        """Bulk-insert a batch of message rows and settle reservoir evictions"""
+        if rows:
+            ids = db.session.scalars(
+                insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+            evicted_messages, evicted_events = [], []
+            for message_id, (channel_id, slot) in zip(ids, slots):
+                evicted = self.recorder.admit(channel_id, slot, (message_id, None))
+                if evicted:
+                    evicted_messages.append(evicted[0])
+                    if evicted[1] is not None:
+                        evicted_events.append(evicted[1])
+            if evicted_messages:
+                Message.query.filter(Message.id.in_(evicted_messages)).delete(synchronize_session=False)
+            if evicted_events:
+                Event.query.filter(Event.id.in_(evicted_events)).delete(synchronize_session=False)
+            progress.recorded += len(rows)
+
+        self.recorder.flush(db.session)
+        db.session.commit()
+        self.writing = False
+
+    def _shift_name(self, shift, sender_id, receiver_id):
+        names = {process_id: name for name, process_id in self.processes.items()
+                 if process_id in (sender_id, receiver_id)}
+        if shift['scope'] == 'process':
+            return names.get(shift['id'], str(shift['id']))
+        return f'{names.get(sender_id, sender_id)} → {names.get(receiver_id, receiver_id)}'
+
+    def run(self, path, fmt, progress, speedup=None, sleep=time.sleep, on_batch=None, on_shift=None):
+        """
+        Replay a trace file. speedup=None replays as fast as possible,
+        otherwise trace time is compressed by the given factor.
+        on_shift(transition, name) is called when a latency shift starts or ends.
+        A replay on a green thread (sleep=socketio.sleep) yields with
+        sleep(0) every yield_every rows and after each batch, so requests
+        are served while it runs; it never yields while holding the SQLite
+        write lock.
+        """
+        progress.status = 'running'
+        progress.started = time.monotonic()
+        first_ts = None
+        rows, slots = [], []
+
+        with open(path, 'rb') as f:
+            for record in self.iter_records(f, fmt, progress):
+                progress.rows += 1
+                if progress.rows % self.yield_every == 0 and not self.writing:
+                    sleep(0)
+                if record is None:
+                    progress.failed += 1
+                    continue
+                ipc_type = str(record['ipc_type'] or '').lower()
+                if not record['sender'] or not record['receiver'] or ipc_type not in IPC_TYPES:
+                    progress.failed += 1
+                    continue
+
+                try:
+                    size = int(float(record['size'] or 0))
+                    if record['timestamp'] is not None:
+                        sent_at, ts = parse_timestamp(record['timestamp'])
+                    else:
+                        sent_at, ts = datetime.utcnow(), None
+                except (TypeError, ValueError, OverflowError, OSError):
+                    # Malformed size or timestamp: skip the row, keep importing
+                    progress.failed += 1
+                    continue
+                if size < 0:
+                    progress.failed += 1
+                    continue
+
+                # Pace the replay against trace time
+                if speedup and ts is not None:
+                    if first_ts is None:
+                        first_ts = ts
+                    ahead = (ts - first_ts) / speedup - (time.monotonic() - progress.started)
+                    if ahead > 0:
+                        sleep(ahead)
+
+                sender_id = self._process_id(str(record['sender']), progress)
+                receiver_id = self._process_id(str(record['receiver']), progress)
+                channel_id, channel_config = self._channel(sender_id, receiver_id, ipc_type, progress)
+
+                success, delay_ms, _ = self.simulator.send_message(
+                    ipc_type, '', channel_config, message_size=size
+                )
+                if not success:
+                    progress.failed += 1
+                    continue
+                progress.replayed += 1
+
+                for shift in self.analyzer.record_message(sender_id, receiver_id, channel_id, delay_ms):
+                    name = self._shift_name(shift, sender_id, receiver_id)
+                    db.session.add(shift_event(self.simulation_id, shift, name))
+                    if on_shift:
+                        on_shift(shift, name)
+                self.recorder.observe(channel_id, size, delay_ms)
+
+                record_row, slot = self.recorder.sample(channel_id, delay_ms)
+                if record_row:
+                    rows.append({
+                        'channel_id': channel_id,
+                        'content': '',
+                        'size_bytes': size,
+                        'sent_at': sent_at,
+                        'delay_ms': delay_ms
+                    })
+                    slots.append((channel_id, slot))
+
+                if len(rows) >= self.batch_size or progress.rows % self.batch_size == 0:
+                    self._write_batch(rows, slots, progress)
+                    rows, slots = [], []
+                    if on_batch:
+                        on_batch(progress)
+                    sleep(0)
+
+        self._write_batch(rows, slots, progress)
+
+        progress.status = 'completed'
+        progress.finished = time.monotonic()
+        summary = progress.to_dict()
+        db.session.add(Event(
+            simulation_id=self.simulation_id,
+            event_type='trace_replayed',
+            severity='info',
+            message=f'Trace replayed: {progress.replayed} messages '
+                    f'({summary["rows_per_sec"]} rows/s, {progress.failed} failed)',
+            event_metadata=json.dumps(summary)
+        ))
+        db.session.commit()
+        return progress
@@ -0,0 +1 @@
+# Empty __init__ files for Python packages
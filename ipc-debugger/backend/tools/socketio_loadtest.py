@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Socket.IO fan-out load test.
+
+Spawns the server (or targets --url), joins N clients to a simulation room
+through join_simulation, drives message_sent events and reports
+emit-to-receive latency percentiles, dropped events, and server CPU/memory
+for each client count.
+
+Clients run as asyncio socketio.AsyncClients spread over worker processes,
+so a single client process is not the bottleneck. Requires aiohttp.
+
+Usage:
+    python -m backend.tools.socketio_loadtest --clients 10,100,500 --messages 200
+    python -m backend.tools.socketio_loadtest --url http://localhost:5000 --mode http
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Development server on a given port; eventlet is used when installed, as in production
+SERVER_COMMAND = (
+    "from backend.app import app, socketio; "
+    "socketio.run(app, host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)"
+)
+
+
+# ============= HTTP helpers =============
+
+class Throttled(Exception):
+    """The server's admission control rejected a write (429)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'throttled, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+def api(url, path, payload=None, method=None, retries=5):
+    """
+    Call the JSON API with the standard library. A 429 is retried up to
+    retries times after the server's Retry-After, then raises Throttled.
+    """
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(
+        f'{url}/api{path}', data=data, method=method or ('POST' if data else 'GET'),
+        headers={'Content-Type': 'application/json'}
+    )
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                raise
+            retry_after = retry_after_seconds(e)
+            if attempt == retries:
+                raise Throttled(retry_after)
+            time.sleep(retry_after)
+
+
+def retry_after_seconds(error):
+    """Wait requested by a 429: the body's precise retry_after, else the Retry-After header"""
+    try:
+        return float(json.loads(error.read() or b'{}')['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(error.headers.get('Retry-After', 1))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_COMMAND.format(port=port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited during startup')
+        try:
+            urllib.request.urlopen(url + '/', timeout=1).read()
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Server did not start within 30s')
+
+
+def setup_simulation(url):
+    """Throwaway simulation with one channel to send through"""
+    sim_id = api(url, '/simulation/create', {'name': 'socketio-loadtest'})['simulation']['id']
+    sender = api(url, '/process/create', {'simulation_id': sim_id, 'name': 'LoadSender'})['process']['id']
+    receiver = api(url, '/process/create', {'simulation_id': sim_id, 'name': 'LoadReceiver'})['process']['id']
+    channel = api(url, '/ipc/create', {
+        'simulation_id': sim_id, 'type': 'shmem', 'sender_id': sender, 'receiver_id': receiver
+    })['channel']['id']
+    return sim_id, channel
+
+
+# ============= Server resource sampling =============
+
+class ProcSampler:
+    """CPU% and RSS of a server process, read from /proc (Linux)"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self.samples = []
+        self._last = None
+
+    def _read(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+        with open(f'/proc/{self.pid}/status') as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        return time.monotonic(), cpu, rss_kb / 1024
+
+    def sample(self):
+        try:
+            now, cpu, rss = self._read()
+        except (OSError, StopIteration):
+            return
+        if self._last is not None:
+            elapsed = now - self._last[0]
+            if elapsed > 0:
+                self.samples.append(((cpu - self._last[1]) / elapsed * 100, rss))
+        self._last = (now, cpu, rss)
+
+    def summary(self):
+        if not self.samples:
+            return {'cpu_avg_pct': None, 'cpu_max_pct': None, 'rss_max_mb': None}
+        cpu = [c for c, _ in self.samples]
+        return {
+            'cpu_avg_pct': round(sum(cpu) / len(cpu), 1),
+            'cpu_max_pct': round(max(cpu), 1),
+            'rss_max_mb': round(max(r for _, r in self.samples), 1)
+        }
+
+
+# ============= Client workers =============
+
+async def run_clients(url, sim_id, count, ready, stop, results):
+    import socketio
+
+    latencies = []
+    received = {}
+    connected = 0
+
+    async def client(index):
+        nonlocal connected
+        sio = socketio.AsyncClient(reconnection=False)
+        joined = asyncio.Event()
+        seen = received.setdefault(index, set())
+
+        @sio.on('joined_simulation')
+        async def on_joined(data):
+            joined.set()
+
+        @sio.on('message_sent')
+        async def on_message(data):
+            now = time.time()
+            if 'emitted_at' in data:
+                latencies.append((now - data['emitted_at']) * 1000)
+            seen.add(data.get('seq', data.get('emitted_at')))
+
+        try:
+            await sio.connect(url, transports=['websocket'])
+            await sio.emit('join_simulation', {'simulation_id': sim_id})
+            await asyncio.wait_for(joined.wait(), 30)
+            connected += 1
+        except Exception:
+            return sio
+        return sio
+
+    clients = await asyncio.gather(*(client(i) for i in range(count)))
+    ready.put(connected)
+
+    while not stop.is_set():
+        await asyncio.sleep(0.05)
+
+    for sio in clients:
+        try:
+            await sio.disconnect()
+        except Exception:
+            pass
+    results.put({'connected': connected, 'latencies': latencies,
+                 'received': [len(seen) for seen in received.values()]})
+
+
+def client_worker(url, sim_id, count, ready, stop, results):
+    """Entry point of a client process"""
+    asyncio.run(run_clients(url, sim_id, count, ready, stop, results))
+
+
+# ============= Driver =============
+
+def percentile(values, p):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return round(values[index], 2)
+
+
+async def _relay(url, sim_id, messages, interval):
+    import socketio
+
+    sio = socketio.AsyncClient(reconnection=False)
+    await sio.connect(url, transports=['websocket'])
+    for seq in range(messages):
+        await sio.emit('message_sent_event', {
+            'simulation_id': sim_id, 'seq': seq, 'emitted_at': time.time()
+        })
+        await asyncio.sleep(interval)
+    await sio.disconnect()
+
+
+def drive_relay(url, sim_id, messages, rate):
+    """Emit message_sent_event through the server's relay handler (fan-out only)"""
+    asyncio.run(_relay(url, sim_id, messages, 1.0 / rate if rate else 0))
+    return messages
+
+
+def drive_http(url, channel_id, messages, rate):
+    """
+    POST /api/ipc/send (full request path: simulation, DB write, emit).
+    Throttled sends are not retried; they count as drops, and the next
+    send waits for the server's Retry-After.
+    Returns: (sent, throttled)
+    """
+    interval = 1.0 / rate if rate else 0
+    sent = throttled = 0
+    for _ in range(messages):
+        try:
+            if api(url, '/ipc/send', {'channel_id': channel_id, 'content': 'loadtest'}, retries=0).get('success'):
+                sent += 1
+        except Throttled as e:
+            throttled += 1
+            time.sleep(max(e.retry_after, interval))
+            continue
+        if interval:
+            time.sleep(interval)
+    return sent, throttled
+
+
+def run_step(url, sim_id, channel_id, clients, args, sampler):
+    ctx = multiprocessing.get_context('spawn')
+    ready, results, stop = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = min(args.procs, clients)
+    shares = [clients // procs + (1 if i < clients % procs else 0) for i in range(procs)]
+    workers = [
+        ctx.Process(target=client_worker, args=(url, sim_id, share, ready, stop, results), daemon=True)
+        for share in shares
+    ]
+    for worker in workers:
+        worker.start()
+
+    connected = sum(ready.get(timeout=120) for _ in workers)
+
+    started = time.monotonic()
+    sampling = True
+
+    def sample_loop():
+        while sampling:
+            if sampler:
+                sampler.sample()
+            time.sleep(0.25)
+
+    thread = threading.Thread(target=sample_loop, daemon=True)
+    thread.start()
+
+    throttled = 0
+    if args.mode == 'http':
+        sent, throttled = drive_http(url, channel_id, args.messages, args.rate)
+    else:
+        sent = drive_relay(url, sim_id, args.messages, args.rate)
+    send_elapsed = time.monotonic() - started
+
+    time.sleep(args.drain)
+    sampling = False
+    thread.join()
+    stop.set()
+
+    latencies, received = [], []
+    for _ in workers:
+        result = results.get(timeout=120)
+        latencies.extend(result['latencies'])
+        received.extend(result['received'])
+    for worker in workers:
+        worker.join(timeout=10)
+
+    latencies.sort()
+    # Throttled sends never reach the clients, so they count as drops
+    expected = (sent + throttled) * connected
+    delivered = sum(received)
+    return {
+        'clients': clients,
+        'connected': connected,
+        'sent': sent,
+        'throttled': throttled,
+        'send_rate': round(sent / send_elapsed, 1) if send_elapsed else None,
+        'expected': expected,
+        'delivered': delivered,
+        'dropped': expected - delivered,
+        'drop_pct': round((expected - delivered) / expected * 100, 3) if expected else 0,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': round(latencies[-1], 2) if latencies else None
+        },
+        'server': sampler.summary() if sampler else None
+    }
+
+
+def print_table(rows):
+    header = (f'{"clients":>8} {"conn":>6} {"sent":>6} {"429s":>6} {"drop%":>7} {"p50ms":>8} {"p95ms":>8} '
+              f'{"p99ms":>8} {"maxms":>8} {"cpu%":>7} {"rssMB":>7}')
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        lat = row['latency_ms']
+        server = row['server'] or {}
+
+        def cell(value, width):
+            return f'{"-" if value is None else value:>{width}}'
+
+        print(f'{row["clients"]:>8} {row["connected"]:>6} {row["sent"]:>6} {row["throttled"]:>6} {row["drop_pct"]:>7} '
+              f'{cell(lat["p50"], 8)} {cell(lat["p95"], 8)} {cell(lat["p99"], 8)} {cell(lat["max"], 8)} '
+              f'{cell(server.get("cpu_avg_pct"), 7)} {cell(server.get("rss_max_mb"), 7)}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Socket.IO fan-out load test')
+    parser.add_argument('--url', help='Target server (default: spawn one on a free port)')
+    parser.add_argument('--server-pid', type=int, help='PID of --url server for CPU/memory sampling')
+    parser.add_argument('--clients', default='1,10,50,100', help='Comma-separated client counts')
+    parser.add_argument('--procs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Client worker processes')
+    parser.add_argument('--messages', type=int, default=100, help='Messages per step')
+    parser.add_argument('--rate', type=float, default=50, help='Messages/sec (0 = as fast as possible)')
+    parser.add_argument('--mode', choices=('relay', 'http'), default='relay',
+                        help='relay: socket relay only; http: POST /api/ipc/send')
+    parser.add_argument('--drain', type=float, default=2.0, help='Seconds to wait for late events')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        import socketio  # noqa: F401
+        import aiohttp  # noqa: F401
+    except ImportError:
+        parser.error('the load test needs python-socketio[asyncio_client] (pip install aiohttp)')
+
+    server = None
+    if args.url:
+        url = args.url.rstrip('/')
+        pid = args.server_pid
+    else:
+        server, url = start_server(free_port())
+        pid = server.pid
+
+    rows = []
+    sim_id = None
+    try:
+        sim_id, channel_id = setup_simulation(url)
+        for clients in (int(c) for c in args.clients.split(',')):
+            sampler = ProcSampler(pid) if pid and os.path.exists(f'/proc/{pid}') else None
+            row = run_step(url, sim_id, channel_id, clients, args, sampler)
+            rows.append(row)
+            if not args.json:
+                print(f'{clients} clients: {row["delivered"]}/{row["expected"]} delivered, '
+                      f'p99 {row["latency_ms"]["p99"]}ms', file=sys.stderr)
+    finally:
+        if sim_id is not None:
+            try:
+                api(url, f'/simulation/{sim_id}', method='DELETE')
+            except (OSError, Throttled):
+                pass
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps({'mode': args.mode, 'messages': args.messages, 'rate': args.rate, 'steps': rows}, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import gzip
+import zlib
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+# Top-level list keys sent as columns ({field: [values]}) instead of rows
+COLUMNAR_KEYS = ('processes', 'channels', 'events')
+
+COMPRESSIBLE_TYPES = ('application/json', MSGPACK_MIMETYPE, 'text/')
+
+
+def to_columnar(rows):
+    """[{field: value}] -> {field: [values]}; field names are sent once"""
+    columns = {}
+    for row in rows:
+        for field in row:
+            if field not in columns:
+                columns[field] = []
+    for field, values in columns.items():
+        values.extend(row.get(field) for row in rows)
+    return columns
+
+
+def wants_msgpack():
+    """Client prefers msgpack over JSON in its Accept header"""
+    if msgpack is None or not request:
+        return False
+    accepted = request.accept_mimetypes
+    return accepted[MSGPACK_MIMETYPE] > accepted['application/json']
+
+
+def wants_columnar():
+    """Columnar lists are the default for msgpack and opt-in (?columnar=1) for JSON"""
+    columnar = request.args.get('columnar')
+    if columnar is not None:
+        return columnar not in ('0', 'false')
+    return wants_msgpack()
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """
+    jsonify() provider with content negotiation: clients sending
+    "Accept: application/x-msgpack" get msgpack, and list payloads under
+    COLUMNAR_KEYS can be sent as columns so repeated keys are encoded once.
+    """
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if request and isinstance(obj, dict) and wants_columnar():
+            obj = dict(obj)
+            for key in COLUMNAR_KEYS:
+                rows = obj.get(key)
+                if isinstance(rows, list) and all(isinstance(row, dict) for row in rows):
+                    obj[key] = to_columnar(rows)
+            obj['columnar'] = True
+
+        if wants_msgpack():
+            response = self._app.response_class(
+                msgpack.packb(obj, default=self.default, use_bin_type=True),
+                mimetype=MSGPACK_MIMETYPE
+            )
+        else:
+            response = self._app.response_class(
+                f'{self.dumps(obj)}\n', mimetype=self.mimetype
+            )
+        response.vary.add('Accept')
+        return response
+
+
+def compress_response(response, min_size=1024, level=6):
+    """
+    after_request hook: gzip/deflate API responses above min_size and give
+    msgpack representations their own ETag.
+    Static files are precompressed by the asset manifest and left alone.
+    """
+    # A strong ETag identifies one byte representation
+    etag, weak = response.get_etag()
+    if etag and not weak and response.mimetype == MSGPACK_MIMETYPE:
+        etag = f'{etag}-msgpack'
+        response.set_etag(etag)
+
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+        return response
+
+    encoding = request.accept_encodings.best_match(('gzip', 'deflate'))
+    data = response.get_data()
+    if encoding is None or len(data) < min_size:
+        return response
+
+    if encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=level, mtime=0)
+    else:
+        data = zlib.compress(data, level)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def etag_matches(etag):
+    """If-None-Match holds this ETag or one of its encoded representations"""
+    return request.if_none_match.star_tag or any(
+        tag == etag or tag.startswith(f'{etag}-')
+        for tag in request.if_none_match.as_set()
+    )
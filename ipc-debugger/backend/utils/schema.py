@@ -0,0 +1,89 @@
+from sqlalchemy import inspect, select, text
+from backend.models import IPCChannel, Message, Event
+
+
+def add_missing_columns(db):
+    """
+    Add columns declared on the models but missing from existing tables.
+    db.create_all() only creates new tables, so databases created by an
+    older version would otherwise break on new nullable columns.
+    Returns: [(table_name, column_name)]
+    """
+    inspector = inspect(db.engine)
+    added = []
+    
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append((table.name, column.name))
+    
+    db.session.commit()
+    return added
+
+
+def copy_legacy_rows(db, simulation_id, connection, batch_size=5000):
+    """
+    Shard creation hook: copy a simulation's messages and events recorded in
+    the catalog before sharding into its new shard (connection). The catalog
+    rows cannot be deleted in the same transaction (the request creating the
+    shard may hold the catalog's write lock); delete_legacy_rows() removes
+    them at the next startup.
+    Returns: number of rows copied
+    """
+    inspector = inspect(db.engine)
+    queries = []
+    if inspector.has_table(Message.__tablename__):
+        channels = select(IPCChannel.id).where(IPCChannel.simulation_id == simulation_id)
+        queries.append((Message.__table__, select(Message.__table__).where(Message.channel_id.in_(channels))))
+    if inspector.has_table(Event.__tablename__):
+        queries.append((Event.__table__, select(Event.__table__).where(Event.simulation_id == simulation_id)))
+    
+    copied = 0
+    with db.engine.connect() as catalog:
+        for table, query in queries:
+            result = catalog.execute(query.order_by(table.c.id)).mappings()
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                connection.execute(table.insert(), [dict(row) for row in rows])
+                copied += len(rows)
+    return copied
+
+
+def delete_legacy_rows(db, simulation_ids, batch_size=500):
+    """
+    Startup migration: delete catalog messages and events of simulations
+    whose shard exists. A shard file only exists once its creating
+    transaction, and so copy_legacy_rows(), has committed. Messages of
+    deleted channels are never copied, so they go too.
+    Returns: number of rows deleted
+    """
+    inspector = inspect(db.engine)
+    deleted = 0
+    if inspector.has_table(Message.__tablename__):
+        with db.engine.begin() as catalog:
+            deleted += catalog.execute(
+                Message.__table__.delete().where(Message.channel_id.notin_(select(IPCChannel.id)))
+            ).rowcount
+    for start in range(0, len(simulation_ids), batch_size):
+        batch = simulation_ids[start:start + batch_size]
+        with db.engine.begin() as catalog:
+            if inspector.has_table(Message.__tablename__):
+                channels = select(IPCChannel.id).where(IPCChannel.simulation_id.in_(batch))
+                deleted += catalog.execute(
+                    Message.__table__.delete().where(Message.channel_id.in_(channels))
+                ).rowcount
+            if inspector.has_table(Event.__tablename__):
+                deleted += catalog.execute(
+                    Event.__table__.delete().where(Event.simulation_id.in_(batch))
+                ).rowcount
+    return deleted
@@ -0,0 +1,267 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, inspect, text
+
+# Simulation whose shard sharded tables (messages, events) resolve to
+_current_shard = ContextVar('current_shard', default=None)
+
+# Row ids are allocated per shard starting at simulation_id << ID_SHIFT, so
+# message and event ids stay unique across shards (and the shard of an id is
+# id >> ID_SHIFT)
+ID_SHIFT = 32
+
+
+def is_sharded(table):
+    return table is not None and table.info.get('sharded', False)
+
+
+def shard_key(simulation_id):
+    """Simulation id as the int shards are keyed by ("5" and 5 share a shard), or None"""
+    if simulation_id is None or isinstance(simulation_id, bool):
+        return None
+    try:
+        return int(simulation_id)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class ShardRouter:
+    """
+    Storage router: tables marked info={'sharded': True} live in one SQLite
+    file per simulation, everything else in the catalog database
+    (SQLALCHEMY_DATABASE_URI). Writes to different simulations then take
+    different file locks, and deleting a simulation unlinks its file.
+
+    Queries on sharded tables use the simulation selected with scope(); a
+    flush picks the shard from the rows it writes (shard_id(session) on the
+    model). With sharding disabled everything stays in the catalog.
+
+    SQLite cannot commit several files atomically, so ShardedSession commits
+    the shards a transaction wrote to before the catalog (see commit()).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.max_open = 64
+        self.tables = []
+        self.engines = OrderedDict()  # simulation_id -> Engine, least recently used first
+        self.lock = threading.RLock()
+        self.create_hooks = []
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('SHARDING_ENABLED', False)
+        self.directory = app.config.get('SHARD_DIR')
+        self.max_open = app.config.get('SHARD_MAX_OPEN', 64)
+        self.tables = [table for table in db.metadata.sorted_tables if is_sharded(table)]
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def on_create(self, hook):
+        """Register hook(simulation_id, connection), run once in a new shard's creating transaction"""
+        self.create_hooks.append(hook)
+        return hook
+
+    def path(self, simulation_id):
+        return os.path.join(self.directory, f'simulation_{int(simulation_id)}.db')
+
+    def exists(self, simulation_id):
+        return self.enabled and os.path.exists(self.path(simulation_id))
+
+    def simulation_ids(self):
+        """Simulations that have a shard file"""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return []
+        ids = []
+        for name in os.listdir(self.directory):
+            if name.startswith('simulation_') and name.endswith('.db'):
+                try:
+                    ids.append(int(name[len('simulation_'):-len('.db')]))
+                except ValueError:
+                    pass
+        return sorted(ids)
+
+    def engine(self, simulation_id):
+        """Engine of a simulation's shard, creating the shard file on first use"""
+        simulation_id = int(simulation_id)
+        with self.lock:
+            engine = self.engines.get(simulation_id)
+            if engine is not None:
+                self.engines.move_to_end(simulation_id)
+                return engine
+
+            path = self.path(simulation_id)
+            created = not os.path.exists(path)
+            engine = create_engine(f'sqlite:///{path}')
+            if created:
+                self._create(engine, simulation_id)
+            else:
+                self._upgrade(engine, simulation_id)
+
+            self.engines[simulation_id] = engine
+            while len(self.engines) > self.max_open:
+                _, evicted = self.engines.popitem(last=False)
+                evicted.dispose()
+            return engine
+
+    def _create(self, engine, simulation_id):
+        # A shard file only exists once its tables and copied rows are committed
+        try:
+            with engine.begin() as connection:
+                for table in self.tables:
+                    self._create_table(connection, table, simulation_id)
+                for hook in self.create_hooks:
+                    hook(simulation_id, connection)
+        except Exception:
+            engine.dispose()
+            self._remove(self.path(simulation_id))
+            raise
+
+    def _create_table(self, connection, table, simulation_id):
+        table.create(connection)
+        if table.dialect_options['sqlite'].get('autoincrement'):
+            connection.execute(text(
+                "INSERT INTO sqlite_sequence(name, seq) VALUES (:name, :seq)"
+            ), {'name': table.name, 'seq': int(simulation_id) << ID_SHIFT})
+
+    def _upgrade(self, engine, simulation_id):
+        """Add tables and columns declared on sharded models but missing from an older shard"""
+        with engine.begin() as connection:
+            inspector = inspect(connection)
+            for table in self.tables:
+                if not inspector.has_table(table.name):
+                    self._create_table(connection, table, simulation_id)
+                    continue
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=engine.dialect)
+                        connection.execute(text(
+                            f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                        ))
+
+    def _remove(self, path):
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def drop(self, simulation_id):
+        """Delete a simulation's shard file"""
+        if not self.enabled:
+            return False
+        simulation_id = int(simulation_id)
+        with self.lock:
+            engine = self.engines.pop(simulation_id, None)
+            if engine is not None:
+                engine.dispose()
+            path = self.path(simulation_id)
+            dropped = os.path.exists(path)
+            self._remove(path)
+            return dropped
+
+    @contextmanager
+    def scope(self, simulation_id):
+        """Route sharded-table queries in this block to a simulation's shard"""
+        token = _current_shard.set(shard_key(simulation_id))
+        try:
+            yield
+        finally:
+            _current_shard.reset(token)
+
+    def enter(self, simulation_id):
+        """scope() for request hooks; pass the token to leave()"""
+        return _current_shard.set(shard_key(simulation_id))
+
+    def leave(self, token):
+        _current_shard.reset(token)
+
+    def current(self):
+        return _current_shard.get()
+
+
+shards = ShardRouter()
+
+
+class ShardedSession(Session):
+    """Flask-SQLAlchemy session that sends sharded tables to the shard router"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, **kwargs):
+        if bind is None and shards.enabled and mapper is not None:
+            table = getattr(inspect(mapper), 'local_table', None)
+            if is_sharded(table):
+                if shard is None:
+                    shard = self.info.get('flush_shard')
+                if shard is None:
+                    shard = shards.current()
+                if shard is None:
+                    raise RuntimeError(f'No simulation shard selected for {table.name}')
+                engine = shards.engine(shard)
+                self.info.setdefault('shard_engines', set()).add(engine)
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        """
+        Commit the shards this transaction used, then the catalog. SQLite
+        commits each file separately, so this order bounds what a failure
+        can leave behind: if the catalog commit fails, the shards hold
+        messages and events that the catalog's aggregates (channel stats,
+        latency buckets, versions) do not count yet. The catalog can never
+        count rows that were rolled back.
+        """
+        engines = self.info.pop('shard_engines', None)
+        if engines and self.in_transaction():
+            self.flush()
+            for engine in engines:
+                # Committing the DB-API connection directly leaves SQLAlchemy's
+                # own commit below with nothing to do on this file
+                connection = self.connection(bind_arguments={'bind': engine})
+                connection.connection.driver_connection.commit()
+        super().commit()
+
+    def rollback(self):
+        self.info.pop('shard_engines', None)
+        super().rollback()
+
+    def close(self):
+        self.info.pop('shard_engines', None)
+        super().close()
+
+
+def select_flush_shard(session, flush_context, instances):
+    """
+    before_flush hook: route the flush to the shard of the sharded rows it
+    writes. One flush can only write to one shard.
+    """
+    session.info.pop('flush_shard', None)
+    if not shards.enabled:
+        return
+    found = set()
+    with session.no_autoflush:
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if is_sharded(getattr(obj, '__table__', None)):
+                simulation_id = obj.shard_id(session)
+                if simulation_id is not None:
+                    found.add(simulation_id)
+    if len(found) > 1:
+        raise RuntimeError(f'One flush cannot write to several simulation shards: {sorted(found)}')
+    if found:
+        session.info['flush_shard'] = found.pop()
+
+
+def clear_flush_shard(session, flush_context):
+    session.info.pop('flush_shard', None)
+
+
+def register_sharding(app, db):
+    """Configure the router and install the flush hooks on every session"""
+    shards.init_app(app, db)
+    if not event.contains(Session, 'before_flush', select_flush_shard):
+        event.listen(Session, 'before_flush', select_flush_shard)
+        event.listen(Session, 'after_flush_postexec', clear_flush_shard)
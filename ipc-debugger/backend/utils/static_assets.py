@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Local css/js references in pages get a ?v=<hash> so they can be cached as immutable
+ASSET_REFERENCE = re.compile(r'((?:href|src)=["\'])((?:css|js)/[^"\'?#]+)(["\'])')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class StaticAsset:
+    """A frontend file held in memory with its precompressed variants"""
+
+    def __init__(self, path, data, mimetype):
+        self.path = path
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.variants = {'identity': data}  # encoding -> bytes
+
+    def compress(self, min_size):
+        """Precompute gzip/brotli variants that are actually smaller"""
+        data = self.variants['identity']
+        if len(data) < min_size or not self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            return
+
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) < len(data):
+            self.variants['gzip'] = packed
+        if brotli is not None:
+            packed = brotli.compress(data)
+            if len(packed) < len(data):
+                self.variants['br'] = packed
+
+    def etag(self, encoding):
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+
+class StaticAssetManifest:
+    """In-memory manifest of the frontend directory, built once at startup"""
+
+    def __init__(self, root, min_compress_size=512):
+        self.root = root
+        self.min_compress_size = min_compress_size
+        self.assets = {}  # relative path -> StaticAsset
+        self.scan()
+
+    def scan(self):
+        """Load every file under root, hash it and precompress it"""
+        assets = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                with open(full_path, 'rb') as f:
+                    assets[path] = StaticAsset(path, f.read(), mimetype)
+
+        # Pages are fingerprinted after the assets they reference are hashed
+        for asset in assets.values():
+            if asset.mimetype == 'text/html':
+                self._fingerprint(asset, assets)
+            asset.compress(self.min_compress_size)
+
+        self.assets = assets
+
+    def _fingerprint(self, page, assets):
+        def add_version(match):
+            target = assets.get(match.group(2))
+            if target is None:
+                return match.group(0)
+            return f'{match.group(1)}{match.group(2)}?v={target.digest}{match.group(3)}'
+
+        html = page.variants['identity'].decode('utf-8')
+        data = ASSET_REFERENCE.sub(add_version, html).encode('utf-8')
+        page.variants['identity'] = data
+        page.digest = hashlib.sha256(data).hexdigest()[:16]
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def response(self, asset, request):
+        """Serve an asset with ETag, 304 and Accept-Encoding negotiation"""
+        accepted = request.accept_encodings
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.variants and accepted[candidate]:
+                encoding = candidate
+                break
+
+        etag = asset.etag(encoding)
+        if request.args.get('v') == asset.digest:
+            cache_control = IMMUTABLE
+        else:
+            cache_control = REVALIDATE
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,117 @@
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from backend.models import db, Simulation, Process, IPCChannel, ChannelStats, Tombstone
+
+
+def _simulation_of(session, obj):
+    """Simulation id a versioned row belongs to (None if it cannot be stamped yet)"""
+    if isinstance(obj, ChannelStats):
+        if obj.channel_id is None:
+            return None  # created together with its channel, which gets stamped
+        channel = session.get(IPCChannel, obj.channel_id)
+        return channel.simulation_id if channel else None
+    return obj.simulation_id
+
+
+def stamp_versions(session, flush_context, instances):
+    """
+    before_flush hook: bump the version of every simulation whose topology,
+    process states or channel stats change in this flush, stamp the changed
+    rows with it, and leave a tombstone for deleted processes and channels.
+    """
+    deleted_simulations = {obj.id for obj in session.deleted if isinstance(obj, Simulation)}
+    changed = {}  # simulation_id -> [rows]
+    tombstones = []
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Simulation):
+                obj.version = obj.version or 1
+            elif isinstance(obj, (Process, IPCChannel, ChannelStats)):
+                simulation_id = _simulation_of(session, obj)
+                if simulation_id is not None:
+                    changed.setdefault(simulation_id, []).append(obj)
+
+        for obj in session.dirty:
+            if not session.is_modified(obj, include_collections=False):
+                continue
+            if isinstance(obj, Simulation):
+                changed.setdefault(obj.id, [])
+            elif isinstance(obj, (Process, IPCChannel, ChannelStats)):
+                simulation_id = _simulation_of(session, obj)
+                if simulation_id is not None:
+                    changed.setdefault(simulation_id, []).append(obj)
+
+        for obj in session.deleted:
+            if isinstance(obj, (Process, IPCChannel)) and obj.simulation_id not in deleted_simulations:
+                changed.setdefault(obj.simulation_id, [])
+                tombstones.append((obj.simulation_id, 'process' if isinstance(obj, Process) else 'channel', obj.id))
+
+        versions = {}
+        for simulation_id, rows in changed.items():
+            simulation = session.get(Simulation, simulation_id)
+            if simulation is None or simulation_id in deleted_simulations:
+                continue
+            simulation.version = (simulation.version or 0) + 1
+            versions[simulation_id] = simulation.version
+            for row in rows:
+                row.version = simulation.version
+
+        for simulation_id, kind, row_id in tombstones:
+            if simulation_id in versions:
+                session.add(Tombstone(simulation_id=simulation_id, kind=kind,
+                                      row_id=row_id, version=versions[simulation_id]))
+
+
+def register_versioning():
+    """Install the version-stamping hook on every session"""
+    if not event.contains(Session, 'before_flush', stamp_versions):
+        event.listen(Session, 'before_flush', stamp_versions)
+
+
+def bump_version(session, simulation_id):
+    """
+    Bump a simulation's version for writes that bypass the ORM (bulk inserts).
+    Returns: the new version, to stamp on the inserted rows
+    """
+    simulation = session.get(Simulation, simulation_id)
+    simulation.version = (simulation.version or 0) + 1
+    return simulation.version
+
+
+def simulation_etag(simulation_id, version):
+    return f'sim-{simulation_id}-v{version}'
+
+
+def changes_since(simulation_id, since):
+    """
+    Processes and channels added or changed after a version, and ids removed
+    Returns: {'processes': [Process], 'channels': [IPCChannel],
+              'removed_processes': [id], 'removed_channels': [id]}
+    """
+    processes = Process.query.filter(
+        Process.simulation_id == simulation_id,
+        Process.version > since
+    ).order_by(Process.id).all()
+
+    # A channel also changes when its message count does
+    channels = IPCChannel.query.outerjoin(
+        ChannelStats, ChannelStats.channel_id == IPCChannel.id
+    ).filter(
+        IPCChannel.simulation_id == simulation_id,
+        or_(IPCChannel.version > since, ChannelStats.version > since)
+    ).order_by(IPCChannel.id).all()
+
+    removed = {'process': [], 'channel': []}
+    for kind, row_id in db.session.query(Tombstone.kind, Tombstone.row_id).filter(
+        Tombstone.simulation_id == simulation_id,
+        Tombstone.version > since
+    ):
+        removed[kind].append(row_id)
+
+    return {
+        'processes': processes,
+        'channels': channels,
+        'removed_processes': removed['process'],
+        'removed_channels': removed['channel']
+    }
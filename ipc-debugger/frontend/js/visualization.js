@@ -6,6 +6,13 @@ let channels = [];
 let messages = [];
 let socket;
 let currentSimulationId;
+let simulationVersion = null; // version of the loaded processes/channels, for ?since= deltas
+
+// Time travel: while scrubbing, the canvas shows a reconstructed past state
+let historyView = null; // {processes, channels} at the scrubbed moment, null when live
+let scrubTarget = null; // newest slider position (epoch ms) not requested yet
+let scrubInFlight = false;
+let scrubbing = false;
 
 // Charts
 let timelineChart, latencyChart, ipcDistChart;
@@ -23,6 +30,8 @@ document.addEventListener('DOMContentLoaded', () => {
 function setupEventListeners() {
     document.getElementById('detectDeadlockBtn').addEventListener('click', detectDeadlock);
     document.getElementById('analyzeBottleneckBtn').addEventListener('click', analyzeBottleneck);
+    document.getElementById('timeSlider').addEventListener('input', (e) => scrubTo(Number(e.target.value)));
+    document.getElementById('liveBtn').addEventListener('click', goLive);
 }
 
 // Initialize canvas
@@ -133,7 +142,11 @@ function initWebSocket() {
 
 // Load simulation data
 async function loadSimulationData() {
-    currentSimulationId = localStorage.getItem('currentSimulationId');
+    const simulationId = localStorage.getItem('currentSimulationId');
+    if (simulationId !== currentSimulationId) {
+        simulationVersion = null;
+    }
+    currentSimulationId = simulationId;
 
     if (!currentSimulationId) {
         addLiveEvent('No active simulation. Please create one in the dashboard.');
@@ -141,11 +154,19 @@ async function loadSimulationData() {
     }
 
     try {
-        const response = await apiRequest(`/simulation/${currentSimulationId}`);
+        const query = simulationVersion ? `?since=${simulationVersion}` : '';
+        const response = await apiRequest(`/simulation/${currentSimulationId}${query}`);
         if (response.success) {
-            processes = response.processes || [];
-            channels = response.channels || [];
+            if (response.since) {
+                processes = mergeById(processes, response.processes, response.removed_processes);
+                channels = mergeById(channels, response.channels, response.removed_channels);
+            } else {
+                processes = response.processes || [];
+                channels = response.channels || [];
+            }
+            simulationVersion = response.simulation.version;
             updateCharts();
+            refreshTimeline();
 
             if (socket && socket.connected) {
                 socket.emit('join_simulation', { simulation_id: currentSimulationId });
@@ -156,11 +177,72 @@ async function loadSimulationData() {
     }
 }
 
+// Apply a delta: replace changed items, append new ones, drop removed ids
+function mergeById(items, changed, removed) {
+    const byId = new Map(items.map(item => [item.id, item]));
+    (removed || []).forEach(id => byId.delete(id));
+    (changed || []).forEach(item => byId.set(item.id, item));
+    return Array.from(byId.values()).sort((a, b) => a.id - b.id);
+}
+
+// Time travel
+async function refreshTimeline() {
+    try {
+        const response = await apiRequest(`/timetravel/${currentSimulationId}/snapshots`);
+        if (!response.success || !response.start) return;
+
+        const slider = document.getElementById('timeSlider');
+        slider.min = Date.parse(response.start + 'Z');
+        slider.max = Date.parse(response.now + 'Z');
+        if (!historyView) slider.value = slider.max;
+        slider.disabled = false;
+    } catch (error) {
+        console.error('Failed to load time travel snapshots');
+    }
+}
+
+// Only the newest slider position is fetched; positions passed while a
+// request is in flight are skipped, so scrubbing never queues up requests
+function scrubTo(ms) {
+    scrubTarget = ms;
+    scrubbing = true;
+    document.getElementById('liveBtn').disabled = false;
+    document.getElementById('timeLabel').textContent = new Date(ms).toLocaleTimeString();
+    if (!scrubInFlight) fetchHistory();
+}
+
+async function fetchHistory() {
+    scrubInFlight = true;
+    while (scrubTarget !== null) {
+        const ms = scrubTarget;
+        scrubTarget = null;
+        try {
+            const response = await apiRequest(`/timetravel/${currentSimulationId}?at=${ms / 1000}`);
+            if (response.success && scrubbing) {
+                historyView = { processes: response.processes, channels: response.channels };
+            }
+        } catch (error) {
+            console.error('Failed to load past state');
+        }
+    }
+    scrubInFlight = false;
+}
+
+function goLive() {
+    scrubbing = false;
+    historyView = null;
+    scrubTarget = null;
+    document.getElementById('liveBtn').disabled = true;
+    document.getElementById('timeLabel').textContent = 'Live';
+    refreshTimeline();
+}
+
 // Draw canvas
 function drawCanvas() {
     ctx.clearRect(0, 0, canvas.width, canvas.height);
+    const view = historyView || { processes, channels };
 
-    if (processes.length === 0) {
+    if (view.processes.length === 0) {
         ctx.fillStyle = '#94a3b8';
         ctx.font = '16px Inter';
         ctx.textAlign = 'center';
@@ -169,25 +251,26 @@ function drawCanvas() {
     }
 
     // Draw channels (edges)
-    channels.forEach(channel => {
-        const sender = processes.find(p => p.id === channel.sender_id);
-        const receiver = processes.find(p => p.id === channel.receiver_id);
+    view.channels.forEach(channel => {
+        const sender = view.processes.find(p => p.id === channel.sender_id);
+        const receiver = view.processes.find(p => p.id === channel.receiver_id);
 
         if (sender && receiver) {
-            const senderPos = getProcessPosition(processes.indexOf(sender));
-            const receiverPos = getProcessPosition(processes.indexOf(receiver));
+            const senderPos = getProcessPosition(view.processes.indexOf(sender), view.processes.length);
+            const receiverPos = getProcessPosition(view.processes.indexOf(receiver), view.processes.length);
 
             drawArrow(senderPos.x, senderPos.y, receiverPos.x, receiverPos.y, channel.ipc_type);
         }
     });
 
     // Draw processes (nodes)
-    processes.forEach((process, index) => {
-        const pos = getProcessPosition(index);
+    view.processes.forEach((process, index) => {
+        const pos = getProcessPosition(index, view.processes.length);
         drawProcess(pos.x, pos.y, process);
     });
 
-    // Draw messages
+    // Draw messages (live view only)
+    if (historyView) return;
     messages.forEach((msg, index) => {
         if (msg.progress < 1) {
             drawMessage(msg);
@@ -198,11 +281,11 @@ function drawCanvas() {
     });
 }
 
-function getProcessPosition(index) {
+function getProcessPosition(index, count = processes.length) {
     const centerX = canvas.width / 2;
     const centerY = canvas.height / 2;
     const radius = Math.min(canvas.width, canvas.height) / 3;
-    const angle = (index / processes.length) * 2 * Math.PI - Math.PI / 2;
+    const angle = (index / count) * 2 * Math.PI - Math.PI / 2;
 
     return {
         x: centerX + radius * Math.cos(angle),